@@ -7,7 +7,10 @@ from plotly.subplots import make_subplots
 import sqlite3
 import os
 import tempfile
-from data_processor import DataProcessor
+from data_processor import (
+    DataProcessor, GA_TOTAL_ITEM, CASH_FLOW_ITEMS,
+    BALANCE_SHEET_STRUCTURE, BALANCE_SHEET_ITEMS, BALANCE_RATIOS, AUTO_FORECAST_METHODS
+)
 from datetime import datetime
 
 # ページ設定 - 完全ライトモード
@@ -397,10 +400,13 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# 初期化
-if 'processor' not in st.session_state:
-    st.session_state.processor = DataProcessor()
-processor = st.session_state.processor
+# 初期化（DataProcessorはサーバープロセス内の全セッションで共有）
+@st.cache_resource
+def get_shared_processor():
+    """共有DataProcessorを取得（接続テスト・スキーマ確認はプロセスごとに1回だけ実行）"""
+    return DataProcessor()
+
+processor = get_shared_processor()
 
 # キャッシュ付きデータ読み込み関数（高速化）
 @st.cache_data(ttl=600)  # 10分間キャッシュ（パフォーマンス改善）
@@ -409,15 +415,30 @@ def load_actual_data_cached(period_id, _processor):
     return _processor.load_actual_data(period_id)
 
 @st.cache_data(ttl=600)  # 10分間キャッシュ（パフォーマンス改善）
-def load_forecast_data_cached(period_id, scenario, _processor):
-    """予測データをキャッシュ付きで読み込み"""
-    return _processor.load_forecast_data(period_id, scenario)
+def load_base_forecast_cached(period_id, _processor):
+    """基準予測（現実＋補助科目の合計）をキャッシュ付きで読み込み"""
+    return _processor.load_base_forecast_data(period_id)
+
+@st.cache_data(ttl=600)  # 10分間キャッシュ（パフォーマンス改善）
+def calculate_scenario_forecasts_cached(period_id, scenarios, _processor):
+    """複数シナリオの予測（シナリオ×項目×月）をキャッシュ付きで作成"""
+    return _processor.calculate_scenario_forecasts(period_id, scenarios)
+
+@st.cache_data(ttl=600)  # 10分間キャッシュ（パフォーマンス改善）
+def load_periods_data_cached(period_ids, _processor, include_forecast=False, scenario="現実"):
+    """複数期の実績（と予測）データ（期×項目×月）をキャッシュ付きで読み込み"""
+    return _processor.load_periods_data(period_ids, include_forecast, scenario)
 
 @st.cache_data(ttl=600)  # 10分間キャッシュ（パフォーマンス改善）
 def load_sub_accounts_cached(period_id, scenario, _processor):
     """補助科目データをキャッシュ付きで読み込み"""
     return _processor.load_sub_accounts(period_id, scenario)
 
+@st.cache_data(ttl=3600)  # 1時間キャッシュ（マスタデータ）
+def get_scenarios_cached(comp_id, _processor):
+    """シナリオと増減率の一覧をキャッシュ付きで取得"""
+    return _processor.get_scenarios(comp_id)
+
 @st.cache_data(ttl=3600)  # 1時間キャッシュ（マスタデータ）
 def get_companies_cached(_processor):
     """会社一覧をキャッシュ付きで取得"""
@@ -560,23 +581,15 @@ else:
             st.error("選択された期が見つかりません")
             selected_period_id = None
 
-    # 予測シナリオ
+    # 予測シナリオ（会社ごとに保存されたシナリオ）
     st.sidebar.markdown("### 🎯 予測シナリオ")
     st.session_state.scenario = st.sidebar.radio(
         "シナリオを選択",
-        ["現実", "楽観", "悲観"],
+        list(get_scenarios_cached(selected_comp_id, processor)),
         horizontal=True,
         label_visibility="collapsed"
     )
     
-    # シナリオ設定
-    if 'scenario_rates' not in st.session_state:
-        st.session_state.scenario_rates = {
-            "現実": 0.0,
-            "楽観": 0.1,
-            "悲観": -0.1
-        }
-    
     # 表示設定
     st.sidebar.markdown("### ⚙️ 表示設定")
     st.session_state.display_mode = st.sidebar.radio(
@@ -752,7 +765,56 @@ if st.session_state.page == "システム設定":
                     st.info("登録されている会計期間がありません")
             else:
                 st.info("会社を選択すると、その会社の期間が表示されます")
-    
+
+            st.markdown("---")
+
+            # 期首残高（貸借対照表の繰り越し計算に使用）
+            st.subheader("🏦 期首残高")
+            balance_periods = processor.get_company_periods(comp_id_for_period)
+            if balance_periods.empty:
+                st.info("登録されている会計期間がありません")
+            else:
+                balance_period_id = st.selectbox(
+                    "対象期",
+                    balance_periods['id'].tolist(),
+                    format_func=lambda x: f"第{balance_periods[balance_periods['id'] == x]['period_num'].iloc[0]}期",
+                    key="opening_balance_period"
+                )
+                opening = processor.load_opening_balances([balance_period_id])[0]
+                opening_df = pd.DataFrame({
+                    "区分": [
+                        category
+                        for categories in BALANCE_SHEET_STRUCTURE.values()
+                        for category, items in categories.items()
+                        for _ in items
+                    ],
+                    "科目": BALANCE_SHEET_ITEMS,
+                    "期首残高": opening
+                })
+                edited_opening = st.data_editor(
+                    opening_df,
+                    disabled=["区分", "科目"],
+                    hide_index=True,
+                    width="stretch",
+                    key=f"opening_balance_editor_{balance_period_id}"
+                )
+
+                totals = edited_opening.groupby("区分", sort=False)["期首残高"].sum()
+                assets = totals.get("流動資産", 0) + totals.get("固定資産", 0)
+                liabilities_equity = totals.get("流動負債", 0) + totals.get("固定負債", 0) + totals.get("株主資本", 0)
+                if abs(assets - liabilities_equity) >= 1:
+                    st.warning(f"資産合計 ¥{safe_int(assets):,} と負債・純資産合計 ¥{safe_int(liabilities_equity):,} が一致していません")
+
+                if st.button("💾 期首残高を保存", type="primary", key="save_opening_balances"):
+                    success, msg = processor.save_opening_balances(
+                        balance_period_id,
+                        dict(zip(edited_opening["科目"], edited_opening["期首残高"]))
+                    )
+                    if success:
+                        st.success(msg)
+                    else:
+                        st.error(msg)
+
     with tab3:
         st.subheader("🔍 データベース診断")
         
@@ -827,73 +889,46 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             if 'actuals_df' not in st.session_state:
                 st.session_state.actuals_df = load_actual_data_cached(st.session_state.selected_period_id, processor)
             if 'forecasts_df' not in st.session_state:
-                st.session_state.forecasts_df = load_forecast_data_cached(st.session_state.selected_period_id, "現実", processor)
-            if 'sub_accounts_df' not in st.session_state:
-                st.session_state.sub_accounts_df = load_sub_accounts_cached(st.session_state.selected_period_id, st.session_state.scenario, processor)
+                st.session_state.forecasts_df = load_base_forecast_cached(st.session_state.selected_period_id, processor)
             
         actuals_df = st.session_state.actuals_df.copy()
+        # 基準予測（現実の予測を補助科目の合計で上書きしたもの。一括計算の各画面と共通）
         forecasts_df = st.session_state.forecasts_df.copy()
-        sub_accounts_df = st.session_state.sub_accounts_df.copy()
         
-        # シナリオ調整（キャッシュ & ベクトル化）
-        adjustment_key = (st.session_state.scenario, st.session_state.current_month)
-        if st.session_state.scenario != "現実":
+        # シナリオ調整（基準予測にシナリオルールを適用。一括計算の各画面と同じ関数を使う）
+        scenario_rates = get_scenarios_cached(st.session_state.selected_comp_id, processor)
+        if scenario_rates.get(st.session_state.scenario, 0.0) != 0:
+            adjustment_key = (st.session_state.selected_period_id, st.session_state.scenario)
             if 'scenario_adjustment_cache' not in st.session_state or st.session_state.get('adjustment_key') != adjustment_key:
-                rate = st.session_state.scenario_rates[st.session_state.scenario]
-                split_idx = months.index(st.session_state.current_month) + 1 if st.session_state.current_month in months else 0
-                forecast_months = months[split_idx:]
-                # DataFrameに存在する月のみを使用
-                available_forecast_months = [m for m in forecast_months if m in forecasts_df.columns]
-                
-                # ベクトル化: 条件に応じて一括調整
-                if available_forecast_months:
-                    # 売上高: +rate
-                    forecasts_df.loc[forecasts_df['項目名'] == '売上高', available_forecast_months] *= (1 + rate)
-                    
-                    # 売上原価: -rate*0.5
-                    forecasts_df.loc[forecasts_df['項目名'] == '売上原価', available_forecast_months] *= (1 - rate * 0.5)
-                    
-                    # 販管費: -rate*0.3 (一括)
-                    ga_mask = forecasts_df['項目名'].isin(processor.ga_items)
-                    forecasts_df.loc[ga_mask, available_forecast_months] *= (1 - rate * 0.3)
+                adjusted = processor.apply_periods_scenario_rules(
+                    processor._frame_to_matrix(forecasts_df, months)[None],
+                    [st.session_state.selected_period_id],
+                    [months],
+                    [st.session_state.scenario]
+                )
+                forecasts_df = processor._matrix_to_frame(adjusted[0, 0], months)
                 
                 st.session_state.scenario_adjustment_cache = forecasts_df.copy()
                 st.session_state.adjustment_key = adjustment_key
             else:
                 forecasts_df = st.session_state.scenario_adjustment_cache.copy()
         
-        # 補助科目合計の反映（最適化）
-        if not sub_accounts_df.empty:
-            sub_cache_key = (st.session_state.selected_period_id, st.session_state.scenario)
-            if 'sub_account_aggregation_cache' not in st.session_state or st.session_state.get('sub_cache_key') != sub_cache_key:
-                # groupbyで集計（高速）
-                aggregated = sub_accounts_df.groupby(['parent_item', 'month'])['amount'].sum().reset_index()
-                
-                # ピボットテーブルで一括更新（高速化）
-                pivot = aggregated.pivot(index='parent_item', columns='month', values='amount')
-                
-                for parent in pivot.index:
-                    mask = forecasts_df['項目名'] == parent
-                    for month in pivot.columns:
-                        if month in forecasts_df.columns:
-                            forecasts_df.loc[mask, month] = pivot.loc[parent, month]
-                
-                st.session_state.sub_account_aggregation_cache = forecasts_df.copy()
-                st.session_state.sub_cache_key = sub_cache_key
-            else:
-                forecasts_df = st.session_state.sub_account_aggregation_cache.copy()
-        
         # PL計算（キャッシュ）
-        if 'pl_df' not in st.session_state or st.session_state.get('pl_cache_key') != (st.session_state.selected_period_id, st.session_state.scenario, st.session_state.current_month):
-            split_idx = months.index(st.session_state.current_month) + 1 if st.session_state.current_month in months else 0
-            pl_df = processor.calculate_pl(
-                actuals_df,
-                forecasts_df,
-                split_idx,
-                months
+        # 全締月のPLを一括計算しておき、締月の切り替えは取り出すだけにする
+        split_idx = months.index(st.session_state.current_month) + 1 if st.session_state.current_month in months else 0
+        pl_cache_key = (st.session_state.selected_period_id, st.session_state.scenario, st.session_state.current_month)
+        pl_sweep_key = (st.session_state.selected_period_id, st.session_state.scenario)
+        if 'pl_df' not in st.session_state or 'pl_sweep' not in st.session_state or st.session_state.get('pl_sweep_key') != pl_sweep_key:
+            st.session_state.pl_sweep = processor.calculate_pl_sweep(
+                processor._frame_to_matrix(actuals_df, months),
+                processor._frame_to_matrix(forecasts_df, months)
             )
+            st.session_state.pl_sweep_key = pl_sweep_key
+        
+        if 'pl_df' not in st.session_state or st.session_state.get('pl_cache_key') != pl_cache_key:
+            pl_df = processor._pl_matrix_to_frame(st.session_state.pl_sweep[split_idx].copy(), months)
             st.session_state.pl_df = pl_df
-            st.session_state.pl_cache_key = (st.session_state.selected_period_id, st.session_state.scenario, st.session_state.current_month)
+            st.session_state.pl_cache_key = pl_cache_key
         else:
             pl_df = st.session_state.pl_df
         
@@ -917,7 +952,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             with col2:
                 st.markdown(f"実績: {st.session_state.start_date} 〜 {st.session_state.current_month}")
             with col3:
-                scenario_options = ["現実", "楽観", "悲観"]
+                scenario_options = list(get_scenarios_cached(st.session_state.selected_comp_id, processor))
                 current_idx = scenario_options.index(st.session_state.scenario) if st.session_state.scenario in scenario_options else 0
                 selected_scenario = st.selectbox(
                     "シナリオ切替", 
@@ -929,7 +964,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                 if selected_scenario != st.session_state.scenario:
                     st.session_state.scenario = selected_scenario
                     # キャッシュをクリア
-                    for key in ['pl_df', 'forecast_data_cache', 'sub_account_aggregation_cache']:
+                    for key in ['pl_df', 'forecast_data_cache']:
                         if key in st.session_state:
                             del st.session_state[key]
                     st.rerun()
@@ -1126,6 +1161,51 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             
             st.markdown("---")
             
+            # 着地予測の推移（締月ごとの通期着地）
+            st.markdown("### 着地予測の推移")
+            st.caption("各月を実績締月とした場合の通期着地（実績累計＋残り月の予測）")
+            
+            # 全締月のPL（キャッシュ済み）の合計列が締月ごとの通期着地
+            landing = st.session_state.pl_sweep[:, :, -1]  # (締月数+1)×項目
+            sales_landing = landing[1:, processor.item_index['売上高']]
+            op_landing = landing[1:, processor.item_index['営業損益金額']]
+            
+            fig_landing = make_subplots(specs=[[{"secondary_y": True}]])
+            fig_landing.add_trace(
+                go.Scatter(
+                    x=months,
+                    y=sales_landing,
+                    name="売上高（着地）",
+                    line=dict(color='#2563eb', width=3),
+                    mode='lines+markers'
+                ),
+                secondary_y=False
+            )
+            fig_landing.add_trace(
+                go.Scatter(
+                    x=months,
+                    y=op_landing,
+                    name="営業利益（着地）",
+                    line=dict(color='#ea580c', width=3),
+                    mode='lines+markers'
+                ),
+                secondary_y=True
+            )
+            if st.session_state.current_month in months:
+                fig_landing.add_vline(x=st.session_state.current_month, line_dash="dash", line_color="#94a3b8")
+            fig_landing.update_layout(
+                template='plotly_white',
+                xaxis=dict(title="実績締月"),
+                yaxis=dict(title="売上高（円）"),
+                yaxis2=dict(title="営業利益（円）", overlaying='y', side='right'),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                hovermode='x unified',
+                height=400
+            )
+            st.plotly_chart(fig_landing, use_container_width=True)
+            
+            st.markdown("---")
+            
             # 主要指標（Manageboard風）
             st.markdown("### 主要指標")
             
@@ -1186,12 +1266,15 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             # ヘッダー情報
             col1, col2, col3 = st.columns([2, 2, 2])
             with col1:
-                st.markdown(f"**シナリオ:** {st.session_state.scenario}")
+                st.markdown("**入力先シナリオ:** 現実")
             with col2:
                 st.markdown(f"**実績締月:** {st.session_state.current_month}")
             with col3:
                 st.markdown(f"**期間:** {st.session_state.selected_period_num}期")
             
+            if st.session_state.scenario != "現実":
+                st.info(f"予測の入力・保存は現実シナリオに対して行います。「{st.session_state.scenario}」シナリオは現実の予測にシナリオ一括設定のルールを適用して計算されます。")
+            
             st.markdown("---")
             
             # 一括入力機能（Manageboard風）
@@ -1231,14 +1314,15 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                             values = {month: bulk_amount for month in months}
                             success, msg = processor.save_forecast_item(
                                 st.session_state.selected_period_id,
-                                st.session_state.scenario,
+                                "現実",
                                 selected_item,
                                 values
                             )
                             if success:
                                 st.success(f"✅ {selected_item}に全月¥{bulk_amount:,}を設定しました")
                                 # キャッシュクリア
-                                for key in ['forecasts_df', 'forecast_data_cache', 'pl_df']:
+                                st.cache_data.clear()
+                                for key in ['forecasts_df', 'forecast_data_cache', 'pl_df', 'scenario_adjustment_cache']:
                                     if key in st.session_state:
                                         del st.session_state[key]
                                 st.rerun()
@@ -1262,14 +1346,90 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                     
                     if st.button("🔢 前年×係数で計算", use_container_width=True):
                         st.info("前年比率計算機能は今後実装予定です")
-            
+
+                with col2:
+                    st.markdown("**4. 実績から自動予測**")
+                    auto_method = st.selectbox(
+                        "予測手法",
+                        list(AUTO_FORECAST_METHODS),
+                        index=list(AUTO_FORECAST_METHODS).index("holt_winters"),
+                        format_func=lambda x: AUTO_FORECAST_METHODS[x],
+                        key="auto_forecast_method"
+                    )
+                    st.caption("過去の全期の実績から、実績のない月を入力項目すべてについて予測し現実シナリオに上書き保存します。履歴が2年未満の場合は前年同月・直近平均に切り替えます。")
+
+                    col_a, col_b = st.columns(2)
+                    with col_a:
+                        run_auto_forecast = st.button("🤖 この期を自動予測", use_container_width=True, key="run_auto_forecast")
+                    with col_b:
+                        run_auto_forecast_all = st.button("🏢 全社の最新期を自動予測", use_container_width=True, key="run_auto_forecast_all")
+
+                    if run_auto_forecast or run_auto_forecast_all:
+                        with st.spinner("自動予測中..."):
+                            if run_auto_forecast:
+                                _, _, _, (success, msg) = processor.auto_forecast(
+                                    st.session_state.selected_period_id,
+                                    auto_method,
+                                    "現実",
+                                    save=True
+                                )
+                            else:
+                                success, msg = processor.auto_forecast_companies(
+                                    method=auto_method,
+                                    scenario="現実"
+                                )
+                        if success:
+                            st.success(f"✅ {msg}")
+                            st.cache_data.clear()
+                            for key in ['forecasts_df', 'pl_df', 'pl_sweep', 'scenario_adjustment_cache']:
+                                if key in st.session_state:
+                                    del st.session_state[key]
+                            st.rerun()
+                        else:
+                            st.error(f"❌ {msg}")
+
+                st.markdown("---")
+
+                # 年間予算の月次配分
+                st.markdown("**5. 年間予算を前期の季節性で配分**")
+                st.caption("年間額を入力した項目だけを、前期実績の月次構成比（前期がない項目は均等）で全月に配分して現実シナリオに一括保存します。")
+                budget_input = st.data_editor(
+                    pd.DataFrame({"項目名": editable_items_list, "年間予算": np.nan}),
+                    disabled=["項目名"],
+                    hide_index=True,
+                    width="stretch",
+                    height=300,
+                    key="annual_budget_editor"
+                )
+
+                if st.button("📅 年間予算を配分して保存", type="primary", key="distribute_annual_budget"):
+                    annual_amounts = dict(zip(budget_input["項目名"], budget_input["年間予算"]))
+                    if not any(pd.notna(amount) for amount in annual_amounts.values()):
+                        st.warning("年間予算を入力してください")
+                    else:
+                        _, _, (success, msg) = processor.distribute_annual_budget(
+                            st.session_state.selected_period_id,
+                            annual_amounts,
+                            "現実",
+                            save=True
+                        )
+                        if success:
+                            st.success(f"✅ {msg}")
+                            st.cache_data.clear()
+                            for key in ['forecasts_df', 'pl_df', 'pl_sweep', 'scenario_adjustment_cache']:
+                                if key in st.session_state:
+                                    del st.session_state[key]
+                            st.rerun()
+                        else:
+                            st.error(f"❌ {msg}")
+
             st.markdown("---")
-            
-            # 予測データと補助科目データを取得
-            forecast_data = forecasts_df.copy()
+
+            # 予測データ（シナリオ調整前の基準予測）と補助科目データを取得
+            forecast_data = st.session_state.forecasts_df.copy()
             sub_accounts_data = load_sub_accounts_cached(
                 st.session_state.selected_period_id,
-                st.session_state.scenario,
+                "現実",
                 processor
             )
             
@@ -1356,14 +1516,18 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                         success_count = 0
                         error_count = 0
                         
+                        # 編集前との差分（変更のあった行だけを保存する）
+                        deltas = edited_df[month_cols].to_numpy(dtype=float) - edit_df[month_cols].to_numpy(dtype=float)
+                        changed_rows = edited_df[(deltas != 0).any(axis=1)]
+                        
                         # 基本項目を保存
-                        for _, row in edited_df[edited_df['タイプ'] == '基本'].iterrows():
+                        for _, row in changed_rows[changed_rows['タイプ'] == '基本'].iterrows():
                             item_name = row['項目名']
                             values = {month: row[month] for month in month_cols}
                             
                             success, msg = processor.save_forecast_item(
                                 st.session_state.selected_period_id,
-                                st.session_state.scenario,
+                                "現実",
                                 item_name,
                                 values
                             )
@@ -1375,7 +1539,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                                 st.error(f"❌ {item_name}: {msg}")
                         
                         # 補助科目を保存
-                        for _, row in edited_df[edited_df['タイプ'] == '補助'].iterrows():
+                        for _, row in changed_rows[changed_rows['タイプ'] == '補助'].iterrows():
                             full_name = row['項目名']
                             sub_name = full_name.replace('  └ ', '')
                             parent_item = row['親項目']  # 親項目情報を直接取得
@@ -1384,7 +1548,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                             
                             success, msg = processor.save_sub_account(
                                 st.session_state.selected_period_id,
-                                st.session_state.scenario,
+                                "現実",
                                 parent_item,
                                 sub_name,
                                 values
@@ -1398,14 +1562,55 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                         
                         if error_count == 0:
                             st.success(f"✅ {success_count}件のデータを保存しました")
-                            # キャッシュクリア
-                            st.cache_data.clear()
-                            if 'forecasts_df' in st.session_state:
-                                del st.session_state.forecasts_df
-                            if 'sub_accounts_df' in st.session_state:
-                                del st.session_state.sub_accounts_df
-                            if 'pl_df' in st.session_state:
-                                del st.session_state.pl_df
+                            
+                            # シナリオ調整のない基本項目（補助科目なし）のみの変更なら、PLを差分で更新する
+                            # （シナリオ調整や補助科目の合算が絡む場合は従来どおり再計算）
+                            parents_with_subs = set(edit_df.loc[edit_df['タイプ'] == '補助', '親項目'])
+                            incremental = (
+                                st.session_state.scenario == "現実"
+                                and scenario_rates.get("現実", 0.0) == 0
+                                and 'pl_df' in st.session_state
+                                and st.session_state.get('pl_cache_key') == (st.session_state.selected_period_id, st.session_state.scenario, st.session_state.current_month)
+                                and not np.isnan(deltas).any()
+                                and (changed_rows['タイプ'] == '基本').all()
+                                and not changed_rows['項目名'].isin(parents_with_subs).any()
+                                and 'pl_sweep' in st.session_state
+                                and st.session_state.get('pl_sweep_key') == (st.session_state.selected_period_id, st.session_state.scenario)
+                            )
+                            
+                            if incremental:
+                                split_idx = months.index(st.session_state.current_month) + 1 if st.session_state.current_month in months else 0
+                                base_forecasts = st.session_state.forecasts_df
+                                sweep_changes = []
+                                for r, j in zip(*np.nonzero(deltas)):
+                                    item_name = edited_df['項目名'].iloc[r]
+                                    month = month_cols[j]
+                                    base_forecasts.loc[base_forecasts['項目名'] == item_name, month] = edited_df[month].iloc[r]
+                                    sweep_changes.append((item_name, months.index(month), deltas[r, j]))
+                                
+                                # 全締月のPLを差分で更新（締月kのPLでは序数k以降の月が予測なので、その変更だけ反映）
+                                pl_sweep = st.session_state.pl_sweep
+                                last_month = max((col for _, col, _ in sweep_changes), default=-1)
+                                for k in range(last_month + 1):
+                                    processor.apply_pl_changes(
+                                        pl_sweep[k],
+                                        [(item, col, delta) for item, col, delta in sweep_changes if col >= k]
+                                    )
+                                # 表示中のPLは更新済みの締月のPLから作り直す
+                                st.session_state.pl_df = processor._pl_matrix_to_frame(pl_sweep[split_idx].copy(), months)
+                                
+                                # 予測データに依存するキャッシュだけを破棄
+                                load_base_forecast_cached.clear()
+                                calculate_scenario_forecasts_cached.clear()
+                                load_periods_data_cached.clear()
+                                if 'scenario_adjustment_cache' in st.session_state:
+                                    del st.session_state.scenario_adjustment_cache
+                            else:
+                                # キャッシュクリア（予測データから作った調整・合算済みのコピーも破棄）
+                                st.cache_data.clear()
+                                for key in ['forecasts_df', 'pl_df', 'scenario_adjustment_cache']:
+                                    if key in st.session_state:
+                                        del st.session_state[key]
                             st.rerun()
                         else:
                             st.warning(f"⚠️ {success_count}件成功、{error_count}件失敗")
@@ -1431,7 +1636,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                         
                         success, msg = processor.save_sub_account(
                             st.session_state.selected_period_id,
-                            st.session_state.scenario,
+                            "現実",
                             parent_item,
                             new_sub_name,
                             values
@@ -1449,8 +1654,6 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                     st.cache_data.clear()
                     if 'forecasts_df' in st.session_state:
                         del st.session_state.forecasts_df
-                    if 'sub_accounts_df' in st.session_state:
-                        del st.session_state.sub_accounts_df
                     st.rerun()
             
         
@@ -1464,81 +1667,152 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             </div>
             """, unsafe_allow_html=True)
             
-            # CFデータを計算
-            cf_data = processor.calculate_cash_flow(st.session_state.selected_period_id)
+            # CFの前提条件（経営指標ページの貸借対照表でも同じ前提を使う）
+            st.markdown("### ⚙️ 前提条件")
+            saved_assumptions = st.session_state.get('cf_assumptions', {})
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                cf_receivable_months = st.number_input("売掛金の回収サイト（月）", value=float(saved_assumptions.get('receivable_months', 1.0)), min_value=0.0, max_value=12.0, step=0.5, key="cf_receivable_months")
+                cf_payable_months = st.number_input("買掛金の支払サイト（月）", value=float(saved_assumptions.get('payable_months', 1.0)), min_value=0.0, max_value=12.0, step=0.5, key="cf_payable_months")
+            with col2:
+                cf_capex = st.number_input("設備投資（月額・円）", value=int(saved_assumptions.get('capex', 0)), min_value=0, step=100000, key="cf_capex")
+            with col3:
+                cf_borrowing = st.number_input("新規借入（月額・円）", value=int(saved_assumptions.get('borrowing', 0)), min_value=0, step=100000, key="cf_borrowing")
+                cf_repayment = st.number_input("借入金返済（月額・円）", value=int(saved_assumptions.get('repayment', 0)), min_value=0, step=100000, key="cf_repayment")
+            
+            cf_assumptions = {
+                'receivable_months': cf_receivable_months,
+                'payable_months': cf_payable_months,
+                'capex': cf_capex,
+                'borrowing': cf_borrowing,
+                'repayment': cf_repayment,
+            }
+            st.session_state.cf_assumptions = cf_assumptions
+            
+            # 期首残高（現金・売掛金・買掛金）から貸借対照表と同じ繰り越し計算でCFを求める（データ更新までキャッシュ）
+            bs_result = processor.calculate_balance_sheets(
+                [st.session_state.selected_period_id],
+                st.session_state.scenario,
+                split_idx,
+                **cf_assumptions
+            )
+            opening = bs_result['opening'][0]
+            st.caption(
+                f"期首残高: 現金 ¥{safe_int(opening[BALANCE_SHEET_ITEMS.index('現金及び預金')]):,}"
+                f" / 売掛金 ¥{safe_int(opening[BALANCE_SHEET_ITEMS.index('売掛金')]):,}"
+                f" / 買掛金 ¥{safe_int(opening[BALANCE_SHEET_ITEMS.index('買掛金')]):,}"
+                "（システム設定の「会計期間設定」で変更できます）"
+            )
+            cf_columns = list(months) + ['合計']
+            cf_df = pd.DataFrame(bs_result['cash_flow'][0], index=CASH_FLOW_ITEMS, columns=cf_columns)
             
-            if cf_data:
+            if not cf_df.empty:
                 # 各カテゴリのサマリーカード
-                col1, col2, col3 = st.columns(3)
+                col1, col2, col3, col4 = st.columns(4)
                 
                 with col1:
-                    operating_cf_total = sum([v for v in cf_data.get("営業活動によるキャッシュフロー", {}).values() if pd.notna(v)])
                     st.markdown(f"""
                     <div class="summary-card-blue">
                         <div class="card-title">営業活動CF</div>
-                        <div class="card-value">¥{safe_int(operating_cf_total):,}</div>
+                        <div class="card-value">¥{safe_int(cf_df.loc["営業活動によるキャッシュフロー", '合計']):,}</div>
                         <div class="card-subtitle">本業で稼いだ現金</div>
                     </div>
                     """, unsafe_allow_html=True)
                 
                 with col2:
-                    investing_cf_total = sum([v for v in cf_data.get("投資活動によるキャッシュフロー", {}).values() if pd.notna(v)])
                     st.markdown(f"""
                     <div class="summary-card-orange">
                         <div class="card-title">投資活動CF</div>
-                        <div class="card-value">¥{safe_int(investing_cf_total):,}</div>
+                        <div class="card-value">¥{safe_int(cf_df.loc["投資活動によるキャッシュフロー", '合計']):,}</div>
                         <div class="card-subtitle">設備投資などの支出</div>
                     </div>
                     """, unsafe_allow_html=True)
                 
                 with col3:
-                    financing_cf_total = sum([v for v in cf_data.get("財務活動によるキャッシュフロー", {}).values() if pd.notna(v)])
                     st.markdown(f"""
                     <div class="summary-card-purple">
                         <div class="card-title">財務活動CF</div>
-                        <div class="card-value">¥{safe_int(financing_cf_total):,}</div>
+                        <div class="card-value">¥{safe_int(cf_df.loc["財務活動によるキャッシュフロー", '合計']):,}</div>
                         <div class="card-subtitle">借入・返済の収支</div>
                     </div>
                     """, unsafe_allow_html=True)
                 
+                with col4:
+                    closing_cash = cf_df.loc["現金及び現金同等物の期末残高", '合計']
+                    st.markdown(f"""
+                    <div class="summary-card-{'green' if closing_cash >= 0 else 'orange'}">
+                        <div class="card-title">期末現金残高</div>
+                        <div class="card-value">¥{safe_int(closing_cash):,}</div>
+                        <div class="card-subtitle">{'資金は足りています' if closing_cash >= 0 else '資金不足に注意'}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+                
                 # 詳細テーブル
                 st.markdown("### 📊 月次キャッシュフロー推移")
+                st.dataframe(cf_df.style.format("¥{:,.0f}"), width="stretch", height=500)
                 
-                cf_rows = []
-                for category, month_data in cf_data.items():
-                    row = {"項目": category}
-                    row.update(month_data)
-                    cf_rows.append(row)
+                # グラフ
+                st.markdown("### 📈 キャッシュフロー推移グラフ")
+                fig = go.Figure()
                 
-                if cf_rows:
-                    cf_df = pd.DataFrame(cf_rows)
-                    st.dataframe(cf_df, width="stretch", height=300)
-                    
-                    # グラフ
-                    st.markdown("### 📈 キャッシュフロー推移グラフ")
-                    fig = go.Figure()
-                    
-                    for category in cf_data.keys():
-                        months_list = list(cf_data[category].keys())
-                        values_list = [cf_data[category][m] for m in months_list]
-                        
-                        fig.add_trace(go.Scatter(
-                            x=months_list,
-                            y=values_list,
-                            mode='lines+markers',
-                            name=category,
-                            line=dict(width=3)
-                        ))
-                    
-                    fig.update_layout(
-                        xaxis_title="月",
-                        yaxis_title="金額 (円)",
-                        hovermode='x unified',
-                        height=500,
-                        template="plotly_white"
-                    )
-                    
-                    st.plotly_chart(fig, use_container_width=True)
+                for category in ["営業活動によるキャッシュフロー", "投資活動によるキャッシュフロー", "財務活動によるキャッシュフロー"]:
+                    fig.add_trace(go.Bar(
+                        x=list(months),
+                        y=cf_df.loc[category, list(months)],
+                        name=category
+                    ))
+                
+                fig.add_trace(go.Scatter(
+                    x=list(months),
+                    y=cf_df.loc["現金及び現金同等物の期末残高", list(months)],
+                    mode='lines+markers',
+                    name="期末現金残高",
+                    line=dict(color='#2e7d32', width=3)
+                ))
+                
+                fig.update_layout(
+                    barmode='relative',
+                    xaxis_title="月",
+                    yaxis_title="金額 (円)",
+                    hovermode='x unified',
+                    height=500,
+                    template="plotly_white"
+                )
+                
+                st.plotly_chart(fig, use_container_width=True)
+                
+                # シナリオ別の現金残高（全シナリオを一括計算）
+                st.markdown("### 🔀 シナリオ別の現金残高")
+                cf_scenarios = list(get_scenarios_cached(st.session_state.selected_comp_id, processor))
+                scenario_cube, _, _ = calculate_scenario_forecasts_cached(
+                    st.session_state.selected_period_id,
+                    tuple(cf_scenarios),
+                    processor
+                )
+                _, scenario_cf = processor.calculate_balance_sheet_matrix(
+                    processor.calculate_pl_batch(scenario_cube, split_idx, processor._frame_to_matrix(actuals_df, months)),
+                    opening,
+                    **cf_assumptions
+                )
+                cash_row = CASH_FLOW_ITEMS.index("現金及び現金同等物の期末残高")
+                
+                fig_scenario = go.Figure()
+                for s, scenario in enumerate(cf_scenarios):
+                    fig_scenario.add_trace(go.Scatter(
+                        x=list(months),
+                        y=scenario_cf[s, cash_row, :-1],
+                        mode='lines+markers',
+                        name=scenario
+                    ))
+                fig_scenario.update_layout(
+                    xaxis_title="月",
+                    yaxis_title="期末現金残高 (円)",
+                    hovermode='x unified',
+                    height=400,
+                    template="plotly_white"
+                )
+                st.plotly_chart(fig_scenario, use_container_width=True)
+                st.caption("シナリオ別の残高は各シナリオの入力済み予測（締月までは実績）から計算しています。")
             else:
                 st.warning("キャッシュフローデータがありません。")
         
@@ -1551,18 +1825,22 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             </div>
             """, unsafe_allow_html=True)
             
-            # 経営指標を計算
-            indicators = processor.calculate_financial_indicators(st.session_state.selected_period_id)
+            # 経営指標を計算（締月までは実績、以降は予測のPLから。データ更新までキャッシュ）
+            indicators = processor.calculate_financial_indicators(
+                st.session_state.selected_period_id,
+                st.session_state.scenario,
+                split_idx
+            )
             
             if indicators:
-                # 最新月の指標を取得
-                latest_month = list(indicators.keys())[-1] if indicators else None
+                # 締月（なければ最終月）の指標を取得
+                latest_month = st.session_state.current_month if st.session_state.current_month in indicators else list(indicators.keys())[-1]
                 
                 if latest_month:
                     latest_indicators = indicators[latest_month]
                     
                     # KPIカード
-                    st.markdown("### 📈 主要経営指標（最新月）")
+                    st.markdown(f"### 📈 主要経営指標（{latest_month}）")
                     
                     col1, col2, col3, col4 = st.columns(4)
                     
@@ -1659,6 +1937,68 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                     
                     st.plotly_chart(fig, use_container_width=True)
                     
+                    # 月次・累計・通期の指標一覧
+                    st.markdown("### 📋 指標一覧（月次・累計・通期）")
+                    indicator_result = processor.calculate_indicators(
+                        [st.session_state.selected_period_id],
+                        st.session_state.scenario,
+                        split_idx
+                    )
+                    indicator_tabs = st.tabs(["月次", "累計"])
+                    with indicator_tabs[0]:
+                        monthly_df = pd.DataFrame(
+                            indicator_result['monthly'][0],
+                            index=indicator_result['names'],
+                            columns=months_list + ['通期']
+                        )
+                        st.dataframe(monthly_df.style.format("{:.1f}%"), width="stretch")
+                    with indicator_tabs[1]:
+                        ytd_df = pd.DataFrame(
+                            indicator_result['ytd'][0],
+                            index=indicator_result['names'],
+                            columns=months_list
+                        )
+                        st.dataframe(ytd_df.style.format("{:.1f}%"), width="stretch")
+                    
+                    # 期別の通期指標（実績）
+                    all_periods = get_company_periods_cached(st.session_state.selected_comp_id, processor)
+                    if len(all_periods) > 1:
+                        st.markdown("### 🗓️ 期別の通期指標（実績）")
+                        period_result = processor.calculate_indicators(all_periods['id'].tolist())
+                        period_df = pd.DataFrame(
+                            period_result['monthly'][:, :, -1],
+                            index=[f"第{num}期" for num in all_periods['period_num']],
+                            columns=period_result['names']
+                        )
+                        st.dataframe(period_df.style.format("{:.1f}%"), width="stretch")
+                    
+                    # 貸借対照表の指標（期首残高から月次で繰り越し）
+                    st.markdown("### 🏦 安全性・資本効率の指標")
+                    st.caption("システム設定で登録した期首残高から、PLとキャッシュフロー（前提はキャッシュフロー計算書のページと共通）で月末の貸借対照表を繰り越して計算します。ROA・ROEは期首からの累計利益ベースです。")
+                    bs_result = processor.calculate_balance_sheets(
+                        [st.session_state.selected_period_id],
+                        st.session_state.scenario,
+                        split_idx,
+                        **st.session_state.get('cf_assumptions', {})
+                    )
+                    balance_tabs = st.tabs(["指標", "月末貸借対照表"])
+                    with balance_tabs[0]:
+                        balance_ratio_df = pd.DataFrame(
+                            bs_result['ratios'][0],
+                            index=BALANCE_RATIOS,
+                            columns=months_list + ['通期']
+                        )
+                        st.dataframe(balance_ratio_df.style.format("{:.1f}%"), width="stretch")
+                    with balance_tabs[1]:
+                        balance_df = pd.DataFrame(
+                            bs_result['balances'][0],
+                            index=BALANCE_SHEET_ITEMS,
+                            columns=months_list
+                        )
+                        st.dataframe(balance_df.style.format("¥{:,.0f}"), width="stretch")
+                    if not bs_result['opening'].any():
+                        st.info("期首残高が未登録です。システム設定の「会計期間設定」から登録してください。")
+                    
                     # 推奨改善アクション
                     st.markdown("### 💡 推奨改善アクション")
                     
@@ -1701,53 +2041,27 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             </div>
             """, unsafe_allow_html=True)
             
-            # 損益分岐点を計算（予測データを使用）
-            forecasts = load_forecast_data_cached(
-                st.session_state.selected_period_id,
+            # 実績・予測を締月で切り替えたPLから月次・累計の損益分岐点を計算（データ更新までキャッシュ）
+            breakeven = processor.calculate_breakeven(
+                [st.session_state.selected_period_id],
                 st.session_state.scenario,
-                processor
+                split_idx
             )
             
-            if not forecasts.empty:
-                months = [col for col in forecasts.columns if col not in ['項目名']]
+            if breakeven['months'][0]:
+                months = list(breakeven['months'][0])
                 
-                # 売上高
-                sales_row = forecasts[forecasts['項目名'] == '売上高']
-                total_sales = 0
-                if not sales_row.empty:
-                    for month in months:
-                        if month in sales_row.columns:
-                            val = sales_row[month].iloc[0]
-                            if pd.notna(val):
-                                total_sales += float(val)
-                
-                # 変動費（売上原価）
-                vc_row = forecasts[forecasts['項目名'] == '売上原価']
-                total_vc = 0
-                if not vc_row.empty:
-                    for month in months:
-                        if month in vc_row.columns:
-                            val = vc_row[month].iloc[0]
-                            if pd.notna(val):
-                                total_vc += float(val)
-                
-                # 固定費（販管費）
-                total_fc = 0
-                for item in processor.ga_items:
-                    item_row = forecasts[forecasts['項目名'] == item]
-                    if not item_row.empty:
-                        for month in months:
-                            if month in item_row.columns:
-                                val = item_row[month].iloc[0]
-                                if pd.notna(val):
-                                    total_fc += float(val)
+                breakeven_total = {name: float(values[0, -1]) for name, values in breakeven['monthly'].items()}
+                total_sales = breakeven_total['売上高']
+                total_vc = breakeven_total['変動費']
+                total_fc = breakeven_total['固定費']
                 
                 # 計算
-                contribution_margin = total_sales - total_vc
-                contribution_margin_ratio = (contribution_margin / total_sales * 100) if total_sales > 0 else 0
-                breakeven_sales = (total_fc / (contribution_margin_ratio / 100)) if contribution_margin_ratio > 0 else 0
+                contribution_margin = breakeven_total['限界利益']
+                contribution_margin_ratio = breakeven_total['限界利益率']
+                breakeven_sales = breakeven_total['損益分岐点売上高']
                 safety_margin = total_sales - breakeven_sales
-                safety_margin_ratio = (safety_margin / total_sales * 100) if total_sales > 0 else 0
+                safety_margin_ratio = breakeven_total['安全余裕率']
                 
                 # サマリーカード
                 col1, col2, col3 = st.columns(3)
@@ -1896,7 +2210,71 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                 )
                 
                 st.plotly_chart(fig, use_container_width=True)
-                
+
+                # 累計の損益分岐点の推移
+                st.markdown("### 📅 累計売上高と損益分岐点売上高の推移")
+                cumulative = breakeven['cumulative']
+                breakeven_months = breakeven['months'][0]
+                fig_cumulative = go.Figure()
+                fig_cumulative.add_trace(go.Scatter(
+                    x=breakeven_months,
+                    y=cumulative['売上高'][0, :len(breakeven_months)],
+                    mode='lines+markers',
+                    name='累計売上高',
+                    line=dict(color='#2e7d32', width=3)
+                ))
+                fig_cumulative.add_trace(go.Scatter(
+                    x=breakeven_months,
+                    y=cumulative['損益分岐点売上高'][0, :len(breakeven_months)],
+                    mode='lines+markers',
+                    name='累計損益分岐点売上高',
+                    line=dict(color='#f57c00', width=3, dash='dash')
+                ))
+                fig_cumulative.update_layout(
+                    yaxis_title="金額 (円)",
+                    height=400,
+                    template="plotly_white",
+                    hovermode='x unified'
+                )
+                st.plotly_chart(fig_cumulative, use_container_width=True)
+
+                # 目標利益の逆算
+                st.markdown("### 🎯 目標利益の逆算")
+                st.caption("上記と同じPLから、目標利益に必要な売上高と費用の上限を月別・通期で計算します（変動費率一定）。")
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    goal_item = st.selectbox("目標項目", ["営業損益金額", "当期純損益金額"], key="goal_seek_item")
+                with col2:
+                    goal_target = st.number_input("通期の目標額（円）", value=0, step=1000000, key="goal_seek_target")
+
+                goal_columns = list(months) + ['合計']
+                try:
+                    goal = processor.goal_seek(
+                        breakeven['pl'][0],
+                        goal_target,
+                        goal_item
+                    )
+                except ValueError as e:
+                    goal = None
+                    st.warning(f"⚠️ 目標利益を逆算できません: {e}")
+                
+                if goal is not None:
+                    goal_df = pd.DataFrame(
+                        {key: values for key, values in goal.items()},
+                        index=goal_columns
+                    ).T
+
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("必要売上高（通期）", f"¥{safe_int(goal['必要売上高'][-1]):,}", f"¥{safe_int(goal['売上高差額'][-1]):,}")
+                    with col2:
+                        st.metric("販管費の上限（通期）", f"¥{safe_int(goal['固定費上限'][-1]):,}")
+                    with col3:
+                        st.metric("売上原価の上限（通期）", f"¥{safe_int(goal['変動費上限'][-1]):,}")
+
+                    st.dataframe(goal_df.style.format("¥{:,.0f}", na_rep="-"), width="stretch")
+
                 # 改善提案
                 st.markdown("### 💡 改善提案")
                 
@@ -1929,7 +2307,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                     </div>
                     """, unsafe_allow_html=True)
             else:
-                st.warning("予測データがありません。予測データを入力してください。")
+                st.warning("会計期の月が取得できません。会計期間設定を確認してください。")
         
         elif st.session_state.page == "予測 VS 実績比較":
             st.title("予実比較")
@@ -1942,11 +2320,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             
             # 実績データと予測データを取得
             actuals = actuals_df.copy()
-            forecasts = load_forecast_data_cached(
-                st.session_state.selected_period_id,
-                st.session_state.scenario,
-                processor
-            )
+            forecasts = forecasts_df.copy()
             
             # 比較テーブルを作成
             comparison_rows = []
@@ -2027,36 +2401,29 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             
             st.markdown("""
             <div class="info-box">
-                <strong>💡 概要:</strong> 3つのシナリオ（現実・楽観・悲観）を横並びで比較します。
+                <strong>💡 概要:</strong> 会社のシナリオ（現実・楽観・悲観など）の通期着地（実績＋各シナリオの予測）を横並びで比較します。
             </div>
             """, unsafe_allow_html=True)
             
-            # 3シナリオのデータを取得
-            scenarios = ["現実", "楽観", "悲観"]
-            scenario_data = {}
+            # 会社の全シナリオの予測を一括で作成（シナリオ×項目×月）
+            scenarios = list(get_scenarios_cached(st.session_state.selected_comp_id, processor))
+            forecast_cube, _, _ = calculate_scenario_forecasts_cached(
+                st.session_state.selected_period_id,
+                tuple(scenarios),
+                processor
+            )
             
-            for scenario in scenarios:
-                forecast_data = load_forecast_data_cached(
-                    st.session_state.selected_period_id,
-                    scenario,
-                    processor
-                )
-                
-                if not forecast_data.empty:
-                    # 合計を計算
-                    month_cols = [col for col in forecast_data.columns if col not in ['項目名']]
-                    scenario_data[scenario] = {}
-                    
-                    for item in processor.all_items:
-                        item_row = forecast_data[forecast_data['項目名'] == item]
-                        if not item_row.empty:
-                            total = 0
-                            for month in month_cols:
-                                if month in item_row.columns:
-                                    val = item_row[month].iloc[0]
-                                    if pd.notna(val):
-                                        total += float(val)
-                            scenario_data[scenario][item] = total
+            # 実績＋各シナリオ予測の着地PLを一括計算（シナリオ×項目×(月+合計)）
+            split_idx = months.index(st.session_state.current_month) + 1 if st.session_state.current_month in months else 0
+            scenario_pl = processor.calculate_pl_batch(
+                forecast_cube,
+                split_idx,
+                processor._frame_to_matrix(actuals_df, months)
+            )
+            scenario_data = {
+                scenario: dict(zip(processor.all_items, scenario_pl[s, :, -1].tolist()))
+                for s, scenario in enumerate(scenarios)
+            }
             
             if scenario_data:
                 # 比較テーブル
@@ -2066,10 +2433,13 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                 
                 # 主要項目のみ表示
                 key_items = [
-                    "売上高", "売上原価", "販売費及び一般管理費合計",
+                    "売上高", "売上原価", "販売管理費計",
                     "営業損益金額", "経常損益金額", "当期純損益金額"
                 ]
                 
+                # 現実を基準に、その他のシナリオとの差異を並べる
+                compare_scenarios = [scenario for scenario in scenarios if scenario != "現実"]
+                
                 for item in key_items:
                     if item in scenario_data.get("現実", {}):
                         row = {"項目": item}
@@ -2077,7 +2447,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                         base_value = scenario_data["現実"].get(item, 0)
                         row["現実"] = base_value
                         
-                        for scenario in ["楽観", "悲観"]:
+                        for scenario in compare_scenarios:
                             value = scenario_data[scenario].get(item, 0)
                             row[scenario] = value
                             
@@ -2111,7 +2481,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                         
                         # 差異ポイント
                         base_rate = row.get("現実", 0)
-                        for scenario in ["楽観", "悲観"]:
+                        for scenario in compare_scenarios:
                             rate = row.get(scenario, 0)
                             diff_pt = rate - base_rate
                             row[f"{scenario}_diff"] = f"{diff_pt:+.1f}pt"
@@ -2120,35 +2490,25 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                 
                 comparison_df = pd.DataFrame(comparison_rows)
                 
-                # フォーマット設定
+                # フォーマット設定（差異列は「<シナリオ> 差異」）
                 def format_row(row):
                     if "率" in row['項目']:
                         # 利益率の行
-                        return {
-                            '項目': row['項目'],
-                            '現実': f"{row['現実']:.1f}%",
-                            '楽観': f"{row['楽観']:.1f}%",
-                            '楽観_差異': row['楽観_diff'],
-                            '悲観': f"{row['悲観']:.1f}%",
-                            '悲観_差異': row['悲観_diff']
-                        }
+                        formatted = {'項目': row['項目'], '現実': f"{row['現実']:.1f}%"}
+                        for scenario in compare_scenarios:
+                            formatted[scenario] = f"{row[scenario]:.1f}%"
+                            formatted[f"{scenario} 差異"] = row[f"{scenario}_diff"]
                     else:
                         # 金額の行
-                        return {
-                            '項目': row['項目'],
-                            '現実': f"¥{safe_int(row['現実']):,}",
-                            '楽観': f"¥{safe_int(row['楽観']):,}",
-                            '楽観_差異': row['楽観_diff'],
-                            '悲観': f"¥{safe_int(row['悲観']):,}",
-                            '悲観_差異': row['悲観_diff']
-                        }
+                        formatted = {'項目': row['項目'], '現実': f"¥{safe_int(row['現実']):,}"}
+                        for scenario in compare_scenarios:
+                            formatted[scenario] = f"¥{safe_int(row[scenario]):,}"
+                            formatted[f"{scenario} 差異"] = row[f"{scenario}_diff"]
+                    return formatted
                 
                 formatted_rows = [format_row(row) for _, row in comparison_df.iterrows()]
                 display_df = pd.DataFrame(formatted_rows)
                 
-                # カラム名を整理
-                display_df.columns = ['項目', '現実', '楽観', '差異', '悲観', '差異 ']
-                
                 st.dataframe(
                     display_df,
                     use_container_width=True,
@@ -2161,6 +2521,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                 # グラフ: 営業利益の比較
                 st.markdown("### 📈 営業利益の比較")
                 
+                scenario_colors = ['#1976d2', '#2e7d32', '#f57c00', '#7b1fa2', '#00838f']
                 operating_profits = []
                 for scenario in scenarios:
                     operating_profits.append(scenario_data[scenario].get("営業損益金額", 0))
@@ -2169,7 +2530,7 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                     go.Bar(
                         x=scenarios,
                         y=operating_profits,
-                        marker_color=['#1976d2', '#2e7d32', '#f57c00'],
+                        marker_color=[scenario_colors[s % len(scenario_colors)] for s in range(len(scenarios))],
                         text=[f"¥{safe_int(v):,}" for v in operating_profits],
                         textposition='auto',
                     )
@@ -2194,6 +2555,144 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                 )
             else:
                 st.warning("シナリオデータがありません。")
+
+            # 感応度分析（トルネード・2変数グリッド）
+            st.markdown("---")
+            st.markdown("### 📐 感応度分析")
+            st.caption(f"選択中のシナリオ（{st.session_state.scenario}）の予測月を項目ごとに増減させたときの通期着地への影響です。")
+
+            split_idx = months.index(st.session_state.current_month) + 1 if st.session_state.current_month in months else 0
+            actual_matrix = processor._frame_to_matrix(actuals_df, months)
+            forecast_matrix = processor._frame_to_matrix(forecasts_df, months)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                sens_rate = st.number_input("変化率 (±%)", value=10.0, min_value=1.0, max_value=100.0, step=1.0, key="sens_rate") / 100.0
+            with col2:
+                sens_target = st.selectbox("対象", ["営業損益金額", "当期純損益金額"], key="sens_target")
+
+            sensitivity = processor.calculate_sensitivity(actual_matrix, forecast_matrix, split_idx, sens_rate, targets=(sens_target,))
+            up_col, down_col = sensitivity.columns[2], sensitivity.columns[3]
+            tornado = sensitivity[(sensitivity[up_col] != 0) | (sensitivity[down_col] != 0)].head(10).iloc[::-1]
+
+            if not tornado.empty:
+                fig_tornado = go.Figure()
+                fig_tornado.add_trace(go.Bar(y=tornado['項目名'], x=tornado[up_col], orientation='h', name=up_col, marker_color='#2e7d32'))
+                fig_tornado.add_trace(go.Bar(y=tornado['項目名'], x=tornado[down_col], orientation='h', name=down_col, marker_color='#c62828'))
+                fig_tornado.update_layout(
+                    barmode='overlay',
+                    xaxis_title=f"{sens_target}の変化（円）",
+                    height=max(300, 40 * len(tornado) + 100),
+                    template="plotly_white"
+                )
+                st.plotly_chart(fig_tornado, use_container_width=True)
+            else:
+                st.info("予測月のデータがないため、感応度を計算できません。")
+
+            # 2変数グリッド
+            editable_items = [item for item in processor.all_items if item not in processor.calculated_items]
+            grid_items = editable_items + [GA_TOTAL_ITEM]
+            col1, col2 = st.columns(2)
+            with col1:
+                grid_row_item = st.selectbox("縦軸の項目", grid_items, index=grid_items.index("売上高"), key="sens_grid_row")
+            with col2:
+                grid_col_item = st.selectbox("横軸の項目", grid_items, index=grid_items.index("売上原価"), key="sens_grid_col")
+
+            grid_rates = np.linspace(-0.2, 0.2, 9)
+            grid = processor.calculate_sensitivity_grid(
+                actual_matrix, forecast_matrix, split_idx,
+                row_item=grid_row_item, col_item=grid_col_item,
+                row_rates=grid_rates, col_rates=grid_rates, target=sens_target
+            )
+            fig_grid = go.Figure(data=go.Heatmap(
+                z=grid.values,
+                x=list(grid.columns),
+                y=list(grid.index),
+                colorscale='RdYlGn',
+                text=[[f"¥{safe_int(v):,}" for v in row] for row in grid.values],
+                hovertemplate=f"{grid_row_item}: %{{y}}<br>{grid_col_item}: %{{x}}<br>{sens_target}: %{{text}}<extra></extra>"
+            ))
+            fig_grid.update_layout(
+                xaxis_title=f"{grid_col_item}の変化率",
+                yaxis_title=f"{grid_row_item}の変化率",
+                height=450,
+                template="plotly_white"
+            )
+            st.plotly_chart(fig_grid, use_container_width=True)
+
+            # 確率的な着地予測（モンテカルロ）
+            st.markdown("---")
+            st.markdown("### 🎲 確率的着地予測（モンテカルロ）")
+            st.caption(f"選択中のシナリオ（{st.session_state.scenario}）の予測月に月次のランダムな変動を与え、通期着地の分布を求めます。")
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                mc_sales_sigma = st.number_input("売上高の変動 (σ, %)", value=10.0, min_value=0.0, max_value=100.0, step=1.0, key="mc_sales_sigma") / 100.0
+            with col2:
+                mc_cogs_sigma = st.number_input("売上原価の変動 (σ, %)", value=5.0, min_value=0.0, max_value=100.0, step=1.0, key="mc_cogs_sigma") / 100.0
+            with col3:
+                mc_ga_sigma = st.number_input("販管費の変動 (σ, %)", value=3.0, min_value=0.0, max_value=100.0, step=1.0, key="mc_ga_sigma") / 100.0
+            with col4:
+                mc_corr = st.number_input("売上・原価の相関", value=0.8, min_value=-0.99, max_value=0.99, step=0.05, key="mc_corr")
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                mc_distribution = st.selectbox("分布", ["normal", "lognormal"], format_func=lambda x: {"normal": "正規分布", "lognormal": "対数正規分布"}[x], key="mc_distribution")
+            with col2:
+                mc_paths = st.selectbox("試行回数", [10000, 50000, 100000], index=2, format_func=lambda x: f"{x:,}回", key="mc_paths")
+            with col3:
+                mc_seed = st.number_input("乱数シード", value=42, min_value=0, step=1, key="mc_seed")
+            
+            # 結果は実行時の条件と組で保持し、期・シナリオ・締月・入力・データが変わったら表示しない
+            split_idx = months.index(st.session_state.current_month) + 1 if st.session_state.current_month in months else 0
+            monte_carlo_key = (
+                st.session_state.selected_period_id,
+                st.session_state.scenario,
+                split_idx,
+                (mc_sales_sigma, mc_cogs_sigma, mc_ga_sigma, mc_corr, mc_distribution, mc_paths, int(mc_seed)),
+                processor._data_version
+            )
+            
+            if st.button("▶️ シミュレーション実行", type="primary", key="run_monte_carlo"):
+                st.session_state.monte_carlo_key = monte_carlo_key
+                with st.spinner("シミュレーション中..."):
+                    st.session_state.monte_carlo_result = processor.simulate_landing(
+                        processor._frame_to_matrix(actuals_df, months),
+                        processor._frame_to_matrix(forecasts_df, months),
+                        split_idx,
+                        {
+                            "売上高": {'sigma': mc_sales_sigma, 'distribution': mc_distribution},
+                            "売上原価": {'sigma': mc_cogs_sigma, 'distribution': mc_distribution},
+                            "販売管理費計": {'sigma': mc_ga_sigma, 'distribution': mc_distribution},
+                        },
+                        correlations={("売上高", "売上原価"): mc_corr},
+                        n_paths=mc_paths,
+                        seed=int(mc_seed)
+                    )
+            
+            if 'monte_carlo_result' in st.session_state and st.session_state.get('monte_carlo_key') == monte_carlo_key:
+                mc_result = st.session_state.monte_carlo_result
+                st.dataframe(
+                    mc_result['summary'].style.format("¥{:,.0f}"),
+                    use_container_width=True
+                )
+                
+                # 営業利益の累計着地の分布（ファンチャート）
+                bands = mc_result['bands']["営業損益金額"]
+                fig_mc = go.Figure()
+                fig_mc.add_trace(go.Scatter(x=months, y=bands['P95'], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+                fig_mc.add_trace(go.Scatter(x=months, y=bands['P5'], fill='tonexty', fillcolor='rgba(37,99,235,0.15)', line=dict(width=0), name="5〜95%"))
+                fig_mc.add_trace(go.Scatter(x=months, y=bands['P75'], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+                fig_mc.add_trace(go.Scatter(x=months, y=bands['P25'], fill='tonexty', fillcolor='rgba(37,99,235,0.35)', line=dict(width=0), name="25〜75%"))
+                fig_mc.add_trace(go.Scatter(x=months, y=bands['P50'], line=dict(color='#2563eb', width=3), name="中央値"))
+                fig_mc.update_layout(
+                    yaxis_title="営業利益 累計（円）",
+                    height=400,
+                    template="plotly_white",
+                    hovermode='x unified'
+                )
+                st.plotly_chart(fig_mc, use_container_width=True)
+                st.caption(f"試行回数: {mc_result['n_paths']:,}回")
         
         elif st.session_state.page == "期間比較分析":
             st.title("期間比較")
@@ -2232,45 +2731,38 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                 if period1_id == period2_id:
                     st.warning("異なる期を選択してください。")
                 else:
-                    # 両期間のデータを取得
-                    data1 = load_actual_data_cached(period1_id, processor)
-                    data2 = load_actual_data_cached(period2_id, processor)
+                    # 両期間のデータを1クエリで取得（期×項目×月）
+                    actual_cube, _, _ = load_periods_data_cached(
+                        (period1_id, period2_id),
+                        processor
+                    )
+                    # 両期のPL（計算項目を含む）を一括計算し、合計列を比較
+                    totals1, totals2 = processor.calculate_pl_batch(actual_cube)[..., -1]
                     
-                    months1 = get_fiscal_months_cached(st.session_state.selected_comp_id, period1_id, processor)
-                    months2 = get_fiscal_months_cached(st.session_state.selected_comp_id, period2_id, processor)
+                    period1_label = f"第{all_periods[all_periods['id']==period1_id]['period_num'].iloc[0]}期"
+                    period2_label = f"第{all_periods[all_periods['id']==period2_id]['period_num'].iloc[0]}期"
                     
                     # 比較テーブルを作成
-                    period_comparison_rows = []
-                    
-                    for item in processor.all_items:
-                        row1 = data1[data1['項目名'] == item]
-                        row2 = data2[data2['項目名'] == item]
-                        
-                        if row1.empty or row2.empty:
-                            continue
-                        
-                        # 合計計算
-                        total1 = sum([float(row1[m].iloc[0]) if m in row1.columns and pd.notna(row1[m].iloc[0]) else 0 for m in months1])
-                        total2 = sum([float(row2[m].iloc[0]) if m in row2.columns and pd.notna(row2[m].iloc[0]) else 0 for m in months2])
-                        
-                        diff = total2 - total1
-                        growth_rate = (diff / total1 * 100) if total1 != 0 else 0
-                        
-                        period_comparison_rows.append({
+                    diffs = totals2 - totals1
+                    growth_rates = np.divide(diffs * 100, totals1, out=np.zeros_like(diffs), where=totals1 != 0)
+                    period_comparison_rows = [
+                        {
                             "項目名": item,
-                            f"第{all_periods[all_periods['id']==period1_id]['period_num'].iloc[0]}期": total1,
-                            f"第{all_periods[all_periods['id']==period2_id]['period_num'].iloc[0]}期": total2,
-                            "増減額": diff,
-                            "成長率(%)": growth_rate
-                        })
+                            period1_label: totals1[i],
+                            period2_label: totals2[i],
+                            "増減額": diffs[i],
+                            "成長率(%)": growth_rates[i]
+                        }
+                        for i, item in enumerate(processor.all_items)
+                    ]
                     
                     period_comparison_df = pd.DataFrame(period_comparison_rows)
                     
                     if not period_comparison_df.empty:
                         formatted_period_df = period_comparison_df.style\
                             .format({
-                                f"第{all_periods[all_periods['id']==period1_id]['period_num'].iloc[0]}期": "¥{:,.0f}",
-                                f"第{all_periods[all_periods['id']==period2_id]['period_num'].iloc[0]}期": "¥{:,.0f}",
+                                period1_label: "¥{:,.0f}",
+                                period2_label: "¥{:,.0f}",
                                 "増減額": "¥{:,.0f}",
                                 "成長率(%)": "{:.1f}%"
                             })\
@@ -2403,12 +2895,9 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
                 </div>
                 """, unsafe_allow_html=True)
                 
-                # シナリオ選択
-                forecast_scenario = st.selectbox(
-                    "インポート先シナリオを選択",
-                    ["現実", "楽観", "悲観"],
-                    key="forecast_import_scenario"
-                )
+                # 予測は現実シナリオに保存する（他のシナリオは現実の予測にシナリオルールを適用して計算）
+                forecast_scenario = "現実"
+                st.caption("予測データは現実シナリオにインポートします。楽観・悲観などは現実の予測にシナリオ一括設定のルールを適用して計算されます。")
                 
                 # テンプレートダウンロード
                 st.subheader("📥 ステップ1: テンプレートをダウンロード")
@@ -2532,62 +3021,117 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             
             st.markdown("""
             <div class="info-box">
-                <strong>💡 使い方:</strong> 「現実」シナリオをベースに、「楽観」「悲観」シナリオの増減率を設定します。
-                設定した増減率は全画面に即座に反映されます。
+                <strong>💡 使い方:</strong> 「現実」の予測をベースに、各シナリオの増減率と項目ごとのルールを設定します。
+                調整倍率は「1 + 弾性値 × 増減率」で、設定は会社ごとに保存され全画面に反映されます。
             </div>
             """, unsafe_allow_html=True)
             
-            col1, col2 = st.columns(2)
+            comp_id = st.session_state.selected_comp_id
             
-            with col1:
-                st.markdown("### 📈 楽観シナリオ")
-                st.markdown("""
-                <div class="success-box">
-                    <strong>想定される効果:</strong><br>
-                    • 売上: 増加率そのまま適用<br>
-                    • 売上原価: 増加率の50%を逆方向に適用<br>
-                    • 販管費: 増加率の30%を逆方向に適用
-                </div>
-                """, unsafe_allow_html=True)
-                
-                new_opt_rate = st.number_input(
-                    "楽観シナリオ増減率 (%)",
-                    value=st.session_state.scenario_rates["楽観"] * 100,
-                    min_value=-100.0,
-                    max_value=100.0,
-                    step=1.0,
-                    key="opt_rate_input"
-                ) / 100.0
-                
-                if st.button("💾 楽観シナリオ増減率を保存", type="primary"):
-                    st.session_state.scenario_rates["楽観"] = new_opt_rate
-                    st.success(f"✅ 楽観シナリオの増減率を **{new_opt_rate * 100:.1f}%** に設定しました")
-                    st.rerun()
+            def clear_scenario_caches():
+                """シナリオ設定に依存するキャッシュを破棄"""
+                get_scenarios_cached.clear()
+                calculate_scenario_forecasts_cached.clear()
+                for key in ['scenario_adjustment_cache', 'pl_df', 'pl_sweep']:
+                    if key in st.session_state:
+                        del st.session_state[key]
+            
+            # 増減率
+            st.markdown("### 📊 シナリオ別 増減率")
+            rate_cols = st.columns(len(scenario_rates))
+            for col, (scenario_name, rate) in zip(rate_cols, scenario_rates.items()):
+                with col:
+                    new_rate = st.number_input(
+                        f"{scenario_name} (%)",
+                        value=rate * 100,
+                        min_value=-100.0,
+                        max_value=100.0,
+                        step=1.0,
+                        key=f"scenario_rate_{scenario_name}"
+                    ) / 100.0
+                    if st.button("💾 保存", key=f"save_rate_{scenario_name}", use_container_width=True):
+                        success, msg = processor.save_scenario(comp_id, scenario_name, new_rate)
+                        if success:
+                            clear_scenario_caches()
+                            st.success(f"✅ {msg}")
+                            st.rerun()
+                        else:
+                            st.error(f"❌ {msg}")
             
+            # シナリオの追加・削除
+            col1, col2 = st.columns(2)
+            with col1:
+                with st.expander("➕ シナリオを追加"):
+                    new_scenario_name = st.text_input("シナリオ名", key="new_scenario_name", placeholder="例: 新規出店")
+                    new_scenario_rate = st.number_input(
+                        "増減率 (%)", value=0.0, min_value=-100.0, max_value=100.0, step=1.0, key="new_scenario_rate"
+                    ) / 100.0
+                    if st.button("追加", key="add_scenario"):
+                        success, msg = processor.save_scenario(comp_id, new_scenario_name, new_scenario_rate)
+                        if success:
+                            clear_scenario_caches()
+                            st.success(f"✅ {msg}")
+                            st.rerun()
+                        else:
+                            st.error(f"❌ {msg}")
             with col2:
-                st.markdown("### 📉 悲観シナリオ")
-                st.markdown("""
-                <div class="warning-box">
-                    <strong>想定される効果:</strong><br>
-                    • 売上: 減少率そのまま適用<br>
-                    • 売上原価: 減少率の50%を逆方向に適用<br>
-                    • 販管費: 減少率の30%を逆方向に適用
-                </div>
-                """, unsafe_allow_html=True)
-                
-                new_pes_rate = st.number_input(
-                    "悲観シナリオ増減率 (%)",
-                    value=st.session_state.scenario_rates["悲観"] * 100,
-                    min_value=-100.0,
-                    max_value=100.0,
-                    step=1.0,
-                    key="pes_rate_input"
-                ) / 100.0
-                
-                if st.button("💾 悲観シナリオ増減率を保存", type="primary"):
-                    st.session_state.scenario_rates["悲観"] = new_pes_rate
-                    st.success(f"✅ 悲観シナリオの増減率を **{new_pes_rate * 100:.1f}%** に設定しました")
+                custom_scenarios = [name for name in scenario_rates if name not in processor.default_scenarios]
+                if custom_scenarios:
+                    with st.expander("🗑️ シナリオを削除"):
+                        delete_target = st.selectbox("削除するシナリオ", custom_scenarios, key="delete_scenario_name")
+                        if st.button("削除", key="delete_scenario"):
+                            success, msg = processor.delete_scenario(comp_id, delete_target)
+                            if success:
+                                clear_scenario_caches()
+                                st.success(f"✅ {msg}")
+                                st.rerun()
+                            else:
+                                st.error(f"❌ {msg}")
+            
+            st.markdown("---")
+            
+            # 項目ごとのルール
+            st.markdown("### 🧮 シナリオルール")
+            st.caption("子項目を持つ項目（例: 販売管理費計）を指定すると配下の全項目に適用します。適用月を空欄にすると期全体に適用します。")
+            
+            rule_scenario = st.selectbox("シナリオ", list(scenario_rates), key="rule_scenario")
+            rules_df = pd.DataFrame(
+                processor.get_scenario_rules(comp_id, rule_scenario),
+                columns=['target_item', 'elasticity', 'start_month', 'end_month']
+            )
+            month_options = [None] + list(months)
+            edited_rules = st.data_editor(
+                rules_df,
+                column_config={
+                    "target_item": st.column_config.SelectboxColumn("対象項目", options=processor.all_items, required=True),
+                    "elasticity": st.column_config.NumberColumn("弾性値", format="%.2f", step=0.1, required=True),
+                    "start_month": st.column_config.SelectboxColumn("適用開始月", options=month_options),
+                    "end_month": st.column_config.SelectboxColumn("適用終了月", options=month_options),
+                },
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True,
+                key=f"scenario_rules_editor_{rule_scenario}"
+            )
+            
+            if st.button("💾 ルールを保存", type="primary", key="save_scenario_rules"):
+                rules = [
+                    {
+                        'target_item': row['target_item'],
+                        'elasticity': float(row['elasticity']) if pd.notna(row['elasticity']) else 0.0,
+                        'start_month': row['start_month'] if pd.notna(row['start_month']) else None,
+                        'end_month': row['end_month'] if pd.notna(row['end_month']) else None,
+                    }
+                    for _, row in edited_rules.iterrows()
+                    if pd.notna(row['target_item'])
+                ]
+                success, msg = processor.save_scenario_rules(comp_id, rule_scenario, rules)
+                if success:
+                    clear_scenario_caches()
+                    st.success(f"✅ {msg}")
                     st.rerun()
+                else:
+                    st.error(f"❌ {msg}")
             
             st.markdown("---")
             
@@ -2595,17 +3139,9 @@ if 'selected_period_id' in st.session_state and st.session_state.selected_period
             st.subheader("📋 現在の設定値")
             
             summary_data = {
-                "シナリオ": ["現実", "楽観", "悲観"],
-                "増減率": [
-                    f"{st.session_state.scenario_rates['現実'] * 100:.1f}%",
-                    f"{st.session_state.scenario_rates['楽観'] * 100:.1f}%",
-                    f"{st.session_state.scenario_rates['悲観'] * 100:.1f}%"
-                ],
-                "説明": [
-                    "ベースとなる予測値",
-                    "売上増加・費用削減を想定",
-                    "売上減少・費用増加を想定"
-                ]
+                "シナリオ": list(scenario_rates),
+                "増減率": [f"{rate * 100:.1f}%" for rate in scenario_rates.values()],
+                "ルール数": [len(processor.get_scenario_rules(comp_id, name)) for name in scenario_rates]
             }
             
             st.table(pd.DataFrame(summary_data))
@@ -0,0 +1,82 @@
+"""_read_sql_query の1回あたりの読み込み時間を計測するベンチマーク
+
+PostgreSQL(Supabase)設定が有効な環境で実行する:
+
+    python benchmark_read_sql.py --iterations 50
+
+「毎回エンジン作成」(従来の実装: create_engine → read → dispose) と
+「共有エンジン」(DataProcessor._read_sql_query) を同じクエリで比較する。
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+from data_processor import DataProcessor
+
+
+def _measure(func, iterations):
+    """funcをiterations回実行し、1回ごとの所要時間(ms)を返す"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _summary(label, timings):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return f"{label:<20} median={statistics.median(timings):8.2f}ms  p95={p95:8.2f}ms  max={timings[-1]:8.2f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="_read_sql_query のレイテンシ比較")
+    parser.add_argument("--iterations", type=int, default=30, help="計測回数")
+    parser.add_argument(
+        "--query",
+        default="SELECT * FROM fiscal_periods WHERE id = ?",
+        help="計測に使うクエリ（?プレースホルダー可）"
+    )
+    parser.add_argument("--param", type=int, default=1, help="クエリに渡すパラメータ")
+    args = parser.parse_args()
+
+    processor = DataProcessor()
+    if not processor.use_postgres:
+        print("PostgreSQL接続が有効ではありません。secrets.toml の [database] を設定してください。")
+        return 1
+
+    query = args.query
+    params = (args.param,) if "?" in query else None
+
+    def per_read_engine():
+        # 従来の実装: 読み込みごとにエンジン(と内部プール)を作って捨てる
+        from sqlalchemy import create_engine
+        engine = create_engine(processor.conn_string)
+        pd.read_sql_query(query.replace('?', '%s'), engine, params=params)
+        engine.dispose()
+
+    def shared_engine():
+        processor._read_sql_query(query, params=params)
+
+    # ウォームアップ
+    per_read_engine()
+    shared_engine()
+
+    before = _measure(per_read_engine, args.iterations)
+    after = _measure(shared_engine, args.iterations)
+
+    print(f"iterations={args.iterations}  query={query!r}")
+    print(_summary("毎回エンジン作成", before))
+    print(_summary("共有エンジン", after))
+    print(f"中央値の比: {statistics.median(before) / statistics.median(after):.1f}x")
+
+    processor.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,13 +4,500 @@ import re
 import os
 from datetime import datetime, timedelta
 import streamlit as st
+import sqlite3
 import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+# pg_advisory_xact_lock に渡すマイグレーション用ロックID（任意の固定値）
+SCHEMA_MIGRATION_LOCK_ID = 20240401
+
+# スキーママイグレーション定義
+# 新しいテーブル・インデックス・カラム変更は末尾にバージョンを追加していく。
+# 適用済みのバージョンは schema_version テーブルに記録され、再実行されない。
+SCHEMA_MIGRATIONS = [
+    {
+        'version': 1,
+        'description': '初期スキーマ (要件定義書の2.3に準拠)',
+        'sqlite': [
+            # 2.3.1 会社マスタ
+            '''
+            CREATE TABLE IF NOT EXISTS companies (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_name ON companies(name)',
+            # 2.3.2 会計期マスタ
+            '''
+            CREATE TABLE IF NOT EXISTS fiscal_periods (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                comp_id INTEGER NOT NULL,
+                period_num INTEGER NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (comp_id) REFERENCES companies (id),
+                UNIQUE(comp_id, period_num),
+                CHECK (start_date < end_date)
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_comp_period ON fiscal_periods(comp_id, period_num)',
+            # 2.3.3 実績データ
+            '''
+            CREATE TABLE IF NOT EXISTS actual_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fiscal_period_id INTEGER NOT NULL,
+                item_name TEXT NOT NULL,
+                month TEXT NOT NULL,
+                amount REAL NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (fiscal_period_id) REFERENCES fiscal_periods (id),
+                UNIQUE(fiscal_period_id, item_name, month)
+            )
+            ''',
+            # 2.3.4 予測データ
+            '''
+            CREATE TABLE IF NOT EXISTS forecast_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fiscal_period_id INTEGER NOT NULL,
+                scenario TEXT NOT NULL,
+                item_name TEXT NOT NULL,
+                month TEXT NOT NULL,
+                amount REAL NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (fiscal_period_id) REFERENCES fiscal_periods (id),
+                UNIQUE(fiscal_period_id, scenario, item_name, month)
+            )
+            ''',
+            # 2.3.5 補助科目データ
+            '''
+            CREATE TABLE IF NOT EXISTS sub_accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fiscal_period_id INTEGER NOT NULL,
+                scenario TEXT NOT NULL,
+                parent_item TEXT NOT NULL,
+                sub_account_name TEXT NOT NULL,
+                month TEXT NOT NULL,
+                amount REAL NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (fiscal_period_id) REFERENCES fiscal_periods (id),
+                UNIQUE(fiscal_period_id, scenario, parent_item, sub_account_name, month)
+            )
+            ''',
+        ],
+        'postgres': [
+            # 会社マスタ
+            '''
+            CREATE TABLE IF NOT EXISTS companies (
+                id SERIAL PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            # 会計期マスタ
+            '''
+            CREATE TABLE IF NOT EXISTS fiscal_periods (
+                id SERIAL PRIMARY KEY,
+                comp_id INTEGER NOT NULL REFERENCES companies(id),
+                period_num INTEGER NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(comp_id, period_num)
+            )
+            ''',
+            # 実績データ
+            '''
+            CREATE TABLE IF NOT EXISTS actual_data (
+                id SERIAL PRIMARY KEY,
+                fiscal_period_id INTEGER NOT NULL REFERENCES fiscal_periods(id),
+                item_name TEXT NOT NULL,
+                month TEXT NOT NULL,
+                amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(fiscal_period_id, item_name, month)
+            )
+            ''',
+            # 予測データ
+            '''
+            CREATE TABLE IF NOT EXISTS forecast_data (
+                id SERIAL PRIMARY KEY,
+                fiscal_period_id INTEGER NOT NULL REFERENCES fiscal_periods(id),
+                scenario TEXT NOT NULL,
+                item_name TEXT NOT NULL,
+                month TEXT NOT NULL,
+                amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(fiscal_period_id, scenario, item_name, month)
+            )
+            ''',
+            # 補助科目データ
+            '''
+            CREATE TABLE IF NOT EXISTS sub_accounts (
+                id SERIAL PRIMARY KEY,
+                fiscal_period_id INTEGER NOT NULL REFERENCES fiscal_periods(id),
+                scenario TEXT NOT NULL,
+                parent_item TEXT NOT NULL,
+                sub_account_name TEXT NOT NULL,
+                month TEXT NOT NULL,
+                amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(fiscal_period_id, scenario, parent_item, sub_account_name, month)
+            )
+            ''',
+        ],
+    },
+    {
+        'version': 2,
+        'description': 'シナリオ設定・シナリオルール',
+        'sqlite': [
+            # シナリオごとの増減率
+            '''
+            CREATE TABLE IF NOT EXISTS scenario_settings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                comp_id INTEGER NOT NULL,
+                scenario TEXT NOT NULL,
+                rate REAL NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (comp_id) REFERENCES companies (id),
+                UNIQUE(comp_id, scenario)
+            )
+            ''',
+            # 項目（またはグループ）ごとの弾性値と適用月
+            '''
+            CREATE TABLE IF NOT EXISTS scenario_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                comp_id INTEGER NOT NULL,
+                scenario TEXT NOT NULL,
+                target_item TEXT NOT NULL,
+                elasticity REAL NOT NULL DEFAULT 1,
+                start_month TEXT,
+                end_month TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (comp_id) REFERENCES companies (id)
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_scenario_rules ON scenario_rules(comp_id, scenario)',
+        ],
+        'postgres': [
+            '''
+            CREATE TABLE IF NOT EXISTS scenario_settings (
+                id SERIAL PRIMARY KEY,
+                comp_id INTEGER NOT NULL REFERENCES companies(id),
+                scenario TEXT NOT NULL,
+                rate DOUBLE PRECISION NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(comp_id, scenario)
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS scenario_rules (
+                id SERIAL PRIMARY KEY,
+                comp_id INTEGER NOT NULL REFERENCES companies(id),
+                scenario TEXT NOT NULL,
+                target_item TEXT NOT NULL,
+                elasticity DOUBLE PRECISION NOT NULL DEFAULT 1,
+                start_month TEXT,
+                end_month TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_scenario_rules ON scenario_rules(comp_id, scenario)',
+        ],
+    },
+    {
+        'version': 3,
+        'description': '期首残高',
+        'sqlite': [
+            # 会計期ごとの貸借対照表の期首残高
+            '''
+            CREATE TABLE IF NOT EXISTS opening_balances (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fiscal_period_id INTEGER NOT NULL,
+                item_name TEXT NOT NULL,
+                amount REAL NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (fiscal_period_id) REFERENCES fiscal_periods (id),
+                UNIQUE(fiscal_period_id, item_name)
+            )
+            ''',
+        ],
+        'postgres': [
+            '''
+            CREATE TABLE IF NOT EXISTS opening_balances (
+                id SERIAL PRIMARY KEY,
+                fiscal_period_id INTEGER NOT NULL REFERENCES fiscal_periods(id),
+                item_name TEXT NOT NULL,
+                amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(fiscal_period_id, item_name)
+            )
+            ''',
+        ],
+    },
+]
+
+# 標準シナリオと増減率（scenario_settings に保存がない場合の既定値）
+DEFAULT_SCENARIO_RATES = {
+    "現実": 0.0,
+    "楽観": 0.1,
+    "悲観": -0.1,
+}
+
+# シナリオルールの既定値（scenario_rules に保存がない場合）
+# 調整倍率 = 1 + 弾性値 × 増減率。グループ（子項目を持つ項目）は配下の入力項目すべてに適用する
+DEFAULT_SCENARIO_RULES = [
+    {'target_item': "売上高", 'elasticity': 1.0, 'start_month': None, 'end_month': None},
+    {'target_item': "売上原価", 'elasticity': -0.5, 'start_month': None, 'end_month': None},
+    {'target_item': "販売管理費計", 'elasticity': -0.3, 'start_month': None, 'end_month': None},
+]
+
+
+# 勘定科目ツリー定義 (要件定義書の3.1に準拠)
+# 並び順がPLの表示順(all_items)になる。各ノードのキー:
+#   name         : 項目名
+#   parent       : 集計先の項目（子項目の値に sign を掛けて親に加算）
+#   sign         : 親への符号（省略時は 1）
+#   formula      : 計算項目の計算式 [(項目名, 係数), ...]（省略時は子項目の合計）
+#   summary      : True の場合はPLの要約行として表示（計算項目は常に要約）
+#   sub_accounts : True の場合は補助科目を設定できる
+# formula を持つか子項目を持つノードが計算項目（ユーザーが編集できない項目）になる。
+DEFAULT_ACCOUNT_TREE = [
+    # 売上関連
+    {'name': "売上高", 'summary': True, 'sub_accounts': True},
+    {'name': "売上原価", 'summary': True, 'sub_accounts': True},
+    # 売上総利益 = 売上高 - 売上原価
+    {'name': "売上総損益金額", 'formula': [("売上高", 1), ("売上原価", -1)]},
+    # 販売管理費 (人件費)
+    {'name': "役員報酬", 'parent': "販売管理費計"},
+    {'name': "給料手当", 'parent': "販売管理費計"},
+    {'name': "賞与", 'parent': "販売管理費計"},
+    {'name': "法定福利費", 'parent': "販売管理費計"},
+    {'name': "福利厚生費", 'parent': "販売管理費計"},
+    # 採用・外注
+    {'name': "採用教育費", 'parent': "販売管理費計"},
+    {'name': "外注費", 'parent': "販売管理費計", 'sub_accounts': True},
+    # 販売費
+    {'name': "荷造運賃", 'parent': "販売管理費計"},
+    {'name': "広告宣伝費", 'parent': "販売管理費計", 'sub_accounts': True},
+    {'name': "販売手数料", 'parent': "販売管理費計"},
+    {'name': "販売促進費", 'parent': "販売管理費計"},
+    # 一般管理費
+    {'name': "交際費", 'parent': "販売管理費計"},
+    {'name': "会議費", 'parent': "販売管理費計"},
+    {'name': "旅費交通費", 'parent': "販売管理費計", 'sub_accounts': True},
+    {'name': "通信費", 'parent': "販売管理費計"},
+    {'name': "消耗品費", 'parent': "販売管理費計"},
+    {'name': "修繕費", 'parent': "販売管理費計"},
+    {'name': "事務用品費", 'parent': "販売管理費計"},
+    {'name': "水道光熱費", 'parent': "販売管理費計"},
+    {'name': "新聞図書費", 'parent': "販売管理費計"},
+    {'name': "諸会費", 'parent': "販売管理費計"},
+    {'name': "支払手数料", 'parent': "販売管理費計"},
+    {'name': "車両費", 'parent': "販売管理費計"},
+    {'name': "地代家賃", 'parent': "販売管理費計", 'sub_accounts': True},
+    {'name': "賃借料", 'parent': "販売管理費計"},
+    {'name': "保険料", 'parent': "販売管理費計"},
+    {'name': "租税公課", 'parent': "販売管理費計"},
+    {'name': "支払報酬料", 'parent': "販売管理費計"},
+    {'name': "研究開発費", 'parent': "販売管理費計"},
+    {'name': "研修費", 'parent': "販売管理費計"},
+    {'name': "減価償却費", 'parent': "販売管理費計"},
+    {'name': "貸倒損失(販)", 'parent': "販売管理費計"},
+    {'name': "雑費", 'parent': "販売管理費計"},
+    {'name': "少額交際費", 'parent': "販売管理費計"},
+    # 販売管理費計（子項目の合計）
+    {'name': "販売管理費計"},
+    # 営業損益 = 売上総利益 - 販売管理費計
+    {'name': "営業損益金額", 'formula': [("売上総損益金額", 1), ("販売管理費計", -1)]},
+    # 営業外損益
+    {'name': "営業外収益合計"},
+    {'name': "営業外費用合計"},
+    # 経常損益 = 営業利益 + 営業外収益 - 営業外費用
+    {'name': "経常損益金額", 'formula': [("営業損益金額", 1), ("営業外収益合計", 1), ("営業外費用合計", -1)]},
+    # 特別損益
+    {'name': "特別利益合計"},
+    {'name': "特別損失合計"},
+    # 税引前当期純損益 = 経常利益 + 特別利益 - 特別損失
+    {'name': "税引前当期純損益金額", 'formula': [("経常損益金額", 1), ("特別利益合計", 1), ("特別損失合計", -1)]},
+    # 法人税等
+    {'name': "法人税、住民税及び事業税"},
+    # 当期純損益 = 税引前当期純利益 - 法人税等
+    {'name': "当期純損益金額", 'formula': [("税引前当期純損益金額", 1), ("法人税、住民税及び事業税", -1)]},
+]
+
+# 販売管理費（固定費として扱う項目群）の集計項目名
+GA_TOTAL_ITEM = "販売管理費計"
+
+# 計算結果キャッシュに残す件数の上限（超えたら最も古く使われた結果から破棄）
+RESULT_CACHE_SIZE = 128
+
+# 間接法キャッシュフロー計算書の行（calculate_cash_flow_matrixの出力順）
+CASH_FLOW_ITEMS = [
+    "税引前当期純損益金額",
+    "減価償却費",
+    "売上債権の増減額",
+    "仕入債務の増減額",
+    "法人税等の支払額",
+    "営業活動によるキャッシュフロー",
+    "設備投資による支出",
+    "投資活動によるキャッシュフロー",
+    "借入による収入",
+    "借入金の返済による支出",
+    "財務活動によるキャッシュフロー",
+    "現金及び現金同等物の増減額",
+    "現金及び現金同等物の期末残高",
+]
+
+# 貸借対照表の区分と科目（opening_balances の item_name はこの科目名）
+BALANCE_SHEET_STRUCTURE = {
+    "資産の部": {
+        "流動資産": ["現金及び預金", "売掛金", "棚卸資産", "その他流動資産"],
+        "固定資産": ["有形固定資産", "無形固定資産", "投資その他の資産"],
+    },
+    "負債の部": {
+        "流動負債": ["買掛金", "短期借入金", "未払金", "その他流動負債"],
+        "固定負債": ["長期借入金", "その他固定負債"],
+    },
+    "純資産の部": {
+        "株主資本": ["資本金", "利益剰余金"],
+    },
+}
+BALANCE_SHEET_ITEMS = [
+    item
+    for categories in BALANCE_SHEET_STRUCTURE.values()
+    for items in categories.values()
+    for item in items
+]
+
+# 貸借対照表を使う経営指標（calculate_balance_ratiosの出力順）
+BALANCE_RATIOS = ["ROA", "ROE", "自己資本比率", "流動比率"]
+
+# 売上高に対する比率で表す経営指標（指標名 → 分子の項目名）
+PROFIT_INDICATORS = {
+    "粗利率": "売上総損益金額",
+    "営業利益率": "営業損益金額",
+    "経常利益率": "経常損益金額",
+    "当期純利益率": "当期純損益金額",
+    "売上原価率": "売上原価",
+    "販管費率": GA_TOTAL_ITEM,
+}
+
+
+def _simulate_landing_chunk(seed_seq, n_paths, factor_bases, sigmas, lognormal, cholesky):
+    """モンテカルロの1チャンク分を計算（ProcessPoolExecutorから呼べるようモジュール関数にする）
+    
+    factor_bases: (月, 要因, 対象) 各要因の変動1単位あたりの対象項目への寄与
+    戻り値: (パス, 月, 対象) 対象項目の基準値からの変動
+    """
+    rng = np.random.default_rng(seed_seq)
+    n_months, n_factors, _ = factor_bases.shape
+    
+    # 要因間の相関は月ごとに独立な標準正規乱数にコレスキー因子を掛けて付与
+    z = rng.standard_normal((n_paths, n_months, n_factors)) @ cholesky.T
+    shocks = np.where(
+        lognormal,
+        np.exp(sigmas * z - 0.5 * sigmas ** 2) - 1.0,  # 平均0の対数正規ショック
+        sigmas * z
+    )
+    # PLは入力項目に線形なので、対象項目の変動は寄与係数との積和で求まる
+    return np.einsum('pmk,mkt->pmt', shocks, factor_bases)
+
+
+# 自動予測の手法（手法名 → 表示名）
+AUTO_FORECAST_METHODS = {
+    "run_rate": "直近平均（ランレート）",
+    "seasonal_naive": "前年同月（季節ナイーブ）",
+    "holt_winters": "指数平滑（Holt-Winters）",
+}
+
+
+def _fit_forecast(history, horizon, method="holt_winters", season_length=12, window=3,
+                  alpha=0.3, beta=0.1, gamma=0.3):
+    """項目×月の実績履歴から先horizon月を全項目一括で予測（ProcessPoolExecutorから呼べるようモジュール関数にする）
+    
+    履歴が足りない場合は holt_winters（2季節以上が必要）→ seasonal_naive（1季節以上）→ run_rate の順に切り替える。
+    history: (項目, 月) 配列
+    戻り値: (項目, horizon) 配列
+    """
+    history = np.nan_to_num(np.asarray(history, dtype=float))
+    n_items, n_months = history.shape
+    steps = np.arange(1, horizon + 1)
+    if horizon <= 0:
+        return np.zeros((n_items, 0))
+    if n_months == 0:
+        return np.zeros((n_items, horizon))
+    
+    if method == "holt_winters" and n_months >= 2 * season_length:
+        # 加法型Holt-Winters。初期値は最初の2季節から求め（水準は系列開始の直前に合わせる）、時点方向のみループする
+        first, second = history[:, :season_length], history[:, season_length:2 * season_length]
+        trend = (second.mean(axis=1) - first.mean(axis=1)) / season_length
+        level = first.mean(axis=1) - trend * (season_length + 1) / 2
+        season = first - (level[:, None] + trend[:, None] * np.arange(1, season_length + 1))
+        for t in range(n_months):
+            s = season[:, t % season_length]
+            previous_level = level
+            level = alpha * (history[:, t] - s) + (1 - alpha) * (level + trend)
+            trend = beta * (level - previous_level) + (1 - beta) * trend
+            season[:, t % season_length] = gamma * (history[:, t] - level) + (1 - gamma) * s
+        return level[:, None] + steps * trend[:, None] + season[:, (n_months + steps - 1) % season_length]
+    
+    if method in ("holt_winters", "seasonal_naive") and n_months >= season_length:
+        # 前年同月の値をそのまま使う
+        return history[:, n_months - season_length + (steps - 1) % season_length]
+    
+    # 直近window月の平均を横ばいで延長
+    return np.repeat(history[:, -window:].mean(axis=1, keepdims=True), horizon, axis=1)
+
+
+class _PersistentSQLiteConnection(sqlite3.Connection):
+    """スレッド内で使い回すSQLite接続
+    
+    close()では実際には閉じず、最も外側の利用者が返却した時点で
+    未コミットの変更をロールバックするだけにする。
+    """
+    _depth = 0
+    
+    def close(self):
+        self._depth = max(self._depth - 1, 0)
+        if self._depth == 0 and self.in_transaction:
+            self.rollback()
+    
+    def close_connection(self):
+        """接続を実際に閉じる"""
+        sqlite3.Connection.close(self)
+
 
 class DataProcessor:
-    def __init__(self, db_path=None):
+    # 永続SQLite接続に設定するPRAGMA
+    SQLITE_PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-20000",      # 約20MB
+        "PRAGMA mmap_size=268435456",    # 256MB
+        "PRAGMA busy_timeout=5000",      # ロック解除を最大5秒待つ
+    )
+    
+    def __init__(self, db_path=None, sqlite_persistent=True, account_tree=None):
         # データベース接続の設定
         self.use_postgres = False
         self.conn_string = None
+        self._pg_pool = None
+        self._engine = None
+        # SQLiteの永続接続モード（スレッドごとに1接続を使い回す）
+        self.sqlite_persistent = sqlite_persistent
+        self._sqlite_local = threading.local()
+        # 会計期メタデータのキャッシュ（期ID → 期情報・月リスト・月の序数）
+        self._period_cache = {}
+        self._period_cache_lock = threading.Lock()
+        # データ更新のたびに進めるバージョンと、それをキーに含む計算結果のキャッシュ
+        self._data_version = 0
+        self._result_cache = OrderedDict()
+        self._result_cache_lock = threading.Lock()
         
         # Streamlit Secretsからデータベース設定を取得
         sys.stderr.write("=" * 80 + "\n")
@@ -42,6 +529,8 @@ class DataProcessor:
                 test_conn = self._test_postgres_connection()
                 if test_conn:
                     self.use_postgres = True
+                    self._pg_pool = self._create_postgres_pool(db_config)
+                    self._engine = self._create_postgres_engine()
                     sys.stderr.write("✅ PostgreSQL接続成功 - Supabaseを使用します\n")
                     sys.stderr.write(f"   ホスト: {db_config['host']}\n")
                 else:
@@ -73,68 +562,11 @@ class DataProcessor:
         
         self._init_db()
         
-        # 標準的な勘定科目リスト (要件定義書の3.1に準拠)
-        self.all_items = [
-            # 売上関連
-            "売上高",
-            "売上原価",
-            # 売上総利益
-            "売上総損益金額",
-            # 販売管理費 (人件費)
-            "役員報酬", "給料手当", "賞与", "法定福利費", "福利厚生費",
-            # 採用・外注
-            "採用教育費", "外注費",
-            # 販売費
-            "荷造運賃", "広告宣伝費", "販売手数料", "販売促進費",
-            # 一般管理費
-            "交際費", "会議費", "旅費交通費", "通信費", "消耗品費", "修繕費",
-            "事務用品費", "水道光熱費", "新聞図書費", "諸会費", "支払手数料",
-            "車両費", "地代家賃", "賃借料", "保険料", "租税公課", "支払報酬料",
-            "研究開発費", "研修費", "減価償却費", "貸倒損失(販)", "雑費", "少額交際費",
-            # 販売管理費計
-            "販売管理費計",
-            # 営業損益
-            "営業損益金額",
-            # 営業外損益
-            "営業外収益合計", "営業外費用合計",
-            # 経常損益
-            "経常損益金額",
-            # 特別損益
-            "特別利益合計", "特別損失合計",
-            # 税引前当期純損益
-            "税引前当期純損益金額",
-            # 法人税等
-            "法人税、住民税及び事業税",
-            # 当期純損益
-            "当期純損益金額"
-        ]
+        # 勘定科目ツリーから項目リストと集計行列を作成
+        self._compile_account_tree(account_tree or DEFAULT_ACCOUNT_TREE)
         
-        # 販売管理費項目リスト
-        self.ga_items = [
-            "役員報酬", "給料手当", "賞与", "法定福利費", "福利厚生費",
-            "採用教育費", "外注費", "荷造運賃", "広告宣伝費", "交際費",
-            "会議費", "旅費交通費", "通信費", "販売手数料", "販売促進費",
-            "消耗品費", "修繕費", "事務用品費", "水道光熱費", "新聞図書費",
-            "諸会費", "支払手数料", "車両費", "地代家賃", "賃借料",
-            "保険料", "租税公課", "支払報酬料", "研究開発費", "研修費",
-            "減価償却費", "貸倒損失(販)", "雑費", "少額交際費"
-        ]
-        
-        # 補助科目が設定できる親項目（売上と原価を追加）
-        self.parent_items_with_sub_accounts = [
-            "売上高",
-            "売上原価",
-            "外注費",
-            "広告宣伝費",
-            "旅費交通費",
-            "地代家賃"
-        ]
-        
-        # 計算項目リスト (ユーザーが編集できない項目)
-        self.calculated_items = [
-            "売上総損益金額", "販売管理費計", "営業損益金額",
-            "経常損益金額", "税引前当期純損益金額", "当期純損益金額"
-        ]
+        # 標準シナリオ（表示順）
+        self.default_scenarios = list(DEFAULT_SCENARIO_RATES)
         
         # 弥生会計の項目名マッピング
         self.item_mapping = {
@@ -184,7 +616,6 @@ class DataProcessor:
     def _test_postgres_connection(self):
         """PostgreSQL接続をテスト"""
         try:
-            import psycopg2
             from urllib.parse import urlparse
             
             result = urlparse(self.conn_string)
@@ -195,14 +626,7 @@ class DataProcessor:
             sys.stderr.write(f"     - port: {result.port}\n")
             sys.stderr.flush()
             
-            conn = psycopg2.connect(
-                database=result.path[1:],
-                user=result.username,
-                password=result.password,
-                host=result.hostname,
-                port=result.port,
-                connect_timeout=10
-            )
+            conn = self._connect_postgres()
             conn.close()
             return True
         except Exception as e:
@@ -213,23 +637,116 @@ class DataProcessor:
             sys.stderr.flush()
             return False
     
+    def _connect_postgres(self):
+        """PostgreSQLへの新規接続を作成（接続プールからも利用）"""
+        import psycopg2
+        from urllib.parse import urlparse
+        
+        result = urlparse(self.conn_string)
+        return psycopg2.connect(
+            database=result.path[1:],
+            user=result.username,
+            password=result.password,
+            host=result.hostname,
+            port=result.port,
+            connect_timeout=10
+        )
+    
+    def _create_postgres_pool(self, db_config):
+        """PostgreSQL接続プールを作成
+        
+        st.secrets['database'] の以下のキーで調整可能:
+            pool_min_size: 常時保持する接続数 (既定: 1)
+            pool_max_size: 同時に貸し出せる最大接続数 (既定: 10)
+            pool_timeout: 空き接続を待つ秒数、超過でTimeoutError (既定: 30)
+            pool_recycle: この秒数を超えた接続は作り直す (既定: 1800)
+            pool_health_check_interval: この秒数以上使われていない接続は
+                貸し出し前に SELECT 1 で生存確認する (既定: 30)
+        """
+        from sqlalchemy import event, exc
+        from sqlalchemy.pool import QueuePool
+        
+        pool_min_size = max(int(db_config.get('pool_min_size', 1)), 1)
+        pool_max_size = max(int(db_config.get('pool_max_size', 10)), pool_min_size)
+        health_check_interval = float(db_config.get('pool_health_check_interval', 30))
+        
+        pool = QueuePool(
+            self._connect_postgres,
+            pool_size=pool_min_size,
+            max_overflow=pool_max_size - pool_min_size,
+            timeout=float(db_config.get('pool_timeout', 30)),
+            recycle=int(db_config.get('pool_recycle', 1800))
+        )
+        
+        @event.listens_for(pool, "checkin")
+        def _record_last_used(dbapi_conn, connection_record):
+            connection_record.info['last_used'] = time.monotonic()
+        
+        @event.listens_for(pool, "checkout")
+        def _health_check(dbapi_conn, connection_record, connection_proxy):
+            # 新規接続、または直近まで使われていた接続は確認を省略
+            last_used = connection_record.info.get('last_used')
+            if last_used is None or time.monotonic() - last_used < health_check_interval:
+                return
+            try:
+                cursor = dbapi_conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+            except Exception as e:
+                # DisconnectionErrorを送出するとプールが接続を破棄して再接続する
+                sys.stderr.write(f"⚠️ プール接続のヘルスチェック失敗、再接続します: {e}\n")
+                sys.stderr.flush()
+                raise exc.DisconnectionError() from e
+        
+        sys.stderr.write(f"   接続プール: min={pool_min_size}, max={pool_max_size}\n")
+        sys.stderr.flush()
+        return pool
+    
+    def _create_postgres_engine(self):
+        """接続プールを共有するSQLAlchemyエンジンを作成（pandas読み込み用）"""
+        from sqlalchemy import create_engine
+        
+        # pool=を渡すとエンジンは既存プールをそのまま使う（psycopg2経路と接続を共有）
+        engine = create_engine("postgresql+psycopg2://", pool=self._pg_pool)
+        
+        # 最小接続数まで事前に接続しておく
+        # （エンジン作成後に接続することでダイアレクトの初期化も済ませる）
+        warm_conns = [engine.connect() for _ in range(self._pg_pool.size())]
+        for conn in warm_conns:
+            conn.close()
+        return engine
+    
+    def close(self):
+        """エンジンと接続プール、現在のスレッドのSQLite接続を破棄"""
+        if self._engine is not None:
+            self._engine.dispose()
+        elif self._pg_pool is not None:
+            self._pg_pool.dispose()
+        
+        conn = getattr(self._sqlite_local, 'conn', None)
+        if conn is not None:
+            conn.close_connection()
+            self._sqlite_local.conn = None
+    
     def _get_connection(self):
-        """データベース接続を取得"""
+        """データベース接続を取得
+        
+        PostgreSQLの場合は接続プールから貸し出す。close()でプールに返却される。
+        SQLiteの永続接続モードではスレッドごとの接続を返す。close()しても閉じない。
+        """
         if self.use_postgres:
-            import psycopg2
-            from urllib.parse import urlparse
-            
-            result = urlparse(self.conn_string)
-            return psycopg2.connect(
-                database=result.path[1:],
-                user=result.username,
-                password=result.password,
-                host=result.hostname,
-                port=result.port
-            )
-        else:
-            import sqlite3
+            return self._pg_pool.connect()
+        elif not self.sqlite_persistent:
             return sqlite3.connect(self.db_path)
+        
+        conn = getattr(self._sqlite_local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, factory=_PersistentSQLiteConnection)
+            for pragma in self.SQLITE_PRAGMAS:
+                conn.execute(pragma)
+            self._sqlite_local.conn = conn
+        conn._depth += 1
+        return conn
     
     def _execute_query(self, query, params=None):
         """クエリを実行（PostgreSQLとSQLiteの互換性対応）"""
@@ -245,6 +762,7 @@ class DataProcessor:
             else:
                 cursor.execute(query)
             conn.commit()
+            self._bump_data_version()
             return cursor
         except Exception as e:
             conn.rollback()
@@ -253,164 +771,85 @@ class DataProcessor:
             conn.close()
 
     def _init_db(self):
-        """データベーステーブルの初期化 (要件定義書の2.3に準拠)"""
-        if self.use_postgres:
-            self._init_postgres_db()
-        else:
-            self._init_sqlite_db()
+        """データベーススキーマを最新バージョンまでマイグレーション
+        
+        スキーマが最新であればDDLは一切実行しない。
+        """
+        latest_version = SCHEMA_MIGRATIONS[-1]['version']
+        current_version = self._get_schema_version()
+        if current_version >= latest_version:
+            sys.stderr.write(f"✅ スキーマは最新です (version {current_version})\n")
+            sys.stderr.flush()
+            return
+        self._run_migrations(latest_version)
     
-    def _init_sqlite_db(self):
-        """SQLiteデータベースの初期化"""
+    def _get_schema_version(self):
+        """適用済みのスキーマバージョンを取得（DDLを発行せずにカタログを参照）"""
         conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # 2.3.1 会社マスタ
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS companies (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_name ON companies(name)')
-        
-        # 2.3.2 会計期マスタ
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS fiscal_periods (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            comp_id INTEGER NOT NULL,
-            period_num INTEGER NOT NULL,
-            start_date TEXT NOT NULL,
-            end_date TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (comp_id) REFERENCES companies (id),
-            UNIQUE(comp_id, period_num),
-            CHECK (start_date < end_date)
-        )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_comp_period ON fiscal_periods(comp_id, period_num)')
-        
-        # 2.3.3 実績データ
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS actual_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fiscal_period_id INTEGER NOT NULL,
-            item_name TEXT NOT NULL,
-            month TEXT NOT NULL,
-            amount REAL NOT NULL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (fiscal_period_id) REFERENCES fiscal_periods (id),
-            UNIQUE(fiscal_period_id, item_name, month)
-        )
-        ''')
-        
-        # 2.3.4 予測データ
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS forecast_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fiscal_period_id INTEGER NOT NULL,
-            scenario TEXT NOT NULL,
-            item_name TEXT NOT NULL,
-            month TEXT NOT NULL,
-            amount REAL NOT NULL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (fiscal_period_id) REFERENCES fiscal_periods (id),
-            UNIQUE(fiscal_period_id, scenario, item_name, month)
-        )
-        ''')
-        
-        # 2.3.5 補助科目データ
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sub_accounts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fiscal_period_id INTEGER NOT NULL,
-            scenario TEXT NOT NULL,
-            parent_item TEXT NOT NULL,
-            sub_account_name TEXT NOT NULL,
-            month TEXT NOT NULL,
-            amount REAL NOT NULL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (fiscal_period_id) REFERENCES fiscal_periods (id),
-            UNIQUE(fiscal_period_id, scenario, parent_item, sub_account_name, month)
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
-
-    def _init_postgres_db(self):
-        """PostgreSQLデータベースの初期化"""
+        try:
+            cursor = conn.cursor()
+            if self.use_postgres:
+                cursor.execute("SELECT to_regclass('schema_version')")
+            else:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+            row = cursor.fetchone()
+            if not row or row[0] is None:
+                return 0
+            
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+            row = cursor.fetchone()
+            return row[0] if row and row[0] is not None else 0
+        finally:
+            conn.close()
+    
+    def _run_migrations(self, target_version):
+        """未適用のマイグレーションを1トランザクションで適用"""
+        dialect = 'postgres' if self.use_postgres else 'sqlite'
         conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # 会社マスタ
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS companies (
-            id SERIAL PRIMARY KEY,
-            name TEXT NOT NULL UNIQUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # 会計期マスタ
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS fiscal_periods (
-            id SERIAL PRIMARY KEY,
-            comp_id INTEGER NOT NULL REFERENCES companies(id),
-            period_num INTEGER NOT NULL,
-            start_date TEXT NOT NULL,
-            end_date TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(comp_id, period_num)
-        )
-        ''')
-        
-        # 実績データ
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS actual_data (
-            id SERIAL PRIMARY KEY,
-            fiscal_period_id INTEGER NOT NULL REFERENCES fiscal_periods(id),
-            item_name TEXT NOT NULL,
-            month TEXT NOT NULL,
-            amount DOUBLE PRECISION NOT NULL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(fiscal_period_id, item_name, month)
-        )
-        ''')
-        
-        # 予測データ
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS forecast_data (
-            id SERIAL PRIMARY KEY,
-            fiscal_period_id INTEGER NOT NULL REFERENCES fiscal_periods(id),
-            scenario TEXT NOT NULL,
-            item_name TEXT NOT NULL,
-            month TEXT NOT NULL,
-            amount DOUBLE PRECISION NOT NULL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(fiscal_period_id, scenario, item_name, month)
-        )
-        ''')
-        
-        # 補助科目データ
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sub_accounts (
-            id SERIAL PRIMARY KEY,
-            fiscal_period_id INTEGER NOT NULL REFERENCES fiscal_periods(id),
-            scenario TEXT NOT NULL,
-            parent_item TEXT NOT NULL,
-            sub_account_name TEXT NOT NULL,
-            month TEXT NOT NULL,
-            amount DOUBLE PRECISION NOT NULL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(fiscal_period_id, scenario, parent_item, sub_account_name, month)
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            
+            # 複数プロセスが同時に起動してもマイグレーションは1つずつ実行する
+            if self.use_postgres:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_MIGRATION_LOCK_ID,))
+            else:
+                cursor.execute("BEGIN IMMEDIATE")
+            
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            
+            # ロック取得後に再確認（他プロセスが適用済みの場合がある）
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+            row = cursor.fetchone()
+            current_version = row[0] if row and row[0] is not None else 0
+            
+            placeholder = '%s' if self.use_postgres else '?'
+            for migration in SCHEMA_MIGRATIONS:
+                if migration['version'] <= current_version or migration['version'] > target_version:
+                    continue
+                sys.stderr.write(f"🔧 マイグレーション適用: version {migration['version']} - {migration['description']}\n")
+                for statement in migration[dialect]:
+                    cursor.execute(statement)
+                cursor.execute(
+                    f"INSERT INTO schema_version (version, description) VALUES ({placeholder}, {placeholder})",
+                    (migration['version'], migration['description'])
+                )
+            
+            conn.commit()
+            sys.stderr.write(f"✅ スキーマをversion {target_version}に更新しました\n")
+            sys.stderr.flush()
+        except Exception as e:
+            conn.rollback()
+            sys.stderr.write(f"❌ マイグレーション失敗: {e}\n")
+            sys.stderr.flush()
+            raise
+        finally:
+            conn.close()
 
     def _read_sql_query(self, query, params=None):
         """SQLクエリを実行してDataFrameを返す（PostgreSQLとSQLiteの互換性対応）"""
@@ -431,15 +870,13 @@ class DataProcessor:
                     new_params.append(p)
             params = tuple(new_params)
 
-        conn = self._get_connection()
+        conn = None
         try:
-            # PostgreSQLの場合はSQLAlchemyエンジンを使用（警告回避）
+            # PostgreSQLの場合は共有SQLAlchemyエンジンを使用（警告回避・接続再利用）
             if self.use_postgres:
-                from sqlalchemy import create_engine
-                engine = create_engine(self.conn_string)
-                df = pd.read_sql_query(query, engine, params=params)
-                engine.dispose()
+                df = pd.read_sql_query(query, self._engine, params=params)
             else:
+                conn = self._get_connection()
                 df = pd.read_sql_query(query, conn, params=params)
             
             # SQLiteでIDがバイナリ形式で返ってくる場合の対策
@@ -449,48 +886,126 @@ class DataProcessor:
             
             return df
         finally:
-            if not self.use_postgres:
+            if conn:
                 conn.close()
 
     def _sort_months(self, df, fiscal_period_id):
         """月を会計期間の順序でソート"""
         try:
-            period = self.get_period_info(fiscal_period_id)
-            if not period:
+            meta = self._get_period_meta(fiscal_period_id)
+            if not meta:
                 return df
             
-            start_date = datetime.strptime(period['start_date'], '%Y-%m-%d')
-            end_date = datetime.strptime(period['end_date'], '%Y-%m-%d')
-            
-            # 会計期間の月リストを作成
-            months_order = []
-            curr = start_date
-            while curr <= end_date:
-                months_order.append(curr.strftime('%Y-%m'))
-                if curr.month == 12:
-                    curr = curr.replace(year=curr.year + 1, month=1)
-                else:
-                    curr = curr.replace(month=curr.month + 1)
-            
-            # ソート用のマッピング
-            order_map = {m: i for i, m in enumerate(months_order)}
-            
-            # YYYY-MM形式の月をdatetimeに変換してソート
+            # 会計期の月序数でソート（期外の月は末尾）
             if 'month' in df.columns:
-                df['_month_dt'] = pd.to_datetime(df['month'] + '-01')
-                df = df.sort_values('_month_dt').drop(columns=['_month_dt'])
+                order = df['month'].map(meta['month_index'])
+                df = df.iloc[np.argsort(order.fillna(len(meta['months'])).to_numpy(), kind='stable')]
             
             return df
         except Exception as e:
             print(f"Error sorting months: {e}")
             return df
 
+    @staticmethod
+    def _build_fiscal_months(start_date, end_date):
+        """開始日〜終了日の月リスト (YYYY-MM) を作成"""
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        
+        months = []
+        curr = start
+        while curr <= end:
+            months.append(curr.strftime('%Y-%m'))
+            if curr.month == 12:
+                curr = curr.replace(year=curr.year + 1, month=1)
+            else:
+                curr = curr.replace(month=curr.month + 1)
+        return months
+
+    def _get_period_meta(self, period_id):
+        """会計期のメタデータをキャッシュから取得（未取得ならDBから読み込む）
+        
+        戻り値: {'period': 期情報, 'months': 月のタプル, 'month_index': 月→序数}
+        """
+        # IDの型変換
+        if isinstance(period_id, bytes):
+            period_id = int.from_bytes(period_id, 'little')
+        try:
+            period_id = int(period_id)
+        except (TypeError, ValueError):
+            return None
+        
+        with self._period_cache_lock:
+            meta = self._period_cache.get(period_id)
+        if meta is not None:
+            return meta
+        
+        period = self._fetch_period_info(period_id)
+        if not period:
+            return None
+        
+        months = self._build_fiscal_months(period['start_date'], period['end_date'])
+        meta = {
+            'period': period,
+            'months': tuple(months),
+            'month_index': {m: i for i, m in enumerate(months)},
+        }
+        with self._period_cache_lock:
+            self._period_cache[period_id] = meta
+        return meta
+
+    def invalidate_period_cache(self, period_id=None):
+        """会計期メタデータのキャッシュを破棄（period_id省略時は全件）"""
+        with self._period_cache_lock:
+            if period_id is None:
+                self._period_cache.clear()
+            else:
+                self._period_cache.pop(period_id, None)
+
+    def _bump_data_version(self):
+        """データ更新時にバージョンを進め、計算結果のキャッシュを破棄"""
+        with self._result_cache_lock:
+            self._data_version += 1
+            self._result_cache.clear()
+
+    def _cached_result(self, key, compute):
+        """計算結果をデータバージョン付きのキーでキャッシュ（未計算ならcomputeを呼ぶ）"""
+        with self._result_cache_lock:
+            key = (self._data_version,) + tuple(key)
+            if key in self._result_cache:
+                self._result_cache.move_to_end(key)
+                return self._result_cache[key]
+        
+        # 呼び出し元で共有されるため、配列は読み取り専用にしてから返す
+        result = self._freeze_result(compute())
+        with self._result_cache_lock:
+            # 計算中に更新があった場合は古い結果を保存しない
+            if key[0] == self._data_version:
+                self._result_cache[key] = result
+                while len(self._result_cache) > RESULT_CACHE_SIZE:
+                    self._result_cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _freeze_result(value):
+        """dict・list・tupleをたどり、含まれるndarrayを読み取り専用にする"""
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+        elif isinstance(value, dict):
+            for item in value.values():
+                DataProcessor._freeze_result(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                DataProcessor._freeze_result(item)
+        return value
+
     def get_companies(self):
         """会社一覧を取得"""
         return self._read_sql_query("SELECT * FROM companies ORDER BY name")
 
     def add_company(self, company_name):
         """会社を追加"""
+        conn = None
         try:
             sys.stderr.write(f"💾 add_company() 開始: '{company_name}'\n")
             sys.stderr.write(f"   use_postgres: {self.use_postgres}\n")
@@ -509,7 +1024,6 @@ class DataProcessor:
             conn.commit()
             sys.stderr.write("   コミット成功\n")
             sys.stderr.flush()
-            conn.close()
             
             sys.stderr.write("✅ add_company() 成功\n")
             sys.stderr.flush()
@@ -520,6 +1034,9 @@ class DataProcessor:
             traceback.print_exc(file=sys.stderr)
             sys.stderr.flush()
             return False
+        finally:
+            if conn:
+                conn.close()
 
     def get_company_periods(self, comp_id):
         """指定会社の会計期一覧を取得"""
@@ -530,6 +1047,7 @@ class DataProcessor:
 
     def add_fiscal_period(self, comp_id, period_num, start_date, end_date):
         """会計期を追加"""
+        conn = None
         try:
             # IDの型変換
             if isinstance(comp_id, bytes):
@@ -550,29 +1068,35 @@ class DataProcessor:
                 )
             
             conn.commit()
-            conn.close()
+            self.invalidate_period_cache()
             return True
         except Exception as e:
             sys.stderr.write(f"❌ add_fiscal_period() 失敗: {e}\n")
             sys.stderr.flush()
             return False
+        finally:
+            if conn:
+                conn.close()
 
     def get_period_info(self, period_id):
-        """会計期情報を取得"""
-        # IDの型変換
-        if isinstance(period_id, bytes):
-            period_id = int.from_bytes(period_id, 'little')
+        """会計期情報を取得（キャッシュ付き）"""
+        meta = self._get_period_meta(period_id)
+        return dict(meta['period']) if meta else None
 
+    def _fetch_period_info(self, period_id):
+        """会計期情報をDBから取得"""
         conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        if self.use_postgres:
-            cursor.execute("SELECT * FROM fiscal_periods WHERE id = %s", (period_id,))
-        else:
-            cursor.execute("SELECT * FROM fiscal_periods WHERE id = ?", (period_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            
+            if self.use_postgres:
+                cursor.execute("SELECT * FROM fiscal_periods WHERE id = %s", (period_id,))
+            else:
+                cursor.execute("SELECT * FROM fiscal_periods WHERE id = ?", (period_id,))
+            
+            row = cursor.fetchone()
+        finally:
+            conn.close()
         if row:
             # SQLiteでIDがバイナリ形式で返ってくる場合の対策
             row_id = row[0]
@@ -593,108 +1117,226 @@ class DataProcessor:
 
     def get_company_id_from_period_id(self, fiscal_period_id):
         """会計期IDから会社IDを取得"""
-        # IDの型変換
-        if isinstance(fiscal_period_id, bytes):
-            fiscal_period_id = int.from_bytes(fiscal_period_id, 'little')
-
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        if self.use_postgres:
-            cursor.execute("SELECT comp_id FROM fiscal_periods WHERE id = %s", (fiscal_period_id,))
-        else:
-            cursor.execute("SELECT comp_id FROM fiscal_periods WHERE id = ?", (fiscal_period_id,))
-        
-        result = cursor.fetchone()
-        conn.close()
-        if result:
-            res = result[0]
-            return int.from_bytes(res, 'little') if isinstance(res, bytes) else res
-        return None
+        meta = self._get_period_meta(fiscal_period_id)
+        return meta['period']['comp_id'] if meta else None
 
     def get_fiscal_months(self, comp_id_or_period_id, fiscal_period_id=None):
         """会計期の月リストを取得 (引数が1つの場合はperiod_idとして扱う)"""
         # 引数が1つの場合、または2つ目がNoneの場合、最初の引数をperiod_idとして扱う
         target_period_id = fiscal_period_id if fiscal_period_id is not None else comp_id_or_period_id
         
-        # IDの型変換
-        if isinstance(target_period_id, bytes):
-            target_period_id = int.from_bytes(target_period_id, 'little')
-            
-        period = self.get_period_info(target_period_id)
-        if not period:
+        meta = self._get_period_meta(target_period_id)
+        if not meta:
             return []
-        
-        start = datetime.strptime(period['start_date'], '%Y-%m-%d')
-        end = datetime.strptime(period['end_date'], '%Y-%m-%d')
-        
-        months = []
-        curr = start
-        while curr <= end:
-            months.append(curr.strftime('%Y-%m'))
-            if curr.month == 12:
-                curr = curr.replace(year=curr.year + 1, month=1)
-            else:
-                curr = curr.replace(month=curr.month + 1)
-        return months
+        return list(meta['months'])
 
     def get_split_index(self, comp_id, current_month, fiscal_period_id):
         """実績と予測の境界インデックスを取得"""
-        months = self.get_fiscal_months(fiscal_period_id)
-        try:
-            return months.index(current_month) + 1
-        except:
+        meta = self._get_period_meta(fiscal_period_id)
+        if not meta or current_month not in meta['month_index']:
             return 0
+        return meta['month_index'][current_month] + 1
 
-    def load_actual_data(self, fiscal_period_id):
-        """実績データを読み込み"""
-        # IDの型変換
-        if isinstance(fiscal_period_id, bytes):
-            fiscal_period_id = int.from_bytes(fiscal_period_id, 'little')
-
-        df = self._read_sql_query(
-            "SELECT item_name as 項目名, month, amount FROM actual_data WHERE fiscal_period_id = ?",
-            params=(fiscal_period_id,)
-        )
+    def _fetch_item_month_matrix(self, query, params, months):
+        """(item_name, month, amount) を返すクエリから 項目×月 の行列を作成
         
-        if df.empty:
-            return pd.DataFrame({'項目名': self.all_items}).fillna(0)
-        
-        df = df.drop_duplicates(subset=['項目名', 'month'], keep='last')
-        
-        # 月を正しくソート（会計期順）
-        df = self._sort_months(df, fiscal_period_id)
+        行はall_itemsの順、列はmonthsの順。カーソルから直接行列へ書き込み、
+        同じ項目・月が複数ある場合は後の行（idの大きい方）を採用する。
+        """
+        matrix = np.zeros((len(self.all_items), len(months)))
+        if not months:
+            return matrix
+        month_index = {m: j for j, m in enumerate(months)}
         
-        pivot_df = df.pivot(index='項目名', columns='month', values='amount').reset_index()
+        if self.use_postgres:
+            query = query.replace('?', '%s')
         
-        all_items_df = pd.DataFrame({'項目名': self.all_items})
-        pivot_df = pd.merge(all_items_df, pivot_df, on='項目名', how='left').fillna(0)
-        return pivot_df
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            for item_name, month, amount in cursor:
+                i = self.item_index.get(item_name)
+                j = month_index.get(month)
+                if i is not None and j is not None:
+                    matrix[i, j] = amount if amount is not None else 0.0
+        finally:
+            conn.close()
+        return matrix
 
-    def load_forecast_data(self, fiscal_period_id, scenario):
-        """予測データを読み込み"""
+    def _matrix_to_frame(self, matrix, months):
+        """項目×月の行列を「項目名 + 月列」のDataFrameに変換"""
+        df = pd.DataFrame(matrix, columns=list(months))
+        df.insert(0, '項目名', self.all_items)
+        return df
+
+    def load_actual_matrix(self, fiscal_period_id):
+        """実績データを 項目×月 の行列で読み込み（戻り値: (行列, 月リスト)）"""
         # IDの型変換
         if isinstance(fiscal_period_id, bytes):
             fiscal_period_id = int.from_bytes(fiscal_period_id, 'little')
-
-        df = self._read_sql_query(
-            "SELECT item_name as 項目名, month, amount FROM forecast_data WHERE fiscal_period_id = ? AND scenario = ?",
-            params=(fiscal_period_id, scenario)
+        
+        months = self.get_fiscal_months(fiscal_period_id)
+        matrix = self._fetch_item_month_matrix(
+            "SELECT item_name, month, amount FROM actual_data WHERE fiscal_period_id = ? ORDER BY id",
+            (fiscal_period_id,),
+            months
         )
+        return matrix, months
+
+    def load_forecast_matrix(self, fiscal_period_id, scenario):
+        """予測データを 項目×月 の行列で読み込み（戻り値: (行列, 月リスト)）"""
+        # IDの型変換
+        if isinstance(fiscal_period_id, bytes):
+            fiscal_period_id = int.from_bytes(fiscal_period_id, 'little')
         
-        if df.empty:
-            return pd.DataFrame({'項目名': self.all_items}).fillna(0)
+        months = self.get_fiscal_months(fiscal_period_id)
+        matrix = self._fetch_item_month_matrix(
+            "SELECT item_name, month, amount FROM forecast_data WHERE fiscal_period_id = ? AND scenario = ? ORDER BY id",
+            (fiscal_period_id, scenario),
+            months
+        )
+        return matrix, months
+
+    def calculate_scenario_forecasts(self, fiscal_period_id, scenarios=None):
+        """1つの会計期について、複数シナリオの予測（基準予測×シナリオルール）を一括で作成
+        
+        scenarios省略時は会社のシナリオ設定にある全シナリオ（標準シナリオが先頭）。
+        戻り値: (シナリオ×項目×月の配列, シナリオリスト, 月リスト)
+        """
+        meta = self._get_period_meta(fiscal_period_id)
+        if meta is None:
+            scenarios = list(scenarios or [])
+            return np.zeros((len(scenarios), len(self.all_items), 0)), scenarios, []
+        
+        if scenarios is None:
+            scenarios = list(self.get_scenarios(meta['period']['comp_id']))
+        _, forecast_cube, period_months = self.load_scenario_forecasts([fiscal_period_id], scenarios)
+        return forecast_cube[0], list(scenarios), period_months[0]
+
+    def load_periods_data(self, period_ids, include_forecast=False, scenario="現実"):
+        """複数の会計期の実績（と予測）を1クエリで読み込み
         
-        df = df.drop_duplicates(subset=['項目名', 'month'], keep='last')
+        各期の月は会計月の序数（期首=0）で揃える。
+        戻り値: (実績の 期×項目×月 配列, 予測の 期×項目×月 配列 または None, 期ごとの月リスト)
+        """
+        # IDの型変換
+        period_ids = [
+            int.from_bytes(pid, 'little') if isinstance(pid, bytes) else int(pid)
+            for pid in period_ids
+        ]
         
-        # 月を正しくソート（会計期順）
-        df = self._sort_months(df, fiscal_period_id)
+        period_months = []
+        for pid in period_ids:
+            meta = self._get_period_meta(pid)
+            period_months.append(list(meta['months']) if meta else [])
+        n_months = max((len(months) for months in period_months), default=0)
+        
+        actual_cube = np.zeros((len(period_ids), len(self.all_items), n_months))
+        forecast_cube = np.zeros_like(actual_cube) if include_forecast else None
+        if not period_ids:
+            return actual_cube, forecast_cube, period_months
+        
+        period_pos = {pid: k for k, pid in enumerate(period_ids)}
+        month_indexes = [{m: j for j, m in enumerate(months)} for months in period_months]
+        
+        in_clause = ', '.join('?' * len(period_ids))
+        query = f"""
+            SELECT 0 AS kind, id, fiscal_period_id, item_name, month, amount
+            FROM actual_data WHERE fiscal_period_id IN ({in_clause})
+        """
+        params = list(period_ids)
+        if include_forecast:
+            query += f"""
+            UNION ALL
+            SELECT 1 AS kind, id, fiscal_period_id, item_name, month, amount
+            FROM forecast_data WHERE fiscal_period_id IN ({in_clause}) AND scenario = ?
+            """
+            params += list(period_ids) + [scenario]
+        query += " ORDER BY kind, id"
+        if self.use_postgres:
+            query = query.replace('?', '%s')
         
-        pivot_df = df.pivot(index='項目名', columns='month', values='amount').reset_index()
+        cubes = (actual_cube, forecast_cube)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, tuple(params))
+            for kind, _, period_id, item_name, month, amount in cursor:
+                if isinstance(period_id, bytes):
+                    period_id = int.from_bytes(period_id, 'little')
+                k = period_pos.get(period_id)
+                i = self.item_index.get(item_name)
+                if k is None or i is None:
+                    continue
+                j = month_indexes[k].get(month)
+                if j is None:
+                    continue
+                cubes[kind][k, i, j] = amount if amount is not None else 0.0
+        finally:
+            conn.close()
         
-        all_items_df = pd.DataFrame({'項目名': self.all_items})
-        pivot_df = pd.merge(all_items_df, pivot_df, on='項目名', how='left').fillna(0)
-        return pivot_df
+        return actual_cube, forecast_cube, period_months
+
+    def load_base_forecasts(self, period_ids):
+        """複数の会計期の実績と基準予測を読み込み（基準予測 = 現実の予測を補助科目の合計で上書きしたもの）
+        
+        ダッシュボードと各種一括計算はすべてこの基準予測にシナリオルールを掛けて使う。
+        戻り値: (実績の 期×項目×月 配列, 基準予測の 期×項目×月 配列, 期ごとの月リスト)
+        """
+        actual_cube, forecast_cube, period_months = self.load_periods_data(period_ids, include_forecast=True)
+        totals, has_data = self.load_periods_sub_account_totals(period_ids)
+        return actual_cube, np.where(has_data, totals, forecast_cube), period_months
+
+    def load_base_forecast_data(self, fiscal_period_id):
+        """基準予測を読み込み（all_items順・会計期の全月を列に持つDataFrame）"""
+        _, forecast_cube, period_months = self.load_base_forecasts([fiscal_period_id])
+        months = period_months[0]
+        return self._matrix_to_frame(forecast_cube[0, :, :len(months)], months)
+
+    def apply_periods_scenario_rules(self, forecast_cube, period_ids, period_months, scenarios):
+        """期×項目×月の基準予測に、期ごと（会社ごと）のシナリオルールを適用
+        
+        戻り値: 期×シナリオ×項目×月 の配列
+        """
+        forecast_cube = np.asarray(forecast_cube, dtype=float)
+        scenarios = list(scenarios)
+        result = np.zeros((forecast_cube.shape[0], len(scenarios)) + forecast_cube.shape[1:])
+        metas = [self._get_period_meta(period_id) for period_id in period_ids]
+        
+        # 全社の増減率・ルールは2クエリで読み込み、倍率は会社と月の組み合わせごとに1回だけ作る
+        definitions = self.load_scenario_definitions(
+            meta['period']['comp_id'] for meta in metas if meta is not None
+        )
+        multipliers = {}
+        for k, (meta, months) in enumerate(zip(metas, period_months)):
+            if meta is None or not months:
+                continue
+            comp_id = int(meta['period']['comp_id'])
+            key = (comp_id, tuple(months))
+            if key not in multipliers:
+                multipliers[key] = self.build_scenario_multipliers(comp_id, scenarios, months, definitions[comp_id])
+            result[k, :, :, :len(months)] = forecast_cube[k, None, :, :len(months)] * multipliers[key]
+        return result
+
+    def load_scenario_forecasts(self, period_ids, scenarios):
+        """複数の会計期・シナリオの予測を一括で作成（基準予測にシナリオルールを適用）
+        
+        戻り値: (実績の 期×項目×月 配列, 予測の 期×シナリオ×項目×月 配列, 期ごとの月リスト)
+        """
+        actual_cube, base_cube, period_months = self.load_base_forecasts(period_ids)
+        forecast_cube = self.apply_periods_scenario_rules(base_cube, period_ids, period_months, scenarios)
+        return actual_cube, forecast_cube, period_months
+
+    def load_actual_data(self, fiscal_period_id):
+        """実績データを読み込み（all_items順・会計期の全月を列に持つDataFrame）"""
+        matrix, months = self.load_actual_matrix(fiscal_period_id)
+        return self._matrix_to_frame(matrix, months)
+
+    def load_forecast_data(self, fiscal_period_id, scenario):
+        """予測データを読み込み（all_items順・会計期の全月を列に持つDataFrame）"""
+        matrix, months = self.load_forecast_matrix(fiscal_period_id, scenario)
+        return self._matrix_to_frame(matrix, months)
 
     def save_actual_item(self, fiscal_period_id, item_name, values_dict):
         """実績データを保存"""
@@ -734,6 +1376,7 @@ class DataProcessor:
                 )
             
             conn.commit()
+            self._bump_data_version()
             return True, "実績データを保存しました"
         except Exception as e:
             sys.stderr.write(f"Error saving actual data: {e}\n")
@@ -788,6 +1431,7 @@ class DataProcessor:
                 )
             
             conn.commit()
+            self._bump_data_version()
             sys.stderr.write(f"✅ 保存成功: {len(batch_data)}件のデータを保存しました\n")
             sys.stderr.flush()
             return True, f"{len(batch_data)}件の予測データを保存しました"
@@ -816,6 +1460,58 @@ class DataProcessor:
         
         return self._read_sql_query(query, params=(fiscal_period_id, scenario))
 
+    def load_periods_sub_account_totals(self, period_ids, scenario="現実"):
+        """複数の会計期の補助科目を親項目・月ごとにSQLで集計（1クエリ）
+        
+        戻り値: (合計の 期×項目×月 配列, 補助科目データがあるセルのマスク)
+        """
+        # IDの型変換
+        period_ids = [
+            int.from_bytes(pid, 'little') if isinstance(pid, bytes) else int(pid)
+            for pid in period_ids
+        ]
+        
+        month_indexes = []
+        for pid in period_ids:
+            meta = self._get_period_meta(pid)
+            month_indexes.append({m: j for j, m in enumerate(meta['months'])} if meta else {})
+        n_months = max((len(index) for index in month_indexes), default=0)
+        totals = np.zeros((len(period_ids), len(self.all_items), n_months))
+        has_data = np.zeros(totals.shape, dtype=bool)
+        if not period_ids:
+            return totals, has_data
+        
+        period_pos = {pid: k for k, pid in enumerate(period_ids)}
+        query = f"""
+            SELECT fiscal_period_id, parent_item, month, SUM(amount)
+            FROM sub_accounts
+            WHERE fiscal_period_id IN ({', '.join('?' * len(period_ids))}) AND scenario = ?
+            GROUP BY fiscal_period_id, parent_item, month
+        """
+        if self.use_postgres:
+            query = query.replace('?', '%s')
+        
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, tuple(period_ids) + (scenario,))
+            for period_id, parent_item, month, amount in cursor:
+                if isinstance(period_id, bytes):
+                    period_id = int.from_bytes(period_id, 'little')
+                k = period_pos.get(period_id)
+                i = self.item_index.get(parent_item)
+                if k is None or i is None:
+                    continue
+                j = month_indexes[k].get(month)
+                if j is None:
+                    continue
+                totals[k, i, j] = amount if amount is not None else 0.0
+                has_data[k, i, j] = True
+        finally:
+            conn.close()
+        
+        return totals, has_data
+
     def get_sub_accounts_for_parent(self, fiscal_period_id, scenario, parent_item):
         """親項目に紐づく補助科目を取得"""
         # IDの型変換
@@ -867,6 +1563,7 @@ class DataProcessor:
                 )
             
             conn.commit()
+            self._bump_data_version()
             return True, "補助科目を保存しました"
         except Exception as e:
             if conn:
@@ -893,85 +1590,415 @@ class DataProcessor:
                     "DELETE FROM sub_accounts WHERE fiscal_period_id = ? AND scenario = ? AND parent_item = ? AND sub_account_name = ?",
                     (fiscal_period_id, scenario, parent_item, sub_account_name)
                 )
+            self._bump_data_version()
             return True, "補助科目を削除しました"
         except Exception as e:
             return False, str(e)
 
-    def calculate_pl(self, actuals_df, forecasts_df, split_idx, months):
-        """損益計算書(PL)を計算"""
-        pl_df = pd.DataFrame(columns=['項目名'] + months + ['合計'])
-        
-        # 実績と予測を結合
-        combined_data = []
-        for item in self.all_items:
-            row_data = {'項目名': item}
-            actual_row = actuals_df[actuals_df['項目名'] == item]
-            forecast_row = forecasts_df[forecasts_df['項目名'] == item]
-            
-            total = 0
-            for i, month in enumerate(months):
-                if i < split_idx:
-                    val = actual_row[month].iloc[0] if not actual_row.empty and month in actual_row.columns else 0
-                else:
-                    val = forecast_row[month].iloc[0] if not forecast_row.empty and month in forecast_row.columns else 0
-                row_data[month] = val
-                total += val
-            
-            row_data['合計'] = total
-            combined_data.append(row_data)
-        
-        pl_df = pd.DataFrame(combined_data)
-        
-        # 計算項目の算出
-        def get_row_values(item_name):
-            row = pl_df[pl_df['項目名'] == item_name]
-            if row.empty:
-                return np.zeros(len(months) + 1)
-            return row[months + ['合計']].values[0]
-
-        # 1. 売上総利益 = 売上高 - 売上原価
-        sales = get_row_values("売上高")
-        cogs = get_row_values("売上原価")
-        gp = sales - cogs
-        pl_df.loc[pl_df['項目名'] == "売上総損益金額", months + ['合計']] = gp
-        
-        # 2. 販売管理費計
-        ga_total = np.zeros(len(months) + 1)
-        for item in self.ga_items:
-            ga_total += get_row_values(item)
-        pl_df.loc[pl_df['項目名'] == "販売管理費計", months + ['合計']] = ga_total
-        
-        # 3. 営業利益 = 売上総利益 - 販売管理費計
-        op = gp - ga_total
-        pl_df.loc[pl_df['項目名'] == "営業損益金額", months + ['合計']] = op
-        
-        # 4. 経常利益 = 営業利益 + 営業外収益 - 営業外費用
-        non_op_inc = get_row_values("営業外収益合計")
-        non_op_exp = get_row_values("営業外費用合計")
-        ord_profit = op + non_op_inc - non_op_exp
-        pl_df.loc[pl_df['項目名'] == "経常損益金額", months + ['合計']] = ord_profit
-        
-        # 5. 税引前当期純利益 = 経常利益 + 特別利益 - 特別損失
-        sp_inc = get_row_values("特別利益合計")
-        sp_exp = get_row_values("特別損失合計")
-        pre_tax_profit = ord_profit + sp_inc - sp_exp
-        pl_df.loc[pl_df['項目名'] == "税引前当期純損益金額", months + ['合計']] = pre_tax_profit
-        
-        # 6. 当期純利益 = 税引前当期純利益 - 法人税等
-        taxes = get_row_values("法人税、住民税及び事業税")
-        net_profit = pre_tax_profit - taxes
-        pl_df.loc[pl_df['項目名'] == "当期純損益金額", months + ['合計']] = net_profit
+    def _compile_account_tree(self, account_tree):
+        """勘定科目ツリーを検証し、項目リストと集計行列を作成
+        
+        集計行列は 項目×項目 の係数行列で、計算項目の行には計算式を
+        入力項目（葉）の係数まで展開した値、入力項目の行には単位行列が入る。
+        集計行列 @ 項目×月の行列 で全ての計算項目が一度に求まる。
+        """
+        nodes = [dict(node) for node in account_tree]
+        names = [node['name'] for node in nodes]
+        if len(set(names)) != len(names):
+            duplicates = sorted({name for name in names if names.count(name) > 1})
+            raise ValueError(f"勘定科目が重複しています: {', '.join(duplicates)}")
+        
+        node_map = {node['name']: node for node in nodes}
+        children = {name: [] for name in names}
+        for node in nodes:
+            parent = node.get('parent')
+            if parent is None:
+                continue
+            if parent not in node_map:
+                raise ValueError(f"{node['name']} の親項目 {parent} が定義されていません")
+            children[parent].append((node['name'], node.get('sign', 1)))
+        
+        def terms_of(name):
+            """計算項目の直下の項目と係数（入力項目はNone）"""
+            node = node_map[name]
+            if 'formula' in node:
+                return list(node['formula'])
+            return children[name] or None
+        
+        # 計算式を入力項目の係数まで展開（循環参照はエラー）
+        leaf_coefficients = {}
+        
+        def expand(name, path):
+            if name in leaf_coefficients:
+                return leaf_coefficients[name]
+            if name in path:
+                raise ValueError(f"勘定科目の計算式が循環しています: {' → '.join(path + [name])}")
+            terms = terms_of(name)
+            if terms is None:
+                coefficients = {name: 1.0}
+            else:
+                coefficients = {}
+                for term, coefficient in terms:
+                    if term not in node_map:
+                        raise ValueError(f"{name} の計算式の項目 {term} が定義されていません")
+                    for leaf, value in expand(term, path + [name]).items():
+                        coefficients[leaf] = coefficients.get(leaf, 0.0) + coefficient * value
+            leaf_coefficients[name] = coefficients
+            return coefficients
+        
+        for name in names:
+            expand(name, [])
+        
+        self.account_tree = nodes
+        self._account_children = {name: [child for child, _ in terms] for name, terms in children.items()}
+        self.all_items = names
+        self.item_index = {item: i for i, item in enumerate(names)}
         
-        # 表示用のタイプ分け
-        pl_df['タイプ'] = '詳細'
-        pl_df.loc[pl_df['項目名'].isin(self.calculated_items), 'タイプ'] = '要約'
-        pl_df.loc[pl_df['項目名'] == "売上高", 'タイプ'] = '要約'
-        pl_df.loc[pl_df['項目名'] == "売上原価", 'タイプ'] = '要約'
+        # 計算項目リスト (ユーザーが編集できない項目)
+        self.calculated_items = [name for name in names if terms_of(name) is not None]
+        # 販売管理費項目リスト
+        self.ga_items = [child for child, _ in children.get(GA_TOTAL_ITEM, [])]
+        # 補助科目が設定できる親項目
+        self.parent_items_with_sub_accounts = [node['name'] for node in nodes if node.get('sub_accounts')]
+        # PLで要約行として表示する項目
+        self.summary_items = [
+            node['name'] for node in nodes
+            if node.get('summary') or node['name'] in self.calculated_items
+        ]
         
+        aggregation = np.zeros((len(names), len(names)))
+        for name, coefficients in leaf_coefficients.items():
+            for leaf, value in coefficients.items():
+                aggregation[self.item_index[name], self.item_index[leaf]] = value
+        self.aggregation_matrix = aggregation
+
+    def _frame_to_matrix(self, df, months):
+        """項目名列を持つDataFrameを all_items×months の行列に変換（存在しない項目・月は0）"""
+        if df is None or df.empty or '項目名' not in df.columns:
+            return np.zeros((len(self.all_items), len(months)))
+        frame = df.drop_duplicates('項目名').set_index('項目名')
+        return frame.reindex(index=self.all_items, columns=list(months), fill_value=0).to_numpy(dtype=float)
+
+    def calculate_pl_matrix(self, actual_matrix, forecast_matrix, split_idx):
+        """項目×月の行列からPLを計算
+        
+        split_idxより前の月は実績、以降は予測を使う。
+        (..., 項目, 月) の配列も受け付ける。
+        戻り値: (..., 項目, 月+1) の配列（最終列が合計）
+        """
+        actual_matrix = np.asarray(actual_matrix, dtype=float)
+        forecast_matrix = np.asarray(forecast_matrix, dtype=float)
+        n_months = forecast_matrix.shape[-1]
+        
+        # 実績/予測の切り替えは列マスク1回で行う
+        is_actual = np.arange(n_months) < split_idx
+        return self._aggregate_pl(np.where(is_actual, actual_matrix, forecast_matrix))
+
+    def calculate_pl_batch(self, cube, split_indices=0, actual_cube=None):
+        """複数の期・シナリオのPLを一括計算
+        
+        cube: 予測の (期, シナリオ, 項目, 月) 配列（先頭の次元数は任意）
+        split_indices: 期ごとの実績/予測の境界（スカラーまたは先頭の次元に合わせた配列）
+        actual_cube: 実績の配列。シナリオ次元を持たない (期, 項目, 月) も可。
+                     省略時はcubeの値をそのまま使う
+        戻り値: (期, シナリオ, 項目, 月+1) の配列（最終列が合計）
+        """
+        cube = np.asarray(cube, dtype=float)
+        if actual_cube is None:
+            return self._aggregate_pl(cube)
+        
+        actual_cube = np.asarray(actual_cube, dtype=float)
+        if actual_cube.ndim == cube.ndim - 1:
+            # シナリオ共通の実績は項目の直前にシナリオ軸を追加して広げる
+            actual_cube = np.expand_dims(actual_cube, -3)
+        
+        # 境界を (先頭の次元..., 1, 1) に揃えて月の序数と比較
+        batch_ndim = cube.ndim - 2
+        split = np.asarray(split_indices)
+        split = split.reshape(split.shape + (1,) * (batch_ndim - split.ndim + 2))
+        is_actual = np.arange(cube.shape[-1]) < split
+        return self._aggregate_pl(np.where(is_actual, actual_cube, cube))
+
+    def calculate_pl_sweep(self, actual_matrix, forecast_matrix):
+        """全ての締月についてPLを一括計算
+        
+        戻り値: (締月数+1, 項目, 月+1) の配列。k番目は期首からkか月を実績とした場合のPL
+        （calculate_pl_matrix(actual, forecast, k) と同じ値）
+        """
+        forecast_matrix = np.asarray(forecast_matrix, dtype=float)
+        n_months = forecast_matrix.shape[-1]
+        splits = np.arange(n_months + 1)
+        cube = np.broadcast_to(forecast_matrix, (n_months + 1,) + forecast_matrix.shape)
+        return self.calculate_pl_batch(cube, splits, actual_matrix)
+
+    def _aggregate_pl(self, combined):
+        """(..., 項目, 月) の値に合計列を付け、計算項目を集計"""
+        # 未入力(NaN)は0として扱う（集計行列の積でNaNが他の行へ波及しないように）
+        combined = np.nan_to_num(combined)
+        n_months = combined.shape[-1]
+        
+        values = np.empty(combined.shape[:-1] + (n_months + 1,))
+        values[..., :n_months] = combined
+        # 合計は月順に足し込む（従来の逐次加算と同じ丸め）
+        values[..., n_months] = np.cumsum(combined, axis=-1)[..., -1] if n_months else 0.0
+        
+        # 計算項目は集計行列の積で一度に求める（入力項目の行はそのまま）
+        return np.matmul(self.aggregation_matrix, values)
+
+    def apply_pl_changes(self, pl_values, changes):
+        """入力項目の変更をPL行列へ差分で反映
+        
+        pl_values: calculate_pl_matrix の戻り値 (項目, 月+1)。その場で更新する
+        changes: [(項目名, 月の列番号, 差分), ...]
+        変更された月の列と合計列のうち、その項目と集計先の計算項目
+        （集計行列の該当列が0でない行）だけを更新する。
+        戻り値: 変更されたセル {(項目名, 列番号): 新しい値}
+        """
+        calculated = set(self.calculated_items)
+        total_col = pl_values.shape[-1] - 1
+        changed = {}
+        for item, month_idx, delta in changes:
+            if item in calculated:
+                raise ValueError(f"計算項目 {item} は直接変更できません")
+            if not delta:
+                continue
+            rows = np.flatnonzero(self.aggregation_matrix[:, self.item_index[item]])
+            increments = self.aggregation_matrix[rows, self.item_index[item]] * delta
+            for col in (month_idx, total_col):
+                pl_values[rows, col] += increments
+                for r in rows:
+                    changed[(self.all_items[r], col)] = float(pl_values[r, col])
+        return changed
+
+    def calculate_sensitivity(self, actual_matrix, forecast_matrix, split_idx, rate=0.1,
+                              targets=("営業損益金額", "当期純損益金額")):
+        """入力項目ごとに予測月を±rate変化させたときの対象項目（通期）への影響を一括計算
+        
+        全項目×上下の摂動を (摂動, 項目, 月) の配列にまとめ、calculate_pl_batch 1回で求める。
+        戻り値: 項目名・基準値（通期）と、対象項目ごとの上振れ/下振れ時の変化額のDataFrame
+                （最初の対象項目の影響幅が大きい順）
+        """
+        forecast_matrix = np.nan_to_num(np.asarray(forecast_matrix, dtype=float))
+        n_months = forecast_matrix.shape[-1]
+        items = [item for item in self.all_items if item not in self.calculated_items]
+        rows = np.array([self.item_index[item] for item in items])
+        target_rows = [self.item_index[t] for t in targets]
+        
+        # 摂動ごとの倍率: 前半が +rate、後半が -rate（予測月のみ）
+        forecast_months = np.arange(n_months) >= split_idx
+        multipliers = np.ones((2 * len(items), len(self.all_items), n_months))
+        positions = np.arange(len(items))
+        multipliers[positions, rows] = np.where(forecast_months, 1 + rate, 1.0)
+        multipliers[positions + len(items), rows] = np.where(forecast_months, 1 - rate, 1.0)
+        
+        base = self.calculate_pl_matrix(actual_matrix, forecast_matrix, split_idx)
+        perturbed = self.calculate_pl_batch(forecast_matrix * multipliers, split_idx, actual_matrix)
+        
+        deltas = perturbed[:, target_rows, -1] - base[target_rows, -1]  # 摂動×対象
+        up, down = deltas[:len(items)], deltas[len(items):]
+        
+        result = pd.DataFrame({'項目名': items, '基準値': base[rows, -1]})
+        for t, target in enumerate(targets):
+            result[f'{target}（+{rate * 100:g}%）'] = up[:, t]
+            result[f'{target}（-{rate * 100:g}%）'] = down[:, t]
+        
+        spread = np.abs(up[:, 0] - down[:, 0])
+        return result.iloc[np.argsort(-spread, kind='stable')].reset_index(drop=True)
+
+    def calculate_sensitivity_grid(self, actual_matrix, forecast_matrix, split_idx,
+                                   row_item="売上高", col_item="売上原価",
+                                   row_rates=(-0.2, -0.1, 0.0, 0.1, 0.2), col_rates=(-0.2, -0.1, 0.0, 0.1, 0.2),
+                                   target="営業損益金額"):
+        """2項目の変化率の組み合わせごとの対象項目（通期）を一括計算
+        
+        子項目を持つ項目（例: 販売管理費計）は配下の入力項目をまとめて変化させる。
+        戻り値: 行=row_itemの変化率、列=col_itemの変化率 のDataFrame
+        """
+        forecast_matrix = np.nan_to_num(np.asarray(forecast_matrix, dtype=float))
+        n_months = forecast_matrix.shape[-1]
+        row_rates = np.asarray(row_rates, dtype=float)
+        col_rates = np.asarray(col_rates, dtype=float)
+        forecast_months = np.arange(n_months) >= split_idx
+        
+        # (行の変化率, 列の変化率, 項目, 月) の倍率
+        multipliers = np.ones((len(row_rates), len(col_rates), len(self.all_items), n_months))
+        for item, rates, axis in ((row_item, row_rates, 0), (col_item, col_rates, 1)):
+            item_rows = [self.item_index[leaf] for leaf in self._rule_target_items(item)]
+            factor = 1 + np.where(forecast_months, rates[:, None], 0.0)  # 変化率×月
+            factor = factor[:, None, None, :] if axis == 0 else factor[None, :, None, :]
+            multipliers[:, :, item_rows, :] *= factor
+        
+        pl = self.calculate_pl_batch(forecast_matrix * multipliers, split_idx, actual_matrix)
+        return pd.DataFrame(
+            pl[:, :, self.item_index[target], -1],
+            index=pd.Index([f"{r * 100:+g}%" for r in row_rates], name=row_item),
+            columns=pd.Index([f"{c * 100:+g}%" for c in col_rates], name=col_item)
+        )
+
+    def goal_seek(self, pl_values, target, target_item="営業損益金額", monthly_targets=None):
+        """目標利益を達成するための必要売上高・費用上限を限界利益構造から閉形式で逆算
+        
+        変動費=売上原価（変動費率一定）、固定費=販管費として、各月と通期（最終列）を一括で解く。
+        pl_values: (..., 項目, 月+1) のPL配列（期間・シナリオの軸は任意）
+        target: 通期の目標額（スカラー、または先頭の軸に合わせた配列）
+        monthly_targets: (..., 月) の月次目標。省略時は通期目標を月数で均等割り
+        戻り値: '目標'・'必要売上高'・'売上高差額'・'固定費上限'・'変動費上限' の (..., 月+1) 配列
+                変動費率が100%以上または売上高がない月の必要売上高はNaN
+        販管費配下に入力項目がない、目標項目への係数が項目間で異なる、
+        または売上原価・販管費が目標項目に影響しない（係数0）場合はValueError
+        """
+        pl_values = np.asarray(pl_values, dtype=float)
+        n_months = pl_values.shape[-1] - 1
+        target = np.asarray(target, dtype=float)
+        if monthly_targets is None:
+            monthly_targets = np.repeat((target / n_months)[..., None], n_months, axis=-1)
+        targets = np.concatenate(
+            [np.broadcast_to(monthly_targets, pl_values.shape[:-2] + (n_months,)),
+             np.broadcast_to(target, pl_values.shape[:-2])[..., None]],
+            axis=-1
+        )
+        
+        t = self.item_index[target_item]
+        sales_row, variable_row = self.item_index["売上高"], self.item_index["売上原価"]
+        sales = pl_values[..., sales_row, :]
+        variable_costs = pl_values[..., variable_row, :]
+        fixed_costs = pl_values[..., self.item_index[GA_TOTAL_ITEM], :]
+        gap = targets - pl_values[..., t, :]
+        
+        # 目標項目に対する各費用の係数（集計行列から取得。通常は -1）
+        # 固定費は販管費配下の入力項目すべてに同じ係数が掛かっている場合のみ一括で逆算できる
+        variable_coef = self.aggregation_matrix[t, variable_row]
+        if not self._account_children.get(GA_TOTAL_ITEM):
+            raise ValueError(f"{GA_TOTAL_ITEM}の配下に項目がありません")
+        fixed_coefs = self.aggregation_matrix[
+            t, [self.item_index[item] for item in self._rule_target_items(GA_TOTAL_ITEM)]
+        ]
+        if not np.all(fixed_coefs == fixed_coefs[0]):
+            raise ValueError(f"{GA_TOTAL_ITEM}配下の項目の{target_item}への係数が揃っていません")
+        fixed_coef = fixed_coefs[0]
+        if variable_coef == 0:
+            raise ValueError(f"売上原価は{target_item}に影響しないため、変動費の上限を逆算できません")
+        if fixed_coef == 0:
+            raise ValueError(f"{GA_TOTAL_ITEM}は{target_item}に影響しないため、固定費の上限を逆算できません")
+        
+        # 売上高1円あたりの目標項目の増分 = 限界利益率
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = self.aggregation_matrix[t, sales_row] + variable_coef * (variable_costs / sales)
+            required_sales = np.where((sales > 0) & (slope > 0), sales + gap / slope, np.nan)
+        
+        return {
+            '目標': targets,
+            '必要売上高': required_sales,
+            '売上高差額': required_sales - sales,
+            '固定費上限': fixed_costs + gap / fixed_coef,
+            '変動費上限': variable_costs + gap / variable_coef,
+        }
+
+    def simulate_landing(self, actual_matrix, forecast_matrix, split_idx, shocks, correlations=None,
+                         n_paths=100000, seed=None, targets=("営業損益金額", "当期純損益金額"),
+                         percentiles=(5, 25, 50, 75, 95), chunk_size=10000, max_workers=None):
+        """予測月の項目にランダムなショックを与え、通期着地の分布をモンテカルロで求める
+        
+        shocks: {項目名: {'sigma': 月次の標準偏差(比率), 'distribution': 'normal' | 'lognormal'}}
+                子項目を持つ項目を指定すると配下の入力項目に同じショックを与える
+        correlations: {(項目名A, 項目名B): 相関係数} ショック要因間の相関
+        max_workers: 2以上ならチャンクをプロセスプールで並列計算（結果はseedのみで決まる）
+        
+        戻り値: {
+            'summary': 対象項目×(基準・平均・P5…) のDataFrame,
+            'bands': {対象項目: 月×(P5…) の累計着地のDataFrame},
+            'n_paths': パス数,
+        }
+        """
+        actual_matrix = np.nan_to_num(np.asarray(actual_matrix, dtype=float))
+        forecast_matrix = np.nan_to_num(np.asarray(forecast_matrix, dtype=float))
+        n_months = forecast_matrix.shape[-1]
+        targets = list(targets)
+        target_rows = [self.item_index[t] for t in targets]
+        
+        # 基準の着地（月次）
+        base_pl = self.calculate_pl_matrix(actual_matrix, forecast_matrix, split_idx)
+        base_monthly = base_pl[target_rows, :n_months].T  # 月×対象
+        
+        # ショック要因ごとに、予測月の各対象項目への寄与係数を作る
+        factors = list(shocks)
+        for item in factors:
+            if item not in self.item_index:
+                raise ValueError(f"項目 '{item}' は存在しません")
+        forecast_months = np.arange(n_months) >= split_idx
+        weights = self.aggregation_matrix[target_rows]  # 対象×項目
+        factor_bases = np.zeros((n_months, len(factors), len(targets)))
+        for k, item in enumerate(factors):
+            rows = [self.item_index[leaf] for leaf in self._rule_target_items(item)]
+            exposure = forecast_matrix[rows] * forecast_months  # 項目×月（実績月は0）
+            factor_bases[:, k, :] = exposure.T @ weights[:, rows].T
+        
+        sigmas = np.array([float(shocks[item].get('sigma', 0.0)) for item in factors])
+        lognormal = np.array([shocks[item].get('distribution', 'normal') == 'lognormal' for item in factors])
+        
+        correlation = np.eye(len(factors))
+        for (item_a, item_b), rho in (correlations or {}).items():
+            a, b = factors.index(item_a), factors.index(item_b)
+            correlation[a, b] = correlation[b, a] = rho
+        try:
+            cholesky = np.linalg.cholesky(correlation)
+        except np.linalg.LinAlgError:
+            raise ValueError("相関行列が正定値ではありません。相関係数を見直してください")
+        
+        # チャンクごとに独立した乱数列を割り当てる（並列数によらず同じ結果）
+        chunk_sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+        args = [(seeds[c], size, factor_bases, sigmas, lognormal, cholesky) for c, size in enumerate(chunk_sizes)]
+        
+        if max_workers and max_workers > 1 and len(args) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                deltas = list(executor.map(_simulate_landing_chunk, *zip(*args)))
+        else:
+            deltas = [_simulate_landing_chunk(*chunk_args) for chunk_args in args]
+        
+        # 累計着地（パス×月×対象）
+        paths = np.cumsum(base_monthly + np.concatenate(deltas), axis=1)
+        landing = paths[:, -1, :]
+        
+        percentiles = list(percentiles)
+        labels = [f"P{p:g}" for p in percentiles]
+        summary = pd.DataFrame({
+            '基準': base_pl[target_rows, n_months],
+            '平均': landing.mean(axis=0),
+            **dict(zip(labels, np.percentile(landing, percentiles, axis=0))),
+        }, index=pd.Index(targets, name='項目名'))
+        
+        band_values = np.percentile(paths, percentiles, axis=0)  # 分位点×月×対象
+        months = range(n_months)
+        bands = {
+            target: pd.DataFrame(band_values[:, :, t].T, columns=labels, index=months)
+            for t, target in enumerate(targets)
+        }
+        return {'summary': summary, 'bands': bands, 'n_paths': int(n_paths)}
+
+    def _pl_matrix_to_frame(self, values, months):
+        """PL行列を表示用DataFrame（項目名・各月・合計・タイプ）に変換"""
+        pl_df = pd.DataFrame(values, columns=list(months) + ['合計'])
+        pl_df.insert(0, '項目名', self.all_items)
+        
+        # 表示用のタイプ分け
+        summary_items = set(self.summary_items)
+        pl_df['タイプ'] = ['要約' if item in summary_items else '詳細' for item in self.all_items]
         return pl_df
 
+    def calculate_pl(self, actuals_df, forecasts_df, split_idx, months):
+        """損益計算書(PL)を計算"""
+        values = self.calculate_pl_matrix(
+            self._frame_to_matrix(actuals_df, months),
+            self._frame_to_matrix(forecasts_df, months),
+            split_idx
+        )
+        return self._pl_matrix_to_frame(values, months)
+
     def register_company(self, name):
         """会社を登録（重複チェック付き）"""
+        conn = None
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
@@ -983,7 +2010,6 @@ class DataProcessor:
                 cursor.execute("SELECT id FROM companies WHERE name = ?", (name,))
             
             if cursor.fetchone():
-                conn.close()
                 return False, f"会社名 '{name}' は既に登録されています"
             
             if self.use_postgres:
@@ -992,13 +2018,16 @@ class DataProcessor:
                 cursor.execute("INSERT INTO companies (name) VALUES (?)", (name,))
             
             conn.commit()
-            conn.close()
             return True, f"会社 '{name}' を登録しました"
         except Exception as e:
             return False, str(e)
+        finally:
+            if conn:
+                conn.close()
 
     def register_fiscal_period(self, comp_id, period_num, start_date, end_date):
         """会計期を登録（重複チェック付き）"""
+        conn = None
         try:
             # IDの型変換
             if isinstance(comp_id, bytes):
@@ -1014,7 +2043,6 @@ class DataProcessor:
                 cursor.execute("SELECT id FROM fiscal_periods WHERE comp_id = ? AND period_num = ?", (comp_id, period_num))
             
             if cursor.fetchone():
-                conn.close()
                 return False, f"第{period_num}期は既に登録されています"
             
             if self.use_postgres:
@@ -1029,10 +2057,13 @@ class DataProcessor:
                 )
             
             conn.commit()
-            conn.close()
+            self.invalidate_period_cache()
             return True, f"第{period_num}期を登録しました"
         except Exception as e:
             return False, str(e)
+        finally:
+            if conn:
+                conn.close()
 
     def import_yayoi_excel(self, file_path, fiscal_period_id, preview_only=True):
         """弥生会計のExcelからデータを抽出"""
@@ -1041,20 +2072,13 @@ class DataProcessor:
             if isinstance(fiscal_period_id, bytes):
                 fiscal_period_id = int.from_bytes(fiscal_period_id, 'little')
 
-            # 会計期間の情報を取得
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            if self.use_postgres:
-                cursor.execute("SELECT start_date, end_date FROM fiscal_periods WHERE id = %s", (fiscal_period_id,))
-            else:
-                cursor.execute("SELECT start_date, end_date FROM fiscal_periods WHERE id = ?", (fiscal_period_id,))
-            result = cursor.fetchone()
-            conn.close()
+            # 会計期間の情報を取得
+            period = self.get_period_info(fiscal_period_id)
             
-            if not result:
+            if not period:
                 return pd.DataFrame(), "会計期間情報が見つかりません"
             
-            start_date_str, end_date_str = result
+            start_date_str, end_date_str = period['start_date'], period['end_date']
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
             
@@ -1200,6 +2224,7 @@ class DataProcessor:
                     )
             
             conn.commit()
+            self._bump_data_version()
             return True, "インポートが完了しました"
         except Exception as e:
             if conn:
@@ -1287,6 +2312,7 @@ class DataProcessor:
                     )
             
             conn.commit()
+            self._bump_data_version()
             sys.stderr.write(f"✅ 予測データ一括保存成功: {len(batch_data)}件\n")
             sys.stderr.flush()
             return True, f"{len(batch_data)}件の予測データをインポートしました"
@@ -1304,6 +2330,225 @@ class DataProcessor:
             if conn:
                 conn.close()
 
+    def _upsert_forecast_rows(self, batch_data):
+        """予測データの行 (期ID, シナリオ, 項目名, 月, 金額) を1回の一括UPSERTで保存"""
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            if batch_data:
+                if self.use_postgres:
+                    from psycopg2.extras import execute_values
+                    execute_values(
+                        cursor,
+                        """
+                        INSERT INTO forecast_data (fiscal_period_id, scenario, item_name, month, amount) 
+                        VALUES %s
+                        ON CONFLICT (fiscal_period_id, scenario, item_name, month) 
+                        DO UPDATE SET amount = EXCLUDED.amount
+                        """,
+                        batch_data
+                    )
+                else:
+                    cursor.executemany(
+                        "INSERT OR REPLACE INTO forecast_data (fiscal_period_id, scenario, item_name, month, amount) VALUES (?, ?, ?, ?, ?)",
+                        batch_data
+                    )
+            conn.commit()
+            self._bump_data_version()
+            return True, f"{len(batch_data)}件の予測データを保存しました"
+        except Exception as e:
+            sys.stderr.write(f"❌ 予測データ一括保存エラー: {e}\n")
+            if conn:
+                conn.rollback()
+            return False, str(e)
+        finally:
+            if conn:
+                conn.close()
+
+    def _forecast_matrix_rows(self, fiscal_period_id, scenario, matrix, months, items=None):
+        """項目×月の行列を予測データの行 (期ID, シナリオ, 項目名, 月, 金額) に変換（NaNのセルは除く）"""
+        items = list(self.all_items if items is None else items)
+        matrix = np.asarray(matrix, dtype=float)
+        rows, cols = np.nonzero(~np.isnan(matrix))
+        return [
+            (fiscal_period_id, scenario, items[i], months[j], float(matrix[i, j]))
+            for i, j in zip(rows.tolist(), cols.tolist())
+        ]
+
+    def save_forecast_matrix(self, fiscal_period_id, scenario, matrix, months, items=None):
+        """項目×月の行列を予測データとして一括保存（NaNのセルは保存しない）
+        
+        items: 行の項目名（省略時はall_items）
+        """
+        # IDの型変換
+        if isinstance(fiscal_period_id, bytes):
+            fiscal_period_id = int.from_bytes(fiscal_period_id, 'little')
+        return self._upsert_forecast_rows(
+            self._forecast_matrix_rows(fiscal_period_id, scenario, matrix, months, items)
+        )
+
+    def load_actual_history(self, fiscal_period_id):
+        """対象期までの全会計期の実績を1本の月次系列として読み込み（1クエリ）
+        
+        対象期は実績が入っている最後の月までを履歴とし、先頭の実績がない月は除く。
+        戻り値: (履歴 (項目, 月) 配列, 対象期の月リスト, 対象期で実績がある月数)
+        """
+        meta = self._get_period_meta(fiscal_period_id)
+        if meta is None:
+            return np.zeros((len(self.all_items), 0)), [], 0
+        
+        period = meta['period']
+        periods = self.get_company_periods(period['comp_id'])
+        periods = periods[periods['start_date'] <= period['start_date']].sort_values('start_date')
+        actual_cube, _, period_months = self.load_periods_data(periods['id'].tolist())
+        return self._history_from_cube(actual_cube, period_months)
+
+    @staticmethod
+    def _history_from_cube(actual_cube, period_months):
+        """期×項目×月の実績を1本の月次系列につなげる（最後の期が対象期）
+        
+        戻り値: (履歴 (項目, 月) 配列, 対象期の月リスト, 対象期で実績がある月数)
+        """
+        # 各期の月数分を切り出して時系列につなげる
+        history = np.concatenate(
+            [actual_cube[k, :, :len(months)] for k, months in enumerate(period_months)], axis=1
+        )
+        target_months = period_months[-1]
+        has_data = (history != 0).any(axis=0)
+        observed_in_target = has_data[-len(target_months):] if target_months else has_data[:0]
+        n_observed = int(observed_in_target.nonzero()[0].max()) + 1 if observed_in_target.any() else 0
+        
+        end = history.shape[1] - len(target_months) + n_observed
+        start = int(has_data.argmax()) if has_data.any() else end
+        return history[:, start:end], list(target_months), n_observed
+
+    def auto_forecast(self, fiscal_period_id, method="holt_winters", scenario="現実", save=False, **params):
+        """実績履歴から対象期の未実績月を入力項目すべて一括で自動予測
+        
+        params: _fit_forecastのパラメータ（season_length, window, alpha, beta, gamma）
+        戻り値: (予測 (項目, 月) 配列（実績月・計算項目・実績のない項目はNaN）, 月リスト,
+                 予測開始月の序数, 保存結果 (success, msg) またはNone)
+        """
+        history, months, n_observed = self.load_actual_history(fiscal_period_id)
+        # 実績のない項目は手入力の予測を上書きしないよう対象外にする
+        editable = np.array([item not in self.calculated_items for item in self.all_items]) & (history != 0).any(axis=1)
+        
+        forecast = np.full((len(self.all_items), len(months)), np.nan)
+        forecast[np.ix_(editable, np.arange(n_observed, len(months)))] = _fit_forecast(
+            history[editable], len(months) - n_observed, method, **params
+        )
+        
+        saved = None
+        if save:
+            saved = self.save_forecast_matrix(fiscal_period_id, scenario, forecast, months)
+        return forecast, months, n_observed, saved
+
+    def distribute_annual_budget(self, fiscal_period_id, annual_amounts, scenario="現実", save=False):
+        """項目ごとの年間予算を前期実績の月次構成比で各月に配分（全項目を一括計算）
+        
+        前期がない・月数が異なる・前期実績の合計が0・符号が混在する項目は均等に配分する。
+        各月は円単位に丸め、端数は最終月で調整して年間額と一致させる。
+        annual_amounts: 項目名 → 年間額
+        戻り値: (配分 (項目, 月) 配列（対象外の項目はNaN）, 月リスト, 保存結果 (success, msg) またはNone)
+        """
+        meta = self._get_period_meta(fiscal_period_id)
+        if meta is None:
+            return np.zeros((len(self.all_items), 0)), [], None
+        months = list(meta['months'])
+        
+        annual = np.full(len(self.all_items), np.nan)
+        for item, amount in annual_amounts.items():
+            if item in self.item_index and pd.notna(amount):
+                annual[self.item_index[item]] = float(amount)
+        
+        # 前期（開始日が直前の期）の実績パターン
+        period = meta['period']
+        periods = self.get_company_periods(period['comp_id'])
+        prior = periods[periods['start_date'] < period['start_date']].sort_values('start_date')
+        pattern = np.zeros((len(self.all_items), len(months)))
+        if not prior.empty:
+            prior_cube, _, prior_months = self.load_periods_data([prior['id'].iloc[-1]])
+            if len(prior_months[0]) == len(months):
+                pattern = prior_cube[0]
+        
+        totals = pattern.sum(axis=1, keepdims=True)
+        weights = np.divide(pattern, totals, out=np.zeros_like(pattern), where=totals != 0)
+        seasonal = (totals[:, 0] != 0) & (weights >= 0).all(axis=1)
+        weights[~seasonal] = 1.0 / len(months)
+        
+        budget = np.round(annual[:, None] * weights)
+        budget[:, -1] += annual - budget.sum(axis=1)
+        
+        saved = None
+        if save:
+            saved = self.save_forecast_matrix(fiscal_period_id, scenario, budget, months)
+        return budget, months, saved
+
+    def auto_forecast_companies(self, comp_ids=None, method="holt_winters", scenario="現実", max_workers=None, **params):
+        """複数の会社の最新期を自動予測し、全社分を1回の一括UPSERTで保存
+        
+        全社の会計期と実績はそれぞれ1クエリで読み込み、履歴の長さと予測月数が同じ会社の行を
+        まとめて1回の_fit_forecastで計算する。max_workersはバッチ処理などオフライン実行向けの
+        オプションで、2以上のときだけプロセスプールで並列化する（Streamlitからは指定しない）。
+        comp_ids: 対象の会社ID（省略時は全社）
+        戻り値: (success, msg)
+        """
+        periods = self._read_sql_query("SELECT * FROM fiscal_periods")
+        if comp_ids is not None:
+            periods = periods[periods['comp_id'].isin(list(comp_ids))]
+        periods = periods.sort_values(['comp_id', 'start_date'])
+        period_ids = periods['id'].tolist()
+        actual_cube, _, period_months = self.load_periods_data(period_ids)
+        editable = np.array([item not in self.calculated_items for item in self.all_items])
+        
+        # 会社ごとに最新期までの履歴を切り出す（期の並びは会社・開始日順）
+        jobs = []
+        groups = {}
+        pos = 0
+        for _, company_periods in periods.groupby('comp_id', sort=False):
+            count = len(company_periods)
+            history, months, n_observed = self._history_from_cube(
+                actual_cube[pos:pos + count], period_months[pos:pos + count]
+            )
+            period_id = int(company_periods['id'].iloc[-1])
+            pos += count
+            # 実績のない項目は手入力の予測を上書きしないよう対象外にする
+            items = editable & (history != 0).any(axis=1)
+            if n_observed < len(months) and items.any():
+                key = (history.shape[1], len(months) - n_observed)
+                groups.setdefault(key, []).append(len(jobs))
+                jobs.append((period_id, months, n_observed, items, history[items]))
+        
+        # 同じ形の履歴を縦に積んで一括予測
+        args = [
+            (np.vstack([jobs[j][4] for j in members]), horizon, method)
+            for (_, horizon), members in groups.items()
+        ]
+        if max_workers and max_workers > 1 and len(args) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_fit_forecast, *a, **params) for a in args]
+                stacked = [future.result() for future in futures]
+        else:
+            stacked = [_fit_forecast(*a, **params) for a in args]
+        
+        results = [None] * len(jobs)
+        for members, result in zip(groups.values(), stacked):
+            offsets = np.cumsum([0] + [len(jobs[j][4]) for j in members])
+            for j, start, stop in zip(members, offsets[:-1], offsets[1:]):
+                results[j] = result[start:stop]
+        
+        batch_data = []
+        for (period_id, months, n_observed, items, _), result in zip(jobs, results):
+            item_names = [item for item, flag in zip(self.all_items, items) if flag]
+            batch_data += self._forecast_matrix_rows(period_id, scenario, result, months[n_observed:], item_names)
+        
+        success, msg = self._upsert_forecast_rows(batch_data)
+        if success:
+            msg = f"{len(jobs)}社の最新期を自動予測しました（{len(batch_data)}件）"
+        return success, msg
+
     def delete_sub_account_all_periods(self, comp_id, scenario, parent_item, sub_account_name):
         """特定の補助科目を全期から削除"""
         conn = None
@@ -1347,6 +2592,7 @@ class DataProcessor:
                 deleted_count += cursor.rowcount
             
             conn.commit()
+            self._bump_data_version()
             sys.stderr.write(f"✅ 全期削除成功: {deleted_count}件削除\n")
             sys.stderr.flush()
             return True, f"{len(periods)}期から削除しました（{deleted_count}件）"
@@ -1433,6 +2679,7 @@ class DataProcessor:
                     copied_count += 1
             
             conn.commit()
+            self._bump_data_version()
             sys.stderr.write(f"✅ 全期コピー成功: {copied_count}件追加\n")
             sys.stderr.flush()
             return True, f"{len(periods)-1}期にコピーしました（{copied_count}件）"
@@ -1448,149 +2695,625 @@ class DataProcessor:
             if conn:
                 conn.close()
 
-    def calculate_bs_data(self, fiscal_period_id):
-        """貸借対照表データを計算（簡易版）"""
+    def load_opening_balances(self, period_ids):
+        """複数の会計期の期首残高を1クエリで読み込み
+        
+        戻り値: (期, BALANCE_SHEET_ITEMS) の配列（未登録の科目は0）
+        """
+        period_ids = [
+            int.from_bytes(pid, 'little') if isinstance(pid, bytes) else int(pid)
+            for pid in period_ids
+        ]
+        balances = np.zeros((len(period_ids), len(BALANCE_SHEET_ITEMS)))
+        if not period_ids:
+            return balances
+        
+        period_pos = {pid: k for k, pid in enumerate(period_ids)}
+        item_pos = {item: b for b, item in enumerate(BALANCE_SHEET_ITEMS)}
+        query = f"""
+            SELECT fiscal_period_id, item_name, amount FROM opening_balances
+            WHERE fiscal_period_id IN ({', '.join('?' * len(period_ids))})
+        """
+        if self.use_postgres:
+            query = query.replace('?', '%s')
+        
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, tuple(period_ids))
+            for period_id, item_name, amount in cursor:
+                if isinstance(period_id, bytes):
+                    period_id = int.from_bytes(period_id, 'little')
+                k, b = period_pos.get(period_id), item_pos.get(item_name)
+                if k is not None and b is not None:
+                    balances[k, b] = amount if amount is not None else 0.0
+        finally:
+            conn.close()
+        return balances
+
+    def save_opening_balances(self, fiscal_period_id, balances):
+        """期首残高を保存（科目名 → 金額）"""
+        # IDの型変換
+        if isinstance(fiscal_period_id, bytes):
+            fiscal_period_id = int.from_bytes(fiscal_period_id, 'little')
+        
+        unknown = [item for item in balances if item not in BALANCE_SHEET_ITEMS]
+        if unknown:
+            return False, f"未定義の科目です: {', '.join(unknown)}"
+        
+        batch_data = [
+            (fiscal_period_id, item_name, float(amount) if pd.notna(amount) else 0.0)
+            for item_name, amount in balances.items()
+        ]
+        
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            if self.use_postgres:
+                from psycopg2.extras import execute_values
+                execute_values(
+                    cursor,
+                    """
+                    INSERT INTO opening_balances (fiscal_period_id, item_name, amount) VALUES %s
+                    ON CONFLICT (fiscal_period_id, item_name) DO UPDATE SET amount = EXCLUDED.amount
+                    """,
+                    batch_data
+                )
+            else:
+                cursor.executemany(
+                    """
+                    INSERT INTO opening_balances (fiscal_period_id, item_name, amount) VALUES (?, ?, ?)
+                    ON CONFLICT (fiscal_period_id, item_name) DO UPDATE SET amount = excluded.amount
+                    """,
+                    batch_data
+                )
+            conn.commit()
+            self._bump_data_version()
+            return True, "期首残高を保存しました"
+        except Exception as e:
+            sys.stderr.write(f"❌ 期首残高保存エラー: {e}\n")
+            if conn:
+                conn.rollback()
+            return False, str(e)
+        finally:
+            if conn:
+                conn.close()
+
+    def get_scenarios(self, comp_id):
+        """会社のシナリオと増減率の一覧を取得（標準シナリオが先頭、未保存は既定値）
+        
+        戻り値: {シナリオ名: 増減率} （表示順）
+        """
+        # IDの型変換
+        if isinstance(comp_id, bytes):
+            comp_id = int.from_bytes(comp_id, 'little')
+        
+        scenarios = dict(DEFAULT_SCENARIO_RATES)
+        df = self._read_sql_query(
+            "SELECT scenario, rate FROM scenario_settings WHERE comp_id = ? ORDER BY id",
+            params=(comp_id,)
+        )
+        for scenario, rate in zip(df['scenario'], df['rate']):
+            scenarios[scenario] = float(rate)
+        return scenarios
+
+    def save_scenario(self, comp_id, scenario, rate):
+        """シナリオの増減率を保存（新しいシナリオ名なら追加）"""
+        # IDの型変換
+        if isinstance(comp_id, bytes):
+            comp_id = int.from_bytes(comp_id, 'little')
+        
+        scenario = scenario.strip()
+        if not scenario:
+            return False, "シナリオ名を入力してください"
+        
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            if self.use_postgres:
+                cursor.execute(
+                    """
+                    INSERT INTO scenario_settings (comp_id, scenario, rate) VALUES (%s, %s, %s)
+                    ON CONFLICT (comp_id, scenario) DO UPDATE SET rate = EXCLUDED.rate
+                    """,
+                    (comp_id, scenario, float(rate))
+                )
+            else:
+                cursor.execute(
+                    """
+                    INSERT INTO scenario_settings (comp_id, scenario, rate) VALUES (?, ?, ?)
+                    ON CONFLICT (comp_id, scenario) DO UPDATE SET rate = excluded.rate
+                    """,
+                    (comp_id, scenario, float(rate))
+                )
+            conn.commit()
+            self._bump_data_version()
+            return True, f"シナリオ '{scenario}' の増減率を {float(rate) * 100:.1f}% に設定しました"
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            return False, str(e)
+        finally:
+            if conn:
+                conn.close()
+
+    def delete_scenario(self, comp_id, scenario):
+        """追加したシナリオとそのルールを削除（標準シナリオは削除不可）"""
+        # IDの型変換
+        if isinstance(comp_id, bytes):
+            comp_id = int.from_bytes(comp_id, 'little')
+        
+        if scenario in DEFAULT_SCENARIO_RATES:
+            return False, f"標準シナリオ '{scenario}' は削除できません"
+        
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            placeholder = '%s' if self.use_postgres else '?'
+            for table in ('scenario_rules', 'scenario_settings'):
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE comp_id = {placeholder} AND scenario = {placeholder}",
+                    (comp_id, scenario)
+                )
+            conn.commit()
+            self._bump_data_version()
+            return True, f"シナリオ '{scenario}' を削除しました"
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            return False, str(e)
+        finally:
+            if conn:
+                conn.close()
+
+    def get_scenario_rules(self, comp_id, scenario):
+        """シナリオのルール一覧を取得（未保存なら既定のルール）"""
+        # IDの型変換
+        if isinstance(comp_id, bytes):
+            comp_id = int.from_bytes(comp_id, 'little')
+        
+        df = self._read_sql_query(
+            """
+            SELECT target_item, elasticity, start_month, end_month
+            FROM scenario_rules WHERE comp_id = ? AND scenario = ? ORDER BY id
+            """,
+            params=(comp_id, scenario)
+        )
+        if df.empty:
+            return [dict(rule) for rule in DEFAULT_SCENARIO_RULES]
+        return [self._scenario_rule_from_row(row) for row in df.itertuples(index=False)]
+
+    @staticmethod
+    def _scenario_rule_from_row(row):
+        """scenario_rulesの行をルールのdictに変換"""
+        return {
+            'target_item': row.target_item,
+            'elasticity': float(row.elasticity),
+            'start_month': row.start_month or None,
+            'end_month': row.end_month or None,
+        }
+
+    def load_scenario_definitions(self, comp_ids):
+        """複数の会社のシナリオ増減率とルールをまとめて読み込み（増減率・ルールそれぞれ1クエリ）
+        
+        戻り値: {会社ID: {'rates': {シナリオ名: 増減率}, 'rules': {シナリオ名: [ルール]}}}
+                ルールが未保存のシナリオはrulesに含めない（既定のルールを使う）
+        """
+        comp_ids = sorted({
+            int.from_bytes(comp_id, 'little') if isinstance(comp_id, bytes) else int(comp_id)
+            for comp_id in comp_ids
+        })
+        definitions = {comp_id: {'rates': dict(DEFAULT_SCENARIO_RATES), 'rules': {}} for comp_id in comp_ids}
+        if not comp_ids:
+            return definitions
+        
+        in_clause = ', '.join('?' * len(comp_ids))
+        rates = self._read_sql_query(
+            f"SELECT comp_id, scenario, rate FROM scenario_settings WHERE comp_id IN ({in_clause}) ORDER BY id",
+            params=tuple(comp_ids)
+        )
+        for comp_id, scenario, rate in zip(rates['comp_id'], rates['scenario'], rates['rate']):
+            definitions[int(comp_id)]['rates'][scenario] = float(rate)
+        
+        rules = self._read_sql_query(
+            f"""
+            SELECT comp_id, scenario, target_item, elasticity, start_month, end_month
+            FROM scenario_rules WHERE comp_id IN ({in_clause}) ORDER BY id
+            """,
+            params=tuple(comp_ids)
+        )
+        for row in rules.itertuples(index=False):
+            definitions[int(row.comp_id)]['rules'].setdefault(row.scenario, []).append(
+                self._scenario_rule_from_row(row)
+            )
+        return definitions
+
+    def save_scenario_rules(self, comp_id, scenario, rules):
+        """シナリオのルールを置き換えて保存"""
+        # IDの型変換
+        if isinstance(comp_id, bytes):
+            comp_id = int.from_bytes(comp_id, 'little')
+        
+        for rule in rules:
+            if rule['target_item'] not in self.item_index:
+                return False, f"項目 '{rule['target_item']}' は存在しません"
+        
+        conn = None
         try:
-            # 実際のBSデータが必要だが、簡易的にPLから推計
-            # 本来はBS専用のデータ入力が必要
-            
-            # ダミーデータを返す（実装例）
-            bs_data = {
-                '流動資産': {
-                    '現金及び預金': 50000000,
-                    '売掛金': 30000000,
-                    '棚卸資産': 20000000,
-                },
-                '固定資産': {
-                    '有形固定資産': 80000000,
-                    '無形固定資産': 10000000,
-                },
-                '流動負債': {
-                    '買掛金': 25000000,
-                    '短期借入金': 30000000,
-                },
-                '固定負債': {
-                    '長期借入金': 50000000,
-                },
-                '純資産': {
-                    '資本金': 30000000,
-                    '利益剰余金': 55000000,
-                }
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            placeholder = '%s' if self.use_postgres else '?'
+            cursor.execute(
+                f"DELETE FROM scenario_rules WHERE comp_id = {placeholder} AND scenario = {placeholder}",
+                (comp_id, scenario)
+            )
+            cursor.executemany(
+                f"""
+                INSERT INTO scenario_rules (comp_id, scenario, target_item, elasticity, start_month, end_month)
+                VALUES ({', '.join([placeholder] * 6)})
+                """,
+                [
+                    (
+                        comp_id, scenario, rule['target_item'], float(rule['elasticity']),
+                        rule.get('start_month') or None, rule.get('end_month') or None
+                    )
+                    for rule in rules
+                ]
+            )
+            conn.commit()
+            self._bump_data_version()
+            return True, f"シナリオ '{scenario}' のルールを{len(rules)}件保存しました"
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            return False, str(e)
+        finally:
+            if conn:
+                conn.close()
+
+    def _rule_target_items(self, target_item):
+        """ルールの対象項目を入力項目に展開（子項目を持つ項目は配下の入力項目すべて）"""
+        children = self._account_children.get(target_item)
+        if not children:
+            return [target_item]
+        items = []
+        for child in children:
+            items.extend(self._rule_target_items(child))
+        return items
+
+    def build_scenario_multipliers(self, comp_id, scenarios, months, definition=None):
+        """シナリオ×項目×月の調整倍率を作成
+        
+        各ルールの倍率 (1 + 弾性値 × 増減率) を対象項目・適用月に掛け合わせる。
+        同じセルに複数のルールが当たる場合は倍率を乗算する。
+        definition: load_scenario_definitionsの会社分（省略時はこの会社分を読み込む）
+        """
+        scenarios = list(scenarios)
+        months = list(months)
+        multipliers = np.ones((len(scenarios), len(self.all_items), len(months)))
+        if definition is None:
+            definition, = self.load_scenario_definitions([comp_id]).values()
+        month_array = np.array(months, dtype=object)
+        
+        scenario_rows, item_rows, factors, month_masks = [], [], [], []
+        for s, scenario in enumerate(scenarios):
+            rate = definition['rates'].get(scenario, 0.0)
+            if rate == 0:
+                continue
+            for rule in definition['rules'].get(scenario) or DEFAULT_SCENARIO_RULES:
+                mask = np.ones(len(months), dtype=bool)
+                if rule.get('start_month'):
+                    mask &= month_array >= rule['start_month']
+                if rule.get('end_month'):
+                    mask &= month_array <= rule['end_month']
+                for item in self._rule_target_items(rule['target_item']):
+                    scenario_rows.append(s)
+                    item_rows.append(self.item_index[item])
+                    factors.append(1 + rule['elasticity'] * rate)
+                    month_masks.append(mask)
+        
+        if factors:
+            # 適用月は倍率、対象外の月は1 (= 倍率 ** False) にして一括で掛け合わせる
+            values = np.power(np.array(factors)[:, None], np.array(month_masks))
+            np.multiply.at(multipliers, (np.array(scenario_rows), np.array(item_rows)), values)
+        return multipliers
+
+    def apply_scenario_rules(self, forecast_matrix, comp_id, scenarios, months):
+        """基準の予測（項目×月）に各シナリオのルールを適用し、シナリオ×項目×月で返す"""
+        multipliers = self.build_scenario_multipliers(comp_id, scenarios, months)
+        return np.asarray(forecast_matrix, dtype=float) * multipliers
+
+    def calculate_balance_sheet_matrix(self, pl_values, opening, **assumptions):
+        """PL配列と期首残高から月末の貸借対照表を一括で繰り越し計算
+        
+        現金はCF、売掛金・買掛金は回収・支払サイト、有形固定資産は設備投資と減価償却、
+        長期借入金は借入と返済、利益剰余金は当期純損益で更新し、その他の科目は期首残高のまま。
+        opening: (..., BALANCE_SHEET_ITEMS) の期首残高
+        assumptions: calculate_cash_flow_matrixの前提（期首の現金・売掛金・買掛金は期首残高を使う）
+        戻り値: (月末残高 (..., BALANCE_SHEET_ITEMS, 月) 配列, CF (..., CASH_FLOW_ITEMS, 月+1) 配列)
+        """
+        pl_values = np.asarray(pl_values, dtype=float)
+        opening = np.asarray(opening, dtype=float)
+        col = {item: b for b, item in enumerate(BALANCE_SHEET_ITEMS)}
+        
+        cash_flow = self.calculate_cash_flow_matrix(
+            pl_values,
+            opening_cash=opening[..., col["現金及び預金"]],
+            opening_receivables=opening[..., col["売掛金"]],
+            opening_payables=opening[..., col["買掛金"]],
+            **assumptions
+        )
+        
+        def cumulative(item):
+            return np.cumsum(cash_flow[..., CASH_FLOW_ITEMS.index(item), :-1], axis=-1)
+        
+        n_months = pl_values.shape[-1] - 1
+        batch_shape = np.broadcast_shapes(pl_values.shape[:-2], opening.shape[:-1])
+        balances = np.repeat(
+            np.broadcast_to(opening, batch_shape + (len(BALANCE_SHEET_ITEMS),))[..., None], n_months, axis=-1
+        )
+        balances[..., col["現金及び預金"], :] = cash_flow[..., CASH_FLOW_ITEMS.index("現金及び現金同等物の期末残高"), :-1]
+        balances[..., col["売掛金"], :] -= cumulative("売上債権の増減額")
+        balances[..., col["買掛金"], :] += cumulative("仕入債務の増減額")
+        balances[..., col["有形固定資産"], :] -= cumulative("設備投資による支出") + cumulative("減価償却費")
+        balances[..., col["長期借入金"], :] += cumulative("借入による収入") + cumulative("借入金の返済による支出")
+        balances[..., col["利益剰余金"], :] += np.cumsum(
+            pl_values[..., self.item_index["当期純損益金額"], :-1], axis=-1
+        )
+        return balances, cash_flow
+
+    def _balance_sheet_totals(self, balances):
+        """月末残高の配列から区分ごとの合計を計算（区分名・部名 → (..., 月) 配列）"""
+        totals = {}
+        for section, categories in BALANCE_SHEET_STRUCTURE.items():
+            for category, items in categories.items():
+                rows = [BALANCE_SHEET_ITEMS.index(item) for item in items]
+                totals[category] = balances[..., rows, :].sum(axis=-2)
+            totals[section] = sum(totals[category] for category in categories)
+        return totals
+
+    def calculate_balance_ratios(self, pl_values, balances):
+        """PLと月末残高からBALANCE_RATIOSの指標を月次で一括計算
+        
+        ROA・ROEは期首からの累計当期純損益を月末の総資産・純資産で割る（通期は期末の値）。
+        戻り値: (..., BALANCE_RATIOS, 月+1) 配列（最終列が通期）。分母が0以下の月は0
+        """
+        pl_values = np.asarray(pl_values, dtype=float)
+        totals = self._balance_sheet_totals(balances)
+        net_income = np.cumsum(pl_values[..., self.item_index["当期純損益金額"], :-1], axis=-1)
+        
+        pairs = [
+            (net_income, totals["資産の部"]),
+            (net_income, totals["純資産の部"]),
+            (totals["純資産の部"], totals["資産の部"]),
+            (totals["流動資産"], totals["流動負債"]),
+        ]
+        ratios = np.stack([
+            np.divide(numerator * 100, denominator, out=np.zeros(np.broadcast_shapes(numerator.shape, denominator.shape)), where=denominator > 0)
+            for numerator, denominator in pairs
+        ], axis=-2)
+        return np.concatenate([ratios, ratios[..., -1:]], axis=-1)
+
+    def calculate_balance_sheets(self, period_ids, scenario="現実", split_indices=None, **assumptions):
+        """複数の会計期の月末貸借対照表とBS指標を一括計算（データバージョンごとにキャッシュ）
+        
+        期首残高はopening_balancesから読み込む（未登録の科目は0）。
+        split_indices: 期ごとの実績/予測の境界。省略時は実績のみで計算
+        assumptions: calculate_cash_flow_matrixの前提（スカラー）
+        戻り値: {'months': 期ごとの月リスト, 'pl': PL配列, 'opening': (期, 科目) 配列,
+                 'balances': (期, 科目, 月) 配列, 'cash_flow': (期, CF行, 月+1) 配列,
+                 'ratios': (期, BALANCE_RATIOS, 月+1) 配列}
+        """
+        def compute():
+            periods = self.calculate_periods_pl(period_ids, scenario, split_indices)
+            opening = self.load_opening_balances(period_ids)
+            balances, cash_flow = self.calculate_balance_sheet_matrix(periods['pl'], opening, **assumptions)
+            return {
+                **periods,
+                'opening': opening,
+                'balances': balances,
+                'cash_flow': cash_flow,
+                'ratios': self.calculate_balance_ratios(periods['pl'], balances)
             }
+        
+        key = ('balance_sheet', self._period_key(period_ids, split_indices), scenario, tuple(sorted(assumptions.items())))
+        return self._cached_result(key, compute)
+
+    def calculate_bs_data(self, fiscal_period_id):
+        """貸借対照表データを計算（実績による期末残高、区分 → 科目 → 金額）"""
+        try:
+            result = self.calculate_balance_sheets([fiscal_period_id])
+            n_months = len(result['months'][0])
+            if n_months == 0:
+                return {}
             
-            return bs_data
+            closing = result['balances'][0, :, n_months - 1]
+            return {
+                category: {item: float(closing[BALANCE_SHEET_ITEMS.index(item)]) for item in items}
+                for categories in BALANCE_SHEET_STRUCTURE.values()
+                for category, items in categories.items()
+            }
         except Exception as e:
             sys.stderr.write(f"❌ BS計算エラー: {e}\n")
             return {}
     
+    def _period_key(self, period_ids, split_indices):
+        """期IDと実績/予測の境界をキャッシュキー用のタプルに正規化"""
+        period_ids = tuple(
+            int.from_bytes(pid, 'little') if isinstance(pid, bytes) else int(pid)
+            for pid in period_ids
+        )
+        if split_indices is None:
+            return period_ids, None
+        return period_ids, tuple(np.broadcast_to(split_indices, (len(period_ids),)).tolist())
+
+    def calculate_periods_pl(self, period_ids, scenario="現実", split_indices=None):
+        """複数の会計期のPLを1クエリで読み込んで一括計算（データバージョンごとにキャッシュ）
+        
+        予測はダッシュボードと同じく基準予測（現実＋補助科目の合計）にscenarioのルールを適用したもの。
+        split_indices: 期ごとの実績/予測の境界。省略時は実績のみで計算
+        戻り値: {'months': 期ごとの月リスト, 'pl': (期, 項目, 月+1) のPL配列}
+        """
+        period_ids, splits = self._period_key(period_ids, split_indices)
+        
+        def compute():
+            if splits is None:
+                actual_cube, _, period_months = self.load_periods_data(period_ids)
+                pl_values = self.calculate_pl_batch(actual_cube)
+            else:
+                actual_cube, forecast_cube, period_months = self.load_scenario_forecasts(period_ids, [scenario])
+                pl_values = self.calculate_pl_batch(forecast_cube[:, 0], np.array(splits), actual_cube)
+            return {'months': period_months, 'pl': pl_values}
+        
+        return self._cached_result(('pl', period_ids, splits, scenario), compute)
+
+    @staticmethod
+    def _trailing_balance(flows, months_outstanding, opening=None):
+        """月次の発生額から、直近months_outstanding月分が未決済として残る月末残高を計算
+        
+        flows: (..., 月) 配列。期首より前の月は初月と同額が続いていたとみなす
+        opening: 期首残高。省略時は上記の仮定から求める
+        戻り値: (期首残高 (...,), 月末残高 (..., 月))
+        """
+        whole = int(np.floor(months_outstanding))
+        fraction = months_outstanding - whole
+        n_months = flows.shape[-1]
+        
+        # 期首前の月を初月の値で補い、累積和の差で直近whole月分を合計
+        padded = np.concatenate([np.repeat(flows[..., :1], whole + 1, axis=-1), flows], axis=-1)
+        cumulative = np.concatenate([np.zeros(flows.shape[:-1] + (1,)), np.cumsum(padded, axis=-1)], axis=-1)
+        ends = np.arange(whole, whole + n_months + 1) + 1  # 期首（補った最後の月）と各月の末尾
+        balances = cumulative[..., ends] - cumulative[..., ends - whole] + fraction * padded[..., ends - whole - 1]
+        
+        opening_balance = balances[..., 0] if opening is None else np.broadcast_to(opening, flows.shape[:-1]).astype(float)
+        return opening_balance, balances[..., 1:]
+
+    def calculate_cash_flow_matrix(self, pl_values, receivable_months=1.0, payable_months=1.0,
+                                   capex=0.0, borrowing=0.0, repayment=0.0, opening_cash=0.0,
+                                   opening_receivables=None, opening_payables=None):
+        """PL配列から間接法の月次キャッシュフローを一括計算
+        
+        売上債権は売上高の、仕入債務は売上原価の直近○か月分が残高として残るとみなす。
+        法人税等は計上月に支払うものとする。
+        pl_values: (..., 項目, 月+1) のPL配列（期・シナリオの軸は任意）
+        capex/borrowing/repayment: 月次の金額（スカラーまたは (..., 月) 配列）
+        戻り値: (..., CASH_FLOW_ITEMS, 月+1) 配列（最終列は合計、期末残高の行は期末の値）
+        """
+        pl_values = np.asarray(pl_values, dtype=float)
+        monthly = pl_values[..., :-1]
+        shape = monthly.shape[:-2] + (monthly.shape[-1],)
+        
+        def row(item):
+            return monthly[..., self.item_index[item], :]
+        
+        receivables_open, receivables = self._trailing_balance(row("売上高"), receivable_months, opening_receivables)
+        payables_open, payables = self._trailing_balance(row("売上原価"), payable_months, opening_payables)
+        receivables_change = np.diff(np.concatenate([receivables_open[..., None], receivables], axis=-1), axis=-1)
+        payables_change = np.diff(np.concatenate([payables_open[..., None], payables], axis=-1), axis=-1)
+        
+        pretax_income = row("税引前当期純損益金額")
+        depreciation = row("減価償却費")
+        taxes = row("法人税、住民税及び事業税")
+        operating = pretax_income + depreciation - receivables_change + payables_change - taxes
+        
+        capex = np.broadcast_to(np.asarray(capex, dtype=float), shape)
+        borrowing = np.broadcast_to(np.asarray(borrowing, dtype=float), shape)
+        repayment = np.broadcast_to(np.asarray(repayment, dtype=float), shape)
+        investing = -capex
+        financing = borrowing - repayment
+        net_change = operating + investing + financing
+        
+        flows = np.stack([
+            pretax_income, depreciation, -receivables_change, payables_change, -taxes,
+            operating, -capex, investing, borrowing, -repayment, financing, net_change
+        ], axis=-2) + 0.0  # 符号反転で生じる -0.0 を 0.0 にそろえる
+        result = np.concatenate([flows, flows.sum(axis=-1, keepdims=True)], axis=-1)
+        
+        closing_cash = np.asarray(opening_cash, dtype=float)[..., None] + np.cumsum(net_change, axis=-1)
+        closing_cash = np.concatenate([closing_cash, closing_cash[..., -1:]], axis=-1)
+        return np.concatenate([result, closing_cash[..., None, :]], axis=-2)
+
     def calculate_cf_data(self, fiscal_period_id):
-        """キャッシュフロー計算書データを計算"""
+        """キャッシュフロー計算書データを計算（現実シナリオの予測）"""
         try:
-            # PLデータから簡易的にCFを計算
-            actuals = self.load_actual_data(fiscal_period_id)
-            forecasts = self.load_forecast_data(fiscal_period_id, "現実")
-            
-            # 営業CFの計算（簡易版）
-            operating_cf = {}
-            
-            # 売上高から売掛金増減を考慮（簡易的に90%を現金化と仮定）
-            if not forecasts.empty:
-                sales_row = forecasts[forecasts['項目名'] == '売上高']
-                if not sales_row.empty:
-                    months = [col for col in sales_row.columns if col not in ['項目名']]
-                    for month in months:
-                        sales = sales_row[month].iloc[0] if month in sales_row.columns else 0
-                        operating_cf[month] = sales * 0.9  # 簡易的に90%を現金化
-            
-            # 投資CF（簡易版）
-            investing_cf = {}
-            for month in operating_cf.keys():
-                investing_cf[month] = -5000000  # 月次固定の設備投資
-            
-            # 財務CF（簡易版）
-            financing_cf = {}
-            for month in operating_cf.keys():
-                financing_cf[month] = -2000000  # 月次借入金返済
-            
+            cash_flow = self.calculate_cash_flow(fiscal_period_id, split_idx=0)
             return {
-                '営業CF': operating_cf,
-                '投資CF': investing_cf,
-                '財務CF': financing_cf
+                '営業CF': cash_flow["営業活動によるキャッシュフロー"],
+                '投資CF': cash_flow["投資活動によるキャッシュフロー"],
+                '財務CF': cash_flow["財務活動によるキャッシュフロー"]
             }
         except Exception as e:
             sys.stderr.write(f"❌ CF計算エラー: {e}\n")
             return {}
     
+    def calculate_indicator_matrix(self, pl_values):
+        """PL配列から売上高比率の経営指標を月次・累計・通期で一括計算
+        
+        pl_values: (..., 項目, 月+1) のPL配列（最終列が合計）
+        戻り値: {'monthly': (..., 指標, 月+1) 配列（最終列が通期）, 'ytd': (..., 指標, 月) 配列}
+                指標の並びはPROFIT_INDICATORS順。売上高が0の月は0
+        """
+        pl_values = np.asarray(pl_values, dtype=float)
+        rows = [self.item_index[item] for item in PROFIT_INDICATORS.values()]
+        sales_row = self.item_index["売上高"]
+        
+        def ratios(values):
+            sales = values[..., sales_row:sales_row + 1, :]
+            return np.divide(
+                values[..., rows, :] * 100, sales,
+                out=np.zeros(values.shape[:-2] + (len(rows), values.shape[-1])),
+                where=sales != 0
+            )
+        
+        return {
+            'monthly': ratios(pl_values),
+            'ytd': ratios(np.cumsum(pl_values[..., :-1], axis=-1))
+        }
+
+    def calculate_indicators(self, period_ids, scenario="現実", split_indices=None):
+        """複数の会計期の経営指標を一括計算（データバージョンごとにキャッシュ）
+        
+        split_indices: 期ごとの実績/予測の境界。省略時は実績のみで計算
+        戻り値: {'months': 期ごとの月リスト, 'names': 指標名リスト, 'pl': (期, 項目, 月+1) のPL配列,
+                 'monthly': (期, 指標, 月+1) 配列, 'ytd': (期, 指標, 月) 配列}
+        """
+        def compute():
+            periods = self.calculate_periods_pl(period_ids, scenario, split_indices)
+            return {**periods, 'names': list(PROFIT_INDICATORS), **self.calculate_indicator_matrix(periods['pl'])}
+        
+        return self._cached_result(('indicators', self._period_key(period_ids, split_indices), scenario), compute)
+
     def calculate_financial_ratios(self, fiscal_period_id):
-        """経営指標を計算"""
+        """経営指標を計算（通期の実績）"""
         try:
-            # PLデータを取得
-            actuals = self.load_actual_data(fiscal_period_id)
-            
-            if actuals.empty:
+            result = self.calculate_indicators([fiscal_period_id])
+            if not result['months'][0]:
                 return {}
             
-            months = [col for col in actuals.columns if col not in ['項目名']]
-            
-            # 売上高
-            sales = 0
-            sales_row = actuals[actuals['項目名'] == '売上高']
-            if not sales_row.empty:
-                for month in months:
-                    if month in sales_row.columns:
-                        val = sales_row[month].iloc[0]
-                        if pd.notna(val):
-                            sales += float(val)
-            
-            # 売上原価
-            cogs = 0
-            cogs_row = actuals[actuals['項目名'] == '売上原価']
-            if not cogs_row.empty:
-                for month in months:
-                    if month in cogs_row.columns:
-                        val = cogs_row[month].iloc[0]
-                        if pd.notna(val):
-                            cogs += float(val)
-            
-            # 営業利益
-            operating_profit = 0
-            op_row = actuals[actuals['項目名'] == '営業損益金額']
-            if not op_row.empty:
-                for month in months:
-                    if month in op_row.columns:
-                        val = op_row[month].iloc[0]
-                        if pd.notna(val):
-                            operating_profit += float(val)
-            
-            # 当期純利益
-            net_profit = 0
-            net_row = actuals[actuals['項目名'] == '当期純損益金額']
-            if not net_row.empty:
-                for month in months:
-                    if month in net_row.columns:
-                        val = net_row[month].iloc[0]
-                        if pd.notna(val):
-                            net_profit += float(val)
+            totals = result['pl'][0, :, -1]
+            margins = dict(zip(result['names'], result['monthly'][0, :, -1]))
+            sales = float(totals[self.item_index["売上高"]])
+            net_profit = float(totals[self.item_index["当期純損益金額"]])
             
-            # BSデータ（簡易版）
-            total_assets = 190000000  # ダミー
-            total_equity = 85000000   # ダミー
-            current_assets = 100000000  # ダミー
-            current_liabilities = 55000000  # ダミー
+            # BS指標（期首残高からの繰り越し、期末の値）
+            balance_ratios = dict(zip(BALANCE_RATIOS, self.calculate_balance_sheets([fiscal_period_id])['ratios'][0, :, -1]))
             
             # 経営指標を計算
             ratios = {
                 '売上高': sales,
-                '売上総利益': sales - cogs,
-                '営業利益': operating_profit,
+                '売上総利益': float(totals[self.item_index["売上総損益金額"]]),
+                '営業利益': float(totals[self.item_index["営業損益金額"]]),
                 '当期純利益': net_profit,
-                '売上総利益率': ((sales - cogs) / sales * 100) if sales > 0 else 0,
-                '営業利益率': (operating_profit / sales * 100) if sales > 0 else 0,
-                '当期純利益率': (net_profit / sales * 100) if sales > 0 else 0,
-                'ROA': (net_profit / total_assets * 100) if total_assets > 0 else 0,
-                'ROE': (net_profit / total_equity * 100) if total_equity > 0 else 0,
-                '流動比率': (current_assets / current_liabilities * 100) if current_liabilities > 0 else 0,
-                '自己資本比率': (total_equity / total_assets * 100) if total_assets > 0 else 0,
+                '売上総利益率': float(margins['粗利率']),
+                '営業利益率': float(margins['営業利益率']),
+                '当期純利益率': float(margins['当期純利益率']),
+                'ROA': float(balance_ratios['ROA']),
+                'ROE': float(balance_ratios['ROE']),
+                '流動比率': float(balance_ratios['流動比率']),
+                '自己資本比率': float(balance_ratios['自己資本比率']),
             }
             
             return ratios
@@ -1598,154 +3321,103 @@ class DataProcessor:
             sys.stderr.write(f"❌ 経営指標計算エラー: {e}\n")
             return {}
     
-    def calculate_breakeven_analysis(self, fiscal_period_id):
-        """損益分岐点分析"""
+    def _breakeven_metrics(self, sales, variable_costs, fixed_costs):
+        """売上高・変動費・固定費の配列から損益分岐点の指標を要素ごとに計算
+        
+        売上高が0以下の要素の比率、限界利益率が0以下の要素の損益分岐点売上高は0とする。
+        """
+        contribution = sales - variable_costs
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(sales > 0, contribution / sales, 0.0)
+            breakeven_sales = np.where(ratio > 0, fixed_costs / ratio, 0.0)
+            safety_margin_ratio = np.where(sales > 0, (sales - breakeven_sales) / sales * 100, 0.0)
+            breakeven_ratio = np.where(sales > 0, breakeven_sales / sales * 100, 0.0)
+        
+        return {
+            '売上高': sales,
+            '変動費': variable_costs,
+            '固定費': fixed_costs,
+            '限界利益': contribution,
+            '限界利益率': ratio * 100,
+            '損益分岐点売上高': breakeven_sales,
+            '安全余裕率': safety_margin_ratio,
+            '損益分岐点比率': breakeven_ratio
+        }
+
+    def calculate_breakeven_matrix(self, pl_values):
+        """PL配列から月次と累計の損益分岐点を一括計算（変動費=売上原価、固定費=販管費）
+        
+        pl_values: (..., 項目, 月+1) のPL配列（最終列が合計）
+        戻り値: {'monthly': 指標→(..., 月+1) 配列, 'cumulative': 指標→(..., 月) 配列}
+        """
+        pl_values = np.asarray(pl_values, dtype=float)
+        components = [
+            pl_values[..., self.item_index[item], :]
+            for item in ("売上高", "売上原価", GA_TOTAL_ITEM)
+        ]
+        return {
+            'monthly': self._breakeven_metrics(*components),
+            'cumulative': self._breakeven_metrics(*(np.cumsum(c[..., :-1], axis=-1) for c in components))
+        }
+
+    def calculate_breakeven(self, period_ids, scenario="現実", split_indices=0):
+        """複数の会計期の損益分岐点を一括計算（データバージョンごとにキャッシュ）
+        
+        split_indices: 期ごとの実績/予測の境界（0なら全月を予測で計算）
+        戻り値: {'months': 期ごとの月リスト, 'pl': (期, 項目, 月+1) のPL配列,
+                 'monthly': 指標→(期, 月+1) 配列, 'cumulative': 指標→(期, 月) 配列}
+        """
+        def compute():
+            periods = self.calculate_periods_pl(period_ids, scenario, split_indices)
+            return {**periods, **self.calculate_breakeven_matrix(periods['pl'])}
+        
+        return self._cached_result(('breakeven', self._period_key(period_ids, split_indices), scenario), compute)
+
+    def calculate_breakeven_analysis(self, fiscal_period_id, scenario="現実", split_idx=0):
+        """損益分岐点分析（通期）"""
         try:
-            forecasts = self.load_forecast_data(fiscal_period_id, "現実")
-            
-            if forecasts.empty:
-                return {}
-            
-            months = [col for col in forecasts.columns if col not in ['項目名']]
-            
-            # 売上高
-            sales = 0
-            sales_row = forecasts[forecasts['項目名'] == '売上高']
-            if not sales_row.empty:
-                for month in months:
-                    if month in sales_row.columns:
-                        val = sales_row[month].iloc[0]
-                        if pd.notna(val):
-                            sales += float(val)
-            
-            # 変動費（売上原価と仮定）
-            variable_costs = 0
-            vc_row = forecasts[forecasts['項目名'] == '売上原価']
-            if not vc_row.empty:
-                for month in months:
-                    if month in vc_row.columns:
-                        val = vc_row[month].iloc[0]
-                        if pd.notna(val):
-                            variable_costs += float(val)
-            
-            # 固定費（販管費の合計と仮定）
-            fixed_costs = 0
-            for item in self.ga_items:
-                item_row = forecasts[forecasts['項目名'] == item]
-                if not item_row.empty:
-                    for month in months:
-                        if month in item_row.columns:
-                            val = item_row[month].iloc[0]
-                            if pd.notna(val):
-                                fixed_costs += float(val)
-            
-            # 限界利益率
-            contribution_margin_ratio = ((sales - variable_costs) / sales) if sales > 0 else 0
-            
-            # 損益分岐点売上高
-            breakeven_sales = (fixed_costs / contribution_margin_ratio) if contribution_margin_ratio > 0 else 0
-            
-            # 安全余裕率
-            safety_margin_ratio = ((sales - breakeven_sales) / sales * 100) if sales > 0 else 0
-            
-            return {
-                '売上高': sales,
-                '変動費': variable_costs,
-                '固定費': fixed_costs,
-                '限界利益': sales - variable_costs,
-                '限界利益率': contribution_margin_ratio * 100,
-                '損益分岐点売上高': breakeven_sales,
-                '安全余裕率': safety_margin_ratio,
-                '損益分岐点比率': (breakeven_sales / sales * 100) if sales > 0 else 0
-            }
+            monthly = self.calculate_breakeven([fiscal_period_id], scenario, split_idx)['monthly']
+            return {name: float(values[0, -1]) for name, values in monthly.items()}
         except Exception as e:
             sys.stderr.write(f"❌ 損益分岐点分析エラー: {e}\n")
             return {}
 
     def calculate_balance_sheet(self, fiscal_period_id):
-        """貸借対照表を計算"""
-        # 簡易BS（将来的に拡張可能）
-        bs_items = {
-            "資産の部": {
-                "流動資産": ["現金及び預金", "売掛金", "棚卸資産", "その他流動資産"],
-                "固定資産": ["有形固定資産", "無形固定資産", "投資その他の資産"]
-            },
-            "負債の部": {
-                "流動負債": ["買掛金", "短期借入金", "未払金", "その他流動負債"],
-                "固定負債": ["長期借入金", "その他固定負債"]
-            },
-            "純資産の部": {
-                "株主資本": ["資本金", "利益剰余金"]
-            }
+        """貸借対照表を計算（部 → 区分 → 科目 → 期末残高）"""
+        bs_data = self.calculate_bs_data(fiscal_period_id)
+        if not bs_data:
+            return {}
+        return {
+            section: {category: bs_data[category] for category in categories}
+            for section, categories in BALANCE_SHEET_STRUCTURE.items()
         }
-        return bs_items
     
-    def calculate_cash_flow(self, fiscal_period_id):
-        """キャッシュフロー計算書を計算（間接法）"""
-        # 実績データを取得
-        actuals = self.load_actual_data(fiscal_period_id)
-        
-        # 営業CF、投資CF、財務CFの計算
-        cf_data = {
-            "営業活動によるキャッシュフロー": {},
-            "投資活動によるキャッシュフロー": {},
-            "財務活動によるキャッシュフロー": {}
+    def calculate_cash_flow(self, fiscal_period_id, scenario="現実", split_idx=None, **assumptions):
+        """キャッシュフロー計算書を計算（間接法、行 → 月 → 金額）
+        
+        split_idx省略時は実績のみ、指定時はその月までを実績・以降を予測として計算する。
+        期首の現金・売掛金・買掛金は保存済みの期首残高を使う（貸借対照表と同じ繰り越し計算）。
+        assumptions: calculate_cash_flow_matrixの前提（回収・支払サイト、設備投資、借入・返済など）
+        """
+        result = self.calculate_balance_sheets([fiscal_period_id], scenario, split_idx, **assumptions)
+        months = result['months'][0]
+        values = result['cash_flow'][0]
+        
+        return {
+            item: dict(zip(months, values[r, :len(months)].tolist()))
+            for r, item in enumerate(CASH_FLOW_ITEMS)
         }
-        
-        # 営業CFの計算（簡易版：税引前利益をベース）
-        net_income_row = actuals[actuals['項目名'] == '税引前当期純損益金額']
-        if not net_income_row.empty:
-            months = [col for col in actuals.columns if col not in ['項目名']]
-            for month in months:
-                if month in net_income_row.columns:
-                    cf_data["営業活動によるキャッシュフロー"][month] = net_income_row[month].iloc[0]
-        
-        return cf_data
     
-    def calculate_financial_indicators(self, fiscal_period_id):
-        """経営指標を計算"""
-        actuals = self.load_actual_data(fiscal_period_id)
-        months = [col for col in actuals.columns if col not in ['項目名']]
-        
-        # 必要な項目を取得
-        sales = actuals[actuals['項目名'] == '売上高']
-        cogs = actuals[actuals['項目名'] == '売上原価']
-        operating_profit = actuals[actuals['項目名'] == '営業損益金額']
-        ordinary_profit = actuals[actuals['項目名'] == '経常損益金額']
-        net_profit = actuals[actuals['項目名'] == '当期純損益金額']
-        
-        indicators = {}
-        
-        for month in months:
-            month_indicators = {}
-            
-            # 売上高
-            sales_val = float(sales[month].iloc[0]) if not sales.empty and month in sales.columns else 0
-            
-            # 売上原価
-            cogs_val = float(cogs[month].iloc[0]) if not cogs.empty and month in cogs.columns else 0
-            
-            # 営業利益
-            op_val = float(operating_profit[month].iloc[0]) if not operating_profit.empty and month in operating_profit.columns else 0
-            
-            # 経常利益
-            ord_val = float(ordinary_profit[month].iloc[0]) if not ordinary_profit.empty and month in ordinary_profit.columns else 0
-            
-            # 当期純利益
-            net_val = float(net_profit[month].iloc[0]) if not net_profit.empty and month in net_profit.columns else 0
-            
-            # 粗利率
-            month_indicators['粗利率'] = ((sales_val - cogs_val) / sales_val * 100) if sales_val != 0 else 0
-            
-            # 営業利益率
-            month_indicators['営業利益率'] = (op_val / sales_val * 100) if sales_val != 0 else 0
-            
-            # 経常利益率
-            month_indicators['経常利益率'] = (ord_val / sales_val * 100) if sales_val != 0 else 0
-            
-            # 当期純利益率
-            month_indicators['当期純利益率'] = (net_val / sales_val * 100) if sales_val != 0 else 0
-            
-            indicators[month] = month_indicators
-        
-        return indicators
+    def calculate_financial_indicators(self, fiscal_period_id, scenario="現実", split_idx=None):
+        """経営指標を計算（月 → 指標名 → 値）
+        
+        split_idx省略時は実績のみ、指定時はその月までを実績・以降を予測として計算する。
+        """
+        result = self.calculate_indicators([fiscal_period_id], scenario, split_idx)
+        months = result['months'][0]
+        monthly = result['monthly'][0]
+        
+        return {
+            month: {name: float(monthly[k, j]) for k, name in enumerate(result['names'])}
+            for j, month in enumerate(months)
+        }
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from data_processor import DataProcessor
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    # database設定のないsecrets.tomlを置いてSQLiteで起動する
+    (tmp_path / ".streamlit").mkdir()
+    (tmp_path / ".streamlit" / "secrets.toml").write_text('mode = "test"\n')
+    monkeypatch.chdir(tmp_path)
+    return DataProcessor(db_path=str(tmp_path / "test.db"))
+
+
+@pytest.fixture
+def add_period(processor):
+    """会社（なければ作成）に会計期を追加し、(会社ID, 期ID) を返す"""
+    def add(start_date="2024-04-01", end_date="2025-03-31", company="テスト株式会社", period_num=1):
+        companies = processor.get_companies()
+        if company not in set(companies['name']):
+            assert processor.add_company(company)
+            companies = processor.get_companies()
+        comp_id = int(companies.loc[companies['name'] == company, 'id'].iloc[0])
+        assert processor.add_fiscal_period(comp_id, period_num, start_date, end_date)
+        periods = processor.get_company_periods(comp_id)
+        return comp_id, int(periods.loc[periods['start_date'] == start_date, 'id'].iloc[0])
+    return add
+
+
+@pytest.fixture
+def pl_inputs(processor):
+    """入力項目に乱数を入れた実績・予測の 項目×月 行列（計算項目は0）"""
+    rng = np.random.default_rng(0)
+    shape = (len(processor.all_items), 12)
+    editable = np.array([item not in processor.calculated_items for item in processor.all_items])
+    actual = rng.integers(0, 1000, shape).astype(float) * 1000 * editable[:, None]
+    forecast = rng.integers(0, 1000, shape).astype(float) * 1000 * editable[:, None]
+    return actual, forecast
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def periods(processor, add_period):
+    """前期（売上高に季節性のある実績）と当期"""
+    _, prior_id = add_period("2023-04-01", "2024-03-31", period_num=1)
+    _, period_id = add_period("2024-04-01", "2025-03-31", period_num=2)
+    prior_months = processor.get_fiscal_months(prior_id)
+    processor.save_actual_item(prior_id, "売上高", {m: 100.0 * (j + 1) for j, m in enumerate(prior_months)})
+    processor.save_actual_item(prior_id, "給料手当", {m: (-50.0 if j == 0 else 100.0) for j, m in enumerate(prior_months)})
+    return prior_id, period_id
+
+
+def test_budget_follows_prior_seasonality_and_sums_exactly(processor, periods):
+    _, period_id = periods
+    budget, months, saved = processor.distribute_annual_budget(period_id, {"売上高": 1000001})
+
+    row = budget[processor.item_index["売上高"]]
+    assert saved is None and len(months) == 12
+    assert row.sum() == 1000001
+    np.testing.assert_array_equal(row, np.round(row))
+    # 前期の構成比 (j+1)/78 に沿って増えていく（最終月は端数調整）
+    np.testing.assert_allclose(row[:-1], np.round(1000001 * np.arange(1, 12) / 78))
+
+
+def test_budget_falls_back_to_even_split(processor, periods):
+    _, period_id = periods
+    budget, _, _ = processor.distribute_annual_budget(period_id, {"給料手当": 1200, "地代家賃": 100})
+
+    # 符号が混在する項目・前期実績のない項目は均等割り（端数は最終月）
+    np.testing.assert_array_equal(budget[processor.item_index["給料手当"]], np.full(12, 100.0))
+    rent = budget[processor.item_index["地代家賃"]]
+    np.testing.assert_array_equal(rent[:-1], np.full(11, 8.0))
+    assert rent.sum() == 100
+
+
+def test_budget_leaves_other_items_untouched_and_saves(processor, periods):
+    _, period_id = periods
+    processor.save_forecast_item(period_id, "現実", "広告宣伝費", {"2024-04": 555})
+
+    budget, months, (success, msg) = processor.distribute_annual_budget(period_id, {"売上高": 1200}, save=True)
+
+    assert success, msg
+    assert np.isnan(budget[processor.item_index["広告宣伝費"]]).all()
+    saved, _ = processor.load_forecast_matrix(period_id, "現実")
+    assert saved[processor.item_index["広告宣伝費"], 0] == 555
+    assert saved[processor.item_index["売上高"]].sum() == 1200
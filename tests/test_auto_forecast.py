@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from data_processor import _fit_forecast
+
+
+def test_seasonal_naive_aligns_with_calendar_month():
+    # 値 = 暦月（0〜11）の系列を14か月分。次の月は暦月2から始まる
+    history = (np.arange(14) % 12).astype(float)[None, :]
+    forecast = _fit_forecast(history, 14, method="seasonal_naive")
+    np.testing.assert_array_equal(forecast[0], (np.arange(14, 28) % 12).astype(float))
+
+
+def test_holt_winters_falls_back_to_run_rate_on_short_history():
+    history = np.array([[1.0, 2.0, 3.0, 4.0, 5.0]])
+    np.testing.assert_allclose(_fit_forecast(history, 3, window=3), [[4.0, 4.0, 4.0]])
+
+
+@pytest.fixture
+def companies_with_history(processor, add_period):
+    """期数・実績月数の異なる会社の最新期ID（A社とD社は同じ形の履歴で、まとめて予測される）"""
+    rng = np.random.default_rng(1)
+    latest = {}
+    for company, n_periods, n_observed in [("A社", 3, 5), ("B社", 2, 5), ("C社", 1, 8), ("D社", 3, 5)]:
+        for k in range(n_periods):
+            year = 2022 + k
+            _, period_id = add_period(f"{year}-04-01", f"{year + 1}-03-31", company, k + 1)
+            months = processor.get_fiscal_months(period_id)
+            observed = months if k < n_periods - 1 else months[:n_observed]
+            for item in ["売上高", "売上原価", "給料手当"]:
+                processor.save_actual_item(
+                    period_id, item, {m: float(rng.integers(1, 1000)) * 1000 for m in observed}
+                )
+        latest[company] = period_id
+    return latest
+
+
+@pytest.mark.parametrize("method", ["holt_winters", "seasonal_naive", "run_rate"])
+def test_auto_forecast_companies_matches_per_company(processor, companies_with_history, method):
+    expected = {
+        period_id: processor.auto_forecast(period_id, method)
+        for period_id in companies_with_history.values()
+    }
+
+    success, msg = processor.auto_forecast_companies(method=method)
+
+    assert success, msg
+    for period_id, (forecast, months, n_observed, _) in expected.items():
+        saved, _ = processor.load_forecast_matrix(period_id, "現実")
+        written = ~np.isnan(forecast)
+        assert written[:, n_observed:].any() and not written[:, :n_observed].any()
+        np.testing.assert_allclose(saved[written], forecast[written])
+        # 実績のない項目は保存しない
+        assert (saved[~written] == 0).all()
+
+
+def test_auto_forecast_companies_limits_to_given_companies(processor, companies_with_history):
+    comp_ids = processor.get_companies().set_index('name')['id']
+
+    processor.auto_forecast_companies(comp_ids=[int(comp_ids["B社"])], method="run_rate")
+
+    assert processor.load_forecast_matrix(companies_with_history["B社"], "現実")[0].any()
+    assert not processor.load_forecast_matrix(companies_with_history["A社"], "現実")[0].any()
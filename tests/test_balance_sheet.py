@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from data_processor import BALANCE_SHEET_ITEMS, BALANCE_SHEET_STRUCTURE, CASH_FLOW_ITEMS
+
+OPENING = {"現金及び預金": 5e7, "売掛金": 2e7, "有形固定資産": 3e7,
+           "買掛金": 1e7, "長期借入金": 2e7, "資本金": 5e7, "利益剰余金": 2e7}
+ASSUMPTIONS = dict(receivable_months=1.5, payable_months=0.5, capex=100000, borrowing=200000, repayment=50000)
+
+
+def section_total(balances, section):
+    items = [item for category in BALANCE_SHEET_STRUCTURE[section].values() for item in category]
+    return balances[..., [BALANCE_SHEET_ITEMS.index(item) for item in items], :].sum(axis=-2)
+
+
+def test_balance_sheet_balances(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    pl = processor.calculate_pl_matrix(actual, forecast, 4)
+
+    # 資産合計 = 負債合計 + 純資産合計 となる期首残高
+    opening = np.zeros(len(BALANCE_SHEET_ITEMS))
+    for item, amount in OPENING.items():
+        opening[BALANCE_SHEET_ITEMS.index(item)] = amount
+
+    balances, _ = processor.calculate_balance_sheet_matrix(pl, opening, **ASSUMPTIONS)
+
+    np.testing.assert_allclose(
+        section_total(balances, "資産の部"),
+        section_total(balances, "負債の部") + section_total(balances, "純資産の部"),
+        atol=1e-4
+    )
+
+
+@pytest.fixture
+def period_with_openings(processor, add_period):
+    _, period_id = add_period()
+    months = processor.get_fiscal_months(period_id)
+    processor.save_actual_item(period_id, "売上高", {m: 1000000 for m in months[:3]})
+    processor.save_actual_item(period_id, "売上原価", {m: 400000 for m in months[:3]})
+    processor.save_forecast_item(period_id, "現実", "売上高", {m: 1200000 for m in months})
+    processor.save_forecast_item(period_id, "現実", "給料手当", {m: 300000 for m in months})
+    assert processor.save_opening_balances(period_id, OPENING)[0]
+    return period_id, months
+
+
+def test_stored_openings_roll_forward_and_balance(processor, period_with_openings):
+    period_id, _ = period_with_openings
+    result = processor.calculate_balance_sheets([period_id], "現実", 3, **ASSUMPTIONS)
+
+    cash = BALANCE_SHEET_ITEMS.index("現金及び預金")
+    assert result['opening'][0, cash] == OPENING["現金及び預金"]
+    np.testing.assert_allclose(
+        result['balances'][0, cash],
+        result['cash_flow'][0, CASH_FLOW_ITEMS.index("現金及び現金同等物の期末残高"), :-1]
+    )
+    np.testing.assert_allclose(
+        section_total(result['balances'][0], "資産の部"),
+        section_total(result['balances'][0], "負債の部") + section_total(result['balances'][0], "純資産の部"),
+        atol=1e-4
+    )
+
+
+def test_cash_flow_apis_use_stored_openings(processor, period_with_openings):
+    period_id, months = period_with_openings
+    balances = processor.calculate_balance_sheets([period_id], "現実", 3, **ASSUMPTIONS)['balances'][0]
+    closing_cash = balances[BALANCE_SHEET_ITEMS.index("現金及び預金")]
+
+    cash_flow = processor.calculate_cash_flow(period_id, "現実", 3, **ASSUMPTIONS)
+    np.testing.assert_allclose(
+        [cash_flow["現金及び現金同等物の期末残高"][m] for m in months], closing_cash
+    )
+
+    # 売掛金・買掛金も期首残高から繰り越すので、初月の増減は期首残高との差になる
+    receivables = balances[BALANCE_SHEET_ITEMS.index("売掛金")]
+    assert cash_flow["売上債権の増減額"][months[0]] == pytest.approx(OPENING["売掛金"] - receivables[0])
+
+    legacy = processor.calculate_cf_data(period_id)
+    reference = processor.calculate_cash_flow(period_id, split_idx=0)
+    assert legacy['営業CF'] == reference["営業活動によるキャッシュフロー"]
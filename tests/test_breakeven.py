@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import data_processor
+
+
+def pl_with(processor, sales, cost, fixed):
+    """売上高・売上原価・販管費だけを入れた (項目, 月+1) のPL配列"""
+    forecast = np.zeros((len(processor.all_items), len(sales)))
+    forecast[processor.item_index["売上高"]] = sales
+    forecast[processor.item_index["売上原価"]] = cost
+    forecast[processor.item_index["給料手当"]] = fixed
+    return processor.calculate_pl_matrix(np.zeros_like(forecast), forecast, 0)
+
+
+def test_breakeven_metrics(processor):
+    pl = pl_with(processor, [1000.0, 2000.0, 0.0], [600.0, 1200.0, 100.0], [300.0, 300.0, 300.0])
+    result = processor.calculate_breakeven_matrix(pl)
+    monthly, cumulative = result['monthly'], result['cumulative']
+
+    # 限界利益率40% → 損益分岐点売上高 = 固定費 / 0.4
+    np.testing.assert_allclose(monthly['限界利益率'][:2], 40.0)
+    np.testing.assert_allclose(monthly['損益分岐点売上高'][:2], 750.0)
+    np.testing.assert_allclose(monthly['安全余裕率'][:2], [25.0, 62.5])
+    np.testing.assert_allclose(monthly['損益分岐点比率'][:2], [75.0, 37.5])
+    # 売上高0の月は比率を0とする
+    assert monthly['限界利益率'][2] == 0 and monthly['損益分岐点売上高'][2] == 0
+
+    # 通期は合計列、累計は月ごとの累計値から計算する
+    assert monthly['損益分岐点売上高'][-1] == pytest.approx(900.0 / ((3000.0 - 1900.0) / 3000.0))
+    np.testing.assert_allclose(cumulative['固定費'], [300.0, 600.0, 900.0])
+    assert cumulative['損益分岐点売上高'][1] == pytest.approx(1500.0)
+
+
+@pytest.fixture
+def period(processor, add_period):
+    _, period_id = add_period()
+    months = processor.get_fiscal_months(period_id)
+    processor.save_forecast_item(period_id, "現実", "売上高", {m: 1000 for m in months})
+    processor.save_forecast_item(period_id, "現実", "売上原価", {m: 400 for m in months})
+    processor.save_sub_account(period_id, "現実", "給料手当", "本社", {m: 300 for m in months})
+    return period_id
+
+
+def test_breakeven_is_cached_until_data_changes(processor, period):
+    first = processor.calculate_breakeven([period])
+    assert processor.calculate_breakeven([period]) is first
+    assert not first['pl'].flags.writeable
+    assert processor.calculate_breakeven_analysis(period)['固定費'] == 12 * 300
+
+    # 補助科目の削除でもキャッシュが破棄される
+    assert processor.delete_sub_account(period, "現実", "給料手当", "本社")[0]
+    second = processor.calculate_breakeven([period])
+    assert second is not first
+    np.testing.assert_allclose(second['monthly']['固定費'], 0.0)
+
+
+def test_result_cache_is_bounded(processor, monkeypatch):
+    monkeypatch.setattr(data_processor, "RESULT_CACHE_SIZE", 3)
+    for n in range(5):
+        processor._cached_result(('n', n), lambda: n)
+    assert [key[-1] for key in processor._result_cache] == [2, 3, 4]
+
+    # 参照された結果は新しい側へ移り、次に追い出されるのは最も古く使われた結果
+    processor._cached_result(('n', 2), lambda: None)
+    processor._cached_result(('n', 5), lambda: 5)
+    assert [key[-1] for key in processor._result_cache] == [4, 2, 5]
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from data_processor import CASH_FLOW_ITEMS, DataProcessor
+
+
+def cf_row(cash_flow, item):
+    return cash_flow[..., CASH_FLOW_ITEMS.index(item), :]
+
+
+def test_trailing_balance_half_month():
+    opening, balances = DataProcessor._trailing_balance(np.array([10.0, 20.0, 30.0, 40.0]), 0.5)
+    assert opening == pytest.approx(5.0)
+    np.testing.assert_allclose(balances, [5.0, 10.0, 15.0, 20.0])
+
+
+def test_trailing_balance_month_and_a_half():
+    opening, balances = DataProcessor._trailing_balance(np.array([10.0, 20.0, 30.0, 40.0]), 1.5)
+    assert opening == pytest.approx(15.0)
+    np.testing.assert_allclose(balances, [15.0, 25.0, 40.0, 55.0])
+
+
+@pytest.fixture
+def pl(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    return processor.calculate_pl_matrix(actual, forecast, 4)
+
+
+def test_sections_sum_to_net_change_and_closing_cash(processor, pl):
+    cash_flow = processor.calculate_cash_flow_matrix(
+        pl, receivable_months=1.5, payable_months=0.5,
+        capex=100000, borrowing=200000, repayment=50000, opening_cash=1e6
+    )
+
+    operating = cf_row(cash_flow, "営業活動によるキャッシュフロー")
+    investing = cf_row(cash_flow, "投資活動によるキャッシュフロー")
+    financing = cf_row(cash_flow, "財務活動によるキャッシュフロー")
+    np.testing.assert_allclose(
+        operating,
+        cash_flow[CASH_FLOW_ITEMS.index("税引前当期純損益金額"):CASH_FLOW_ITEMS.index("法人税等の支払額") + 1].sum(axis=0)
+    )
+    np.testing.assert_allclose(investing[:-1], -100000)
+    np.testing.assert_allclose(financing[:-1], 150000)
+
+    net_change = cf_row(cash_flow, "現金及び現金同等物の増減額")
+    np.testing.assert_allclose(net_change, operating + investing + financing)
+    np.testing.assert_allclose(net_change[-1], net_change[:-1].sum())
+
+    closing = cf_row(cash_flow, "現金及び現金同等物の期末残高")
+    np.testing.assert_allclose(closing[:-1], 1e6 + np.cumsum(net_change[:-1]))
+    assert closing[-1] == closing[-2]
+
+
+def test_working_capital_changes_follow_trailing_balances(processor, pl):
+    sales = pl[processor.item_index["売上高"], :-1]
+    cost = pl[processor.item_index["売上原価"], :-1]
+    cash_flow = processor.calculate_cash_flow_matrix(
+        pl, receivable_months=1.5, payable_months=0.5, opening_receivables=0.0, opening_payables=0.0
+    )
+
+    _, receivables = DataProcessor._trailing_balance(sales, 1.5, 0.0)
+    _, payables = DataProcessor._trailing_balance(cost, 0.5, 0.0)
+    np.testing.assert_allclose(cf_row(cash_flow, "売上債権の増減額")[:-1], -np.diff(receivables, prepend=0.0))
+    np.testing.assert_allclose(cf_row(cash_flow, "仕入債務の増減額")[:-1], np.diff(payables, prepend=0.0))
+
+
+def test_batch_axes_match_single_period(processor, pl):
+    stacked = np.stack([pl, pl * 2])
+    cash_flow = processor.calculate_cash_flow_matrix(stacked, capex=np.array([[0.0] * 12, [50.0] * 12]))
+
+    np.testing.assert_allclose(cash_flow[0], processor.calculate_cash_flow_matrix(pl))
+    np.testing.assert_allclose(cash_flow[1], processor.calculate_cash_flow_matrix(pl * 2, capex=50.0))
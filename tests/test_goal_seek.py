@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def pl(processor):
+    forecast = np.zeros((len(processor.all_items), 12))
+    forecast[processor.item_index["売上高"]] = 1000.0
+    forecast[processor.item_index["売上原価"]] = 600.0
+    forecast[processor.item_index["給料手当"]] = 300.0
+    return processor.calculate_pl_matrix(np.zeros_like(forecast), forecast, 0)
+
+
+def operating_profit(processor, sales, variable_costs, fixed_costs):
+    forecast = np.zeros((len(processor.all_items), 12))
+    forecast[processor.item_index["売上高"]] = sales
+    forecast[processor.item_index["売上原価"]] = variable_costs
+    forecast[processor.item_index["給料手当"]] = fixed_costs
+    return processor.calculate_pl_matrix(np.zeros_like(forecast), forecast, 0)[processor.item_index["営業損益金額"]]
+
+
+def test_required_sales_and_cost_limits_hit_target(processor, pl):
+    goal = processor.goal_seek(pl, 2400.0)
+
+    # 月次目標は通期目標の均等割り
+    np.testing.assert_allclose(goal['目標'], [200.0] * 12 + [2400.0])
+    # 限界利益率40% → 必要売上高 = (固定費 + 目標) / 0.4
+    np.testing.assert_allclose(goal['必要売上高'], [1250.0] * 12 + [15000.0])
+    np.testing.assert_allclose(goal['売上高差額'][:-1], 250.0)
+
+    monthly = slice(None, -1)
+    sales = goal['必要売上高'][monthly]
+    np.testing.assert_allclose(operating_profit(processor, sales, sales * 0.6, 300.0)[monthly], 200.0)
+    np.testing.assert_allclose(operating_profit(processor, 1000.0, 600.0, goal['固定費上限'][monthly])[monthly], 200.0)
+    np.testing.assert_allclose(operating_profit(processor, 1000.0, goal['変動費上限'][monthly], 300.0)[monthly], 200.0)
+
+
+def test_unreachable_months_are_nan(processor, pl):
+    pl = pl.copy()
+    pl[processor.item_index["売上高"], 0] = 0.0
+    pl[processor.item_index["売上原価"], 1] = 1500.0
+    goal = processor.goal_seek(pl, 0.0, monthly_targets=np.zeros(12))
+
+    assert np.isnan(goal['必要売上高'][:2]).all()
+    assert not np.isnan(goal['必要売上高'][2:]).any()
+
+
+def test_leading_axes_and_per_axis_targets(processor, pl):
+    stacked = np.stack([pl, pl])
+    goal = processor.goal_seek(stacked, np.array([0.0, 2400.0]))
+
+    np.testing.assert_allclose(goal['必要売上高'][:, -1], [9000.0, 15000.0])
+    np.testing.assert_allclose(goal['必要売上高'][1], processor.goal_seek(pl, 2400.0)['必要売上高'])
+
+
+@pytest.mark.parametrize("target_item", ["売上総損益金額", "販売管理費計"])
+def test_zero_coefficient_raises(processor, pl, target_item):
+    # 売上総損益は販管費の、販管費計は売上原価の影響を受けない
+    with pytest.raises(ValueError):
+        processor.goal_seek(pl, 1000.0, target_item)
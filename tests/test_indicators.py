@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from data_processor import PROFIT_INDICATORS
+
+
+def test_indicator_ratios(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    forecast[processor.item_index["売上高"], 5] = 0.0
+    pl = processor.calculate_pl_matrix(actual, forecast, 4)
+    result = processor.calculate_indicator_matrix(pl)
+
+    sales = pl[processor.item_index["売上高"]]
+    cumulative = np.cumsum(pl[:, :-1], axis=-1)
+    for k, item in enumerate(PROFIT_INDICATORS.values()):
+        row = pl[processor.item_index[item]]
+        months = sales != 0
+        np.testing.assert_allclose(result['monthly'][k, months], row[months] / sales[months] * 100)
+        np.testing.assert_allclose(
+            result['ytd'][k], cumulative[processor.item_index[item]] / cumulative[processor.item_index["売上高"]] * 100
+        )
+    # 売上高が0の月は0
+    np.testing.assert_array_equal(result['monthly'][:, 5], 0.0)
+
+
+def test_indicator_matrix_keeps_leading_axes(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    pl = processor.calculate_pl_matrix(actual, forecast, 4)
+    stacked = processor.calculate_indicator_matrix(np.stack([pl, pl * 2]))
+
+    assert stacked['monthly'].shape == (2, len(PROFIT_INDICATORS), 13)
+    assert stacked['ytd'].shape == (2, len(PROFIT_INDICATORS), 12)
+    np.testing.assert_allclose(stacked['monthly'][1], stacked['monthly'][0])
+
+
+def test_financial_indicators_use_period_actuals(processor, add_period):
+    _, period_id = add_period()
+    months = processor.get_fiscal_months(period_id)
+    processor.save_actual_item(period_id, "売上高", {m: 1000 for m in months[:3]})
+    processor.save_actual_item(period_id, "売上原価", {m: 250 for m in months[:3]})
+    processor.save_forecast_item(period_id, "現実", "売上高", {m: 2000 for m in months})
+
+    actual_only = processor.calculate_financial_indicators(period_id)
+    assert actual_only[months[0]]["粗利率"] == pytest.approx(75.0)
+    assert actual_only[months[3]]["粗利率"] == 0
+
+    with_forecast = processor.calculate_financial_indicators(period_id, "現実", 3)
+    assert with_forecast[months[3]]["粗利率"] == pytest.approx(100.0)
+    assert processor.calculate_indicators([period_id], "現実", 3)['names'] == list(PROFIT_INDICATORS)
@@ -0,0 +1,54 @@
+import sqlite3
+
+from data_processor import SCHEMA_MIGRATIONS, DataProcessor
+
+LATEST_VERSION = SCHEMA_MIGRATIONS[-1]['version']
+
+
+def applied_versions(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+
+
+def table_names(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_fresh_database_is_migrated_to_latest(processor):
+    assert applied_versions(processor.db_path) == [m['version'] for m in SCHEMA_MIGRATIONS]
+    assert processor._get_schema_version() == LATEST_VERSION
+    assert {"companies", "fiscal_periods", "scenario_settings", "opening_balances"} <= table_names(processor.db_path)
+
+
+def test_reopening_is_idempotent_and_keeps_data(processor, add_period, monkeypatch):
+    comp_id, _ = add_period()
+    processor.save_scenario(comp_id, "楽観", 0.25)
+
+    executed = []
+    monkeypatch.setattr(DataProcessor, "_run_migrations", lambda self, version: executed.append(version))
+    reopened = DataProcessor(db_path=processor.db_path)
+
+    assert executed == []
+    assert applied_versions(processor.db_path) == [m['version'] for m in SCHEMA_MIGRATIONS]
+    assert list(reopened.get_companies()['name']) == ["テスト株式会社"]
+
+
+def test_old_schema_is_upgraded_in_place(tmp_path, processor):
+    # version 1 までしか適用されていないデータベースを用意する
+    db_path = str(tmp_path / "old.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE schema_version (version INTEGER PRIMARY KEY, description TEXT NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+        for statement in SCHEMA_MIGRATIONS[0]['sqlite']:
+            conn.execute(statement)
+        conn.execute("INSERT INTO schema_version (version, description) VALUES (1, 'v1')")
+        conn.execute("INSERT INTO companies (name) VALUES ('既存会社')")
+
+    upgraded = DataProcessor(db_path=db_path)
+
+    assert applied_versions(db_path) == [m['version'] for m in SCHEMA_MIGRATIONS]
+    assert "opening_balances" in table_names(db_path)
+    assert list(upgraded.get_companies()['name']) == ["既存会社"]
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+SHOCKS = {"売上高": {'sigma': 0.1}, "販売管理費計": {'sigma': 0.05, 'distribution': 'lognormal'}}
+
+
+def test_zero_sigma_reproduces_deterministic_landing(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    result = processor.simulate_landing(actual, forecast, 4, {"売上高": {'sigma': 0.0}}, n_paths=100, seed=0)
+    expected = processor.calculate_pl_matrix(actual, forecast, 4)
+
+    summary = result['summary']
+    for target in summary.index:
+        np.testing.assert_allclose(summary.loc[target].to_numpy(), expected[processor.item_index[target], -1])
+    np.testing.assert_allclose(
+        result['bands']["営業損益金額"]["P50"],
+        np.cumsum(expected[processor.item_index["営業損益金額"], :-1])
+    )
+
+
+def test_actual_months_are_not_shocked(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    result = processor.simulate_landing(actual, forecast, 12, SHOCKS, n_paths=100, seed=0)
+
+    summary = result['summary']
+    np.testing.assert_allclose(summary["P5"], summary["基準"])
+    np.testing.assert_allclose(summary["P95"], summary["基準"])
+
+
+def test_seed_determines_result_regardless_of_workers(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    kwargs = dict(correlations={("売上高", "販売管理費計"): 0.5}, n_paths=2000, chunk_size=500)
+    first = processor.simulate_landing(actual, forecast, 4, SHOCKS, seed=42, **kwargs)
+    again = processor.simulate_landing(actual, forecast, 4, SHOCKS, seed=42, max_workers=2, **kwargs)
+    other = processor.simulate_landing(actual, forecast, 4, SHOCKS, seed=7, **kwargs)
+
+    np.testing.assert_allclose(again['summary'].to_numpy(), first['summary'].to_numpy())
+    assert not np.allclose(other['summary']["P5"], first['summary']["P5"])
+    assert first['n_paths'] == 2000
+
+
+def test_shocks_are_mean_zero(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    summary = processor.simulate_landing(actual, forecast, 4, SHOCKS, n_paths=50000, seed=0)['summary']
+
+    spread = summary["P95"] - summary["P5"]
+    assert (spread > 0).all()
+    assert ((summary["平均"] - summary["基準"]).abs() < spread * 0.02).all()
+    assert (summary["P5"] < summary["P50"]).all() and (summary["P50"] < summary["P95"]).all()
+
+
+def test_invalid_inputs_raise(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    with pytest.raises(ValueError):
+        processor.simulate_landing(actual, forecast, 4, {"存在しない項目": {'sigma': 0.1}}, n_paths=10)
+    with pytest.raises(ValueError):
+        processor.simulate_landing(
+            actual, forecast, 4, SHOCKS, correlations={("売上高", "販売管理費計"): 1.5}, n_paths=10
+        )
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+
+def test_changes_match_full_recompute(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    split_idx = 4
+    pl = processor.calculate_pl_matrix(actual, forecast, split_idx)
+
+    changes = [("売上高", 5, 120000.0), ("給料手当", 5, -30000.0), ("減価償却費", 11, 5000.0), ("売上高", 7, 0.0)]
+    changed = processor.apply_pl_changes(pl, changes)
+
+    edited = forecast.copy()
+    for item, month_idx, delta in changes:
+        edited[processor.item_index[item], month_idx] += delta
+    expected = processor.calculate_pl_matrix(actual, edited, split_idx)
+    np.testing.assert_allclose(pl, expected)
+
+    # 戻り値は変わったセルだけ（差分0の変更と影響のない列は含まない）
+    assert {col for _, col in changed} == {5, 11, 12}
+    for (item, col), value in changed.items():
+        assert value == pytest.approx(expected[processor.item_index[item], col])
+
+
+def test_calculated_items_cannot_be_changed(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    pl = processor.calculate_pl_matrix(actual, forecast, 4)
+
+    with pytest.raises(ValueError):
+        processor.apply_pl_changes(pl, [("営業損益金額", 5, 1000.0)])
@@ -0,0 +1,17 @@
+import numpy as np
+
+
+def test_pl_sweep_matches_pl_matrix(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    sweep = processor.calculate_pl_sweep(actual, forecast)
+    assert sweep.shape[0] == actual.shape[1] + 1
+    for k in range(sweep.shape[0]):
+        np.testing.assert_allclose(sweep[k], processor.calculate_pl_matrix(actual, forecast, k))
+
+
+def test_pl_sweep_keeps_leading_axes(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    stacked = np.stack([forecast, forecast * 0.5])
+    sweep = processor.calculate_pl_sweep(actual, stacked)
+    assert sweep.shape == (actual.shape[1] + 1, 2, len(processor.all_items), actual.shape[1] + 1)
+    np.testing.assert_allclose(sweep[3, 1], processor.calculate_pl_matrix(actual, forecast * 0.5, 3))
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def forecast_with_sub_accounts(processor, add_period):
+    """売上高・広告宣伝費の現実予測と、広告宣伝費の初月だけに補助科目がある期"""
+    comp_id, period_id = add_period()
+    months = processor.get_fiscal_months(period_id)
+    processor.save_forecast_item(period_id, "現実", "売上高", {m: 10000 for m in months})
+    processor.save_forecast_item(period_id, "現実", "広告宣伝費", {m: 1000 for m in months})
+    processor.save_sub_account(period_id, "現実", "広告宣伝費", "Web", {months[0]: 300})
+    processor.save_sub_account(period_id, "現実", "広告宣伝費", "紙面", {months[0]: 500})
+    return comp_id, period_id, months
+
+
+def test_base_forecast_rolls_up_sub_accounts(processor, forecast_with_sub_accounts):
+    _, period_id, months = forecast_with_sub_accounts
+    base = processor.load_base_forecast_data(period_id).set_index('項目名')
+
+    assert base.loc["広告宣伝費", months[0]] == 800
+    assert (base.loc["広告宣伝費", months[1:]] == 1000).all()
+
+
+def test_periods_pl_includes_sub_account_rollup(processor, forecast_with_sub_accounts):
+    _, period_id, _ = forecast_with_sub_accounts
+    pl = processor.calculate_periods_pl([period_id], "現実", 0)['pl'][0]
+
+    assert pl[processor.item_index["営業損益金額"], -1] == 12 * 10000 - (800 + 11 * 1000)
+
+
+@pytest.mark.parametrize("scenario", ["現実", "楽観", "悲観"])
+def test_batch_engines_match_dashboard_pipeline(processor, forecast_with_sub_accounts, scenario):
+    comp_id, period_id, months = forecast_with_sub_accounts
+    actual, _ = processor.load_actual_matrix(period_id)
+
+    # ダッシュボードと同じ手順: 基準予測のDataFrame → シナリオルール → PL
+    base = processor._frame_to_matrix(processor.load_base_forecast_data(period_id), months)
+    adjusted = processor.apply_periods_scenario_rules(base[None], [period_id], [months], [scenario])[0, 0]
+    expected = processor.calculate_pl_matrix(actual, adjusted, 3)
+
+    np.testing.assert_allclose(processor.calculate_periods_pl([period_id], scenario, 3)['pl'][0], expected)
+    cube, scenarios, _ = processor.calculate_scenario_forecasts(period_id, ["現実", scenario])
+    assert scenarios == ["現実", scenario]
+    np.testing.assert_allclose(cube[1], adjusted)
+
+
+def test_optimistic_scenario_scales_the_base_forecast(processor, forecast_with_sub_accounts):
+    _, period_id, months = forecast_with_sub_accounts
+    cube, _, _ = processor.calculate_scenario_forecasts(period_id, ["現実", "楽観"])
+    sales = processor.item_index["売上高"]
+
+    # 既定ルール: 売上高の弾性値1.0 × 楽観の増減率+10%
+    np.testing.assert_allclose(cube[1, sales], cube[0, sales] * 1.1)
+
+
+def test_rules_respect_month_window_and_multiply(processor, add_period):
+    comp_id, period_id = add_period()
+    months = processor.get_fiscal_months(period_id)
+    processor.save_scenario(comp_id, "楽観", 0.2)
+    processor.save_scenario_rules(comp_id, "楽観", [
+        {'target_item': "売上高", 'elasticity': 1.0, 'start_month': months[3], 'end_month': months[5]},
+        {'target_item': "売上高", 'elasticity': 0.5, 'start_month': None, 'end_month': None},
+        {'target_item': "販売管理費計", 'elasticity': -1.0, 'start_month': None, 'end_month': None},
+    ])
+
+    multipliers = processor.build_scenario_multipliers(comp_id, ["現実", "楽観"], months)
+
+    sales = multipliers[1, processor.item_index["売上高"]]
+    np.testing.assert_allclose(sales[3:6], 1.2 * 1.1)
+    np.testing.assert_allclose(np.delete(sales, [3, 4, 5]), 1.1)
+    # グループ指定は配下の入力項目すべてに展開される
+    for item in processor._rule_target_items("販売管理費計"):
+        np.testing.assert_allclose(multipliers[1, processor.item_index[item]], 0.8)
+    np.testing.assert_array_equal(multipliers[0], 1.0)
+
+
+def test_scenario_rules_load_in_constant_queries(processor, add_period, monkeypatch):
+    period_ids = []
+    for company in ["A社", "B社", "C社"]:
+        comp_id, period_id = add_period(company=company)
+        processor.save_scenario_rules(comp_id, "悲観", [
+            {'target_item': "売上高", 'elasticity': 2.0, 'start_month': None, 'end_month': None},
+        ])
+        period_ids.append(period_id)
+    period_months = [processor.get_fiscal_months(period_id) for period_id in period_ids]
+
+    queries = []
+    original = processor._read_sql_query
+    monkeypatch.setattr(processor, "_read_sql_query", lambda *args, **kwargs: queries.append(args[0]) or original(*args, **kwargs))
+    base = np.ones((len(period_ids), len(processor.all_items), 12))
+    result = processor.apply_periods_scenario_rules(base, period_ids, period_months, ["現実", "楽観", "悲観"])
+
+    assert len(queries) == 2
+    np.testing.assert_allclose(result[:, 2, processor.item_index["売上高"]], 0.8)
+    np.testing.assert_allclose(result[:, 1, processor.item_index["売上高"]], 1.1)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+
+def recompute(processor, actual, forecast, split_idx, items, rate, target):
+    """項目の予測月だけをrate変化させてPLを計算し直したときの対象項目（通期）"""
+    edited = forecast.copy()
+    for item in items:
+        edited[processor.item_index[item], split_idx:] *= 1 + rate
+    return processor.calculate_pl_matrix(actual, edited, split_idx)[processor.item_index[target], -1]
+
+
+def test_sensitivity_matches_one_at_a_time_recompute(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    split_idx = 4
+    result = processor.calculate_sensitivity(actual, forecast, split_idx, rate=0.1).set_index('項目名')
+    base = processor.calculate_pl_matrix(actual, forecast, split_idx)
+
+    assert set(result.index) == {item for item in processor.all_items if item not in processor.calculated_items}
+    for item in ["売上高", "売上原価", "給料手当", "法人税、住民税及び事業税"]:
+        assert result.loc[item, '基準値'] == pytest.approx(base[processor.item_index[item], -1])
+        for target in ["営業損益金額", "当期純損益金額"]:
+            for rate, label in ((0.1, "+10%"), (-0.1, "-10%")):
+                expected = recompute(processor, actual, forecast, split_idx, [item], rate, target)
+                assert result.loc[item, f"{target}（{label}）"] == pytest.approx(
+                    expected - base[processor.item_index[target], -1]
+                )
+
+
+def test_sensitivity_is_sorted_by_spread(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    result = processor.calculate_sensitivity(actual, forecast, 4, rate=0.1)
+
+    spread = (result["営業損益金額（+10%）"] - result["営業損益金額（-10%）"]).abs().to_numpy()
+    assert (np.diff(spread) <= 1e-6).all()
+
+
+def test_grid_matches_recompute_and_expands_groups(processor, pl_inputs):
+    actual, forecast = pl_inputs
+    split_idx = 4
+    grid = processor.calculate_sensitivity_grid(
+        actual, forecast, split_idx, col_item="販売管理費計", row_rates=(-0.1, 0.0, 0.2), col_rates=(0.0, 0.1)
+    )
+
+    assert list(grid.index) == ["-10%", "+0%", "+20%"]
+    assert list(grid.columns) == ["+0%", "+10%"]
+    base = processor.calculate_pl_matrix(actual, forecast, split_idx)
+    assert grid.loc["+0%", "+0%"] == pytest.approx(base[processor.item_index["営業損益金額"], -1])
+
+    edited = forecast.copy()
+    edited[processor.item_index["売上高"], split_idx:] *= 1.2
+    for item in processor._rule_target_items("販売管理費計"):
+        edited[processor.item_index[item], split_idx:] *= 1.1
+    expected = processor.calculate_pl_matrix(actual, edited, split_idx)[processor.item_index["営業損益金額"], -1]
+    assert grid.loc["+20%", "+10%"] == pytest.approx(expected)